@@ -0,0 +1,334 @@
+"""
+Shared helpers for the Anthropic Messages API call sites.
+
+The mapper, ranker and research prompts each repeat a large static prefix
+-- system prompt, framework / tool taxonomy, rubric, response schema --
+in front of a small per-entry payload. ``cached_system`` puts that prefix
+in the ``system`` blocks with a ``cache_control`` breakpoint, so after the
+first request the API reads it from the prompt cache (at ~10% of the
+input price and lower latency) and only the user message is new input.
+
+``UsageTracker`` sums ``usage`` over a run -- including
+``cache_creation_input_tokens`` and ``cache_read_input_tokens`` -- and
+appends one line per run to ``output/llm_usage.jsonl``. A run whose
+prefix is shorter than the model's minimum cacheable length shows up
+there as zero cache writes and reads.
+
+``ConcurrencyController`` replaces fixed worker counts with an AIMD
+limit on in-flight requests, shared by every thread in the process
+(``get_controller``): the limit grows by one per window of healthy
+responses (error rate and latency in bounds) and is halved on 429 / 529,
+which also pauses *all* threads for the ``retry-after`` period. Call
+sites run their thread pools at the controller's ``maximum`` and create
+clients with ``max_retries=0`` so overload responses reach the
+controller instead of being retried inside the SDK.
+
+Usage:
+    from anthropic_utils import UsageTracker, cached_system, get_controller
+
+    usage = UsageTracker("rank_papers", model)
+    resp = client.messages.create(
+        model=model, max_tokens=512,
+        system=cached_system(SYSTEM_PROMPT, RUBRIC),
+        messages=[{"role": "user", "content": paper_text}],
+    )
+    usage.record(resp.usage)
+    console.print(usage.summary())
+    usage.save()
+
+    controller = get_controller("anthropic", maximum=32)
+    resp = controller.call(client.messages.create, model=model, ...)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+LLM_USAGE_LOG = "output/llm_usage.jsonl"
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+def cached_system(*blocks: str) -> list[dict]:
+    """System text blocks with a cache breakpoint after the last one (empty blocks are dropped)."""
+    parts = [{"type": "text", "text": b} for b in blocks if b]
+    if parts:
+        parts[-1]["cache_control"] = {"type": "ephemeral"}
+    return parts
+
+
+class UsageTracker:
+    """Thread-safe running total of the token ``usage`` of one run's requests."""
+
+    def __init__(self, label: str, model: str = ""):
+        self.label = label
+        self.model = model
+        self.requests = 0
+        self.tokens = {f: 0 for f in USAGE_FIELDS}
+        self._started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, usage) -> None:
+        """Add one response's ``usage`` (an SDK object or dict; ``None`` is ignored)."""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else lambda f, d=0: getattr(usage, f, d)
+        with self._lock:
+            self.requests += 1
+            for f in USAGE_FIELDS:
+                self.tokens[f] += get(f, 0) or 0
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Every input token, whether uncached, written to or read from the cache."""
+        t = self.tokens
+        return t["input_tokens"] + t["cache_creation_input_tokens"] + t["cache_read_input_tokens"]
+
+    @property
+    def cache_read_fraction(self) -> Optional[float]:
+        total = self.prompt_tokens
+        return self.tokens["cache_read_input_tokens"] / total if total else None
+
+    def summary(self) -> str:
+        t = self.tokens
+        frac = self.cache_read_fraction
+        return (
+            f"{self.requests} requests, {self.prompt_tokens:,} input tokens "
+            f"({t['cache_read_input_tokens']:,} cache reads"
+            + (f" = {frac:.0%}" if frac is not None else "")
+            + f", {t['cache_creation_input_tokens']:,} cache writes, "
+            f"{t['input_tokens']:,} uncached), {t['output_tokens']:,} output tokens"
+        )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "label": self.label,
+                "model": self.model,
+                "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "elapsed_s": round(time.time() - self._started, 1),
+                "requests": self.requests,
+                **self.tokens,
+            }
+
+    def save(self, path: str = LLM_USAGE_LOG) -> None:
+        """Append this run's totals to the JSONL usage log (runs without requests are skipped)."""
+        if not self.requests:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_dict()) + "\n")
+
+
+# ── Adaptive concurrency (AIMD) ─────────────────────────────────────────────
+
+OVERLOAD_STATUS = (429, 529)      # rate limited / API overloaded
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 32
+
+
+def is_overload(exc: BaseException) -> bool:
+    """True for a 429 / 529 API error (any SDK version; no ``anthropic`` import needed)."""
+    return getattr(exc, "status_code", None) in OVERLOAD_STATUS
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """The ``retry-after`` header of an API error response, if any."""
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ConcurrencyController:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    Every window of ``limit`` completed requests with an error rate at or
+    below *max_error_rate* and a latency EMA within *latency_factor* times
+    the best EMA seen so far raises the limit by one, up to *maximum*. A
+    429 / 529 multiplies it by *decrease* (at most once per latency EMA,
+    so a burst of rejections from one window counts once) and pauses new
+    requests in every thread for the ``retry-after`` period.
+    """
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL_CONCURRENCY,
+        minimum: int = 1,
+        maximum: int = DEFAULT_MAX_CONCURRENCY,
+        decrease: float = 0.5,
+        latency_factor: float = 2.0,
+        max_error_rate: float = 0.1,
+        default_pause: float = 1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.max_error_rate = max_error_rate
+        self.default_pause = default_pause
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.successes = 0
+        self.errors = 0
+        self.overloads = 0
+        self.cuts = 0
+        self._window_ok = 0
+        self._window_errors = 0
+        self._latency_ema: Optional[float] = None
+        self._latency_best: Optional[float] = None
+        self._last_cut = 0.0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot (blocks while the limit is reached or a pause is on)."""
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self.in_flight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    break
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record_success(self, latency: float) -> None:
+        with self._cond:
+            self.successes += 1
+            self._window_ok += 1
+            ema = latency if self._latency_ema is None else 0.8 * self._latency_ema + 0.2 * latency
+            self._latency_ema = ema
+            if self._latency_best is None or ema < self._latency_best:
+                self._latency_best = ema
+            self._end_window()
+
+    def record_error(self) -> None:
+        """A failed request that was not an overload (counts against the window's error rate)."""
+        with self._cond:
+            self.errors += 1
+            self._window_errors += 1
+            self._end_window()
+
+    def record_overload(self, retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            self.overloads += 1
+            now = time.monotonic()
+            if now - self._last_cut >= (self._latency_ema or self.default_pause):
+                self.limit = max(float(self.minimum), self.limit * self.decrease)
+                self._last_cut = now
+                self.cuts += 1
+            self._paused_until = max(self._paused_until, now + (retry_after or self.default_pause))
+            self._window_ok = self._window_errors = 0
+
+    def _end_window(self) -> None:
+        total = self._window_ok + self._window_errors
+        if total < max(1, int(self.limit)):
+            return
+        healthy = (
+            self._window_errors / total <= self.max_error_rate
+            and self._latency_ema is not None
+            and self._latency_ema <= self._latency_best * self.latency_factor
+        )
+        if healthy and self.limit < self.maximum:
+            self.limit = min(float(self.maximum), self.limit + 1)
+            self._cond.notify_all()
+        self._window_ok = self._window_errors = 0
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in a slot, feeding its outcome back into the limit."""
+        with self.slot():
+            t0 = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                if is_overload(exc):
+                    self.record_overload(retry_after_seconds(exc))
+                else:
+                    self.record_error()
+                raise
+        self.record_success(time.monotonic() - t0)
+        return result
+
+    def summary(self) -> str:
+        return (
+            f"concurrency limit {int(self.limit)} (max {self.maximum}, peak in flight "
+            f"{self.peak_in_flight}), {self.overloads} overload responses, {self.cuts} cuts"
+            + (f", {self.errors} other errors" if self.errors else "")
+        )
+
+
+def controlled_create(client, controller: ConcurrencyController, max_attempts: int = 4, **params):
+    """
+    ``client.messages.create(**params)`` under *controller*, retrying
+    overload, 5xx and connection errors with backoff (for clients created
+    with ``max_retries=0``). Other errors are raised.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return controller.call(client.messages.create, **params)
+        except Exception as exc:
+            status = getattr(exc, "status_code", None)
+            retryable = (
+                is_overload(exc)
+                or (status is not None and status >= 500)
+                or type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+            )
+            if not retryable or attempt == max_attempts - 1:
+                raise
+            if not is_overload(exc):   # overloads already paused every thread
+                time.sleep(min(2 ** attempt, 30))
+
+
+_CONTROLLERS: dict[str, ConcurrencyController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name: str = "anthropic", maximum: Optional[int] = None, **kwargs) -> ConcurrencyController:
+    """
+    The process-wide controller for *name* (created on first use).
+
+    Passing *maximum* to an existing controller updates its ceiling, so
+    each call site can bound it by its own ``--workers`` flag while the
+    learnt limit carries over between them.
+    """
+    with _controllers_lock:
+        ctrl = _CONTROLLERS.get(name)
+        if ctrl is None:
+            if maximum is not None:
+                kwargs["maximum"] = maximum
+            ctrl = _CONTROLLERS[name] = ConcurrencyController(**kwargs)
+        elif maximum is not None:
+            with ctrl._cond:
+                ctrl.maximum = max(ctrl.minimum, maximum)
+                ctrl.limit = min(ctrl.limit, float(ctrl.maximum))
+                ctrl._cond.notify_all()
+    return ctrl
+
+
+def reset_controllers() -> None:
+    """Forget all controllers (for tests and benchmarks)."""
+    with _controllers_lock:
+        _CONTROLLERS.clear()
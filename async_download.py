@@ -0,0 +1,165 @@
+"""
+Asyncio PDF download engine (httpx.AsyncClient).
+
+Runs the same downloads as the thread engine in ``download_papers`` --
+streaming into ``.part`` files, PDF / size checks, Range resume, retries,
+all decided by the shared helpers in ``pdf_transfer`` -- but as
+coroutines on one event loop instead of one thread per connection, so
+hundreds of transfers can be in flight at once:
+
+  - The connection pool is split over several ``httpx.AsyncClient``s of
+    ``POOL_SHARD_SIZE`` connections (explicit ``httpx.Limits``), together
+    as many as there are workers, so connections never queue inside a pool
+    and per-request pool bookkeeping stays small.
+  - ``workers`` coroutines take papers from the same ``HostScheduler`` as
+    the thread engine (per-host caps, rate limits, round-robin); only
+    ``workers`` downloads exist at a time, whatever the backlog.
+  - Memory per transfer is one chunk (``CHUNK_SIZE``) plus the connection,
+    so RSS stays bounded as the worker count grows. The final ``fsync`` of
+    each file runs on a worker thread to keep the loop responsive.
+  - Finished downloads are reported through the caller's ``on_result`` on
+    the loop's thread, so ``run_downloads`` keeps its manifest and progress
+    bar unchanged.
+
+Usage:
+    uv run download_papers.py --engine async                 # 200 in flight
+    uv run download_papers.py --engine async --workers 500
+    uv run python -m benchmarks.downloads --engine both      # vs. threads
+"""
+
+import asyncio
+import contextlib
+from pathlib import Path
+from typing import Callable
+
+import httpx
+
+from host_scheduler import HostScheduler
+from pdf_transfer import (
+    CHUNK_SIZE,
+    MAX_PDF_MB,
+    MAX_RETRIES,
+    STREAM,
+    TIMEOUT,
+    PaperDownload,
+    Plan,
+    _Abort,
+    _already_downloaded,
+    _finish,
+    _give_up,
+    _keep_trying,
+    _on_error,
+    _open_part,
+    _range_headers,
+    _resume_point,
+    part_path,
+    plan_response,
+)
+from ratelimit import limited_stream_async
+
+# Connections per AsyncClient. httpcore's pool does per-request bookkeeping
+# over every connection it holds, which grows to tens of ms of CPU per
+# request at a few hundred connections; several small pools avoid that.
+POOL_SHARD_SIZE = 32
+
+# ── Single download ──────────────────────────────────────────────────────────
+
+async def _stream_to_file_async(
+    r: httpx.Response,
+    part: Path,
+    max_bytes: int,
+    plan: Plan,
+) -> int:
+    """Async twin of ``download_papers._stream_to_file``."""
+    with _open_part(plan, r.headers, part, max_bytes) as w:
+        async for chunk in r.aiter_bytes(CHUNK_SIZE):
+            w.write(chunk)
+        return await asyncio.to_thread(w.finish)
+
+
+async def download_one_async(
+    paper: PaperDownload,
+    client: httpx.AsyncClient,
+    papers_dir: Path,
+    max_bytes: int = MAX_PDF_MB * 1024 ** 2,
+    prepaid: bool = False,
+) -> PaperDownload:
+    """Async twin of ``download_papers.download_one``, saving into *papers_dir*."""
+    dest = papers_dir / paper.filename
+    part = part_path(dest)
+
+    if _already_downloaded(paper, dest):
+        return paper
+
+    for attempt in range(MAX_RETRIES):
+        offset, state = _resume_point(part, paper.pdf_url)
+        if state and offset == state.content_length:
+            return _finish(paper, dest, offset)   # complete, but the run died before the rename
+
+        try:
+            async with limited_stream_async(
+                client, "GET", paper.pdf_url,
+                prepaid=prepaid and attempt == 0,
+                follow_redirects=True,
+                timeout=TIMEOUT,
+                headers=_range_headers(offset, state),
+            ) as r:
+                plan = plan_response(paper.pdf_url, r.status_code, r.headers, offset, state)
+                if plan.action == STREAM:
+                    size = await _stream_to_file_async(r, part, max_bytes, plan)
+                    return _finish(paper, dest, size, resumed=plan.offset)
+            if not _keep_trying(plan, paper, part):
+                break
+        except (_Abort, httpx.HTTPError) as e:
+            pause = _on_error(e, paper, part)
+            if pause is None:
+                break
+            await asyncio.sleep(pause)
+
+    return _give_up(paper, part)
+
+
+# ── Engine ───────────────────────────────────────────────────────────────────
+
+async def _download_all(
+    scheduler: HostScheduler,
+    papers_dir: Path,
+    workers: int,
+    max_bytes: int,
+    on_result: Callable[[PaperDownload], None],
+):
+    shards = -(-workers // POOL_SHARD_SIZE)
+    per_shard = -(-workers // shards)
+    limits = httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard)
+    async with contextlib.AsyncExitStack() as stack:
+        clients = [
+            await stack.enter_async_context(httpx.AsyncClient(limits=limits))
+            for _ in range(shards)
+        ]
+
+        async def worker(client: httpx.AsyncClient):
+            while (job := await scheduler.next_async()) is not None:
+                result = job.item
+                try:
+                    result = await download_one_async(job.item, client, papers_dir, max_bytes, prepaid=True)
+                except Exception as e:  # keep the other workers going; record the paper as failed
+                    result.status, result.error = "failed", str(e)[:200]
+                finally:
+                    scheduler.done(job, result.size_bytes if result.status == "downloaded" else 0)
+                    on_result(result)
+
+        await asyncio.gather(*(worker(clients[k % shards]) for k in range(workers)))
+
+
+def run_async_downloads(
+    scheduler: HostScheduler,
+    papers_dir: Path,
+    workers: int,
+    max_bytes: int,
+    on_result: Callable[[PaperDownload], None],
+):
+    """
+    Download every paper in *scheduler* into *papers_dir* with *workers*
+    coroutines, calling *on_result* (on this thread) as each one finishes.
+    """
+    asyncio.run(_download_all(scheduler, papers_dir, workers, max_bytes, on_result))
@@ -0,0 +1,564 @@
+"""
+Concurrent discovery engine (asyncio + httpx.AsyncClient).
+
+Runs the same searches as ``scraper.run_search`` -- S2 bulk search (or HF
+paper search when S2 is disabled) plus HF dataset search for every query --
+but fans the queries out concurrently instead of walking them one by one.
+
+  - Each provider ("s2", "hf") has its own in-flight cap, and every request
+    is paced by the shared token buckets in ratelimit.py, so we stay inside
+    the provider's rate limit (and honour Retry-After) across all tasks.
+  - Pagination within a single query stays sequential (S2 uses continuation
+    tokens, HF uses offsets); the parallelism is across queries.
+  - Results are merged back in the serial loop's order (daily papers, then
+    per query: papers, datasets), so the de-duplicated output is identical
+    to ``run_search``.
+  - Per-provider wall-clock, request counts and requests/s are printed at
+    the end for comparison with the serial loop.
+  - S2 paper details are fetched by ``scraper.DetailFetcher`` on a worker
+    thread as each query's papers arrive, overlapping with the searches.
+
+Usage:
+    uv run main.py --concurrent                  # Use this engine for discovery
+    uv run main.py --concurrent --concurrency 16 # More queries in flight
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional
+
+import httpx
+
+from details_store import DETAILS_DB
+from http_cache import get_response_cache, print_cache_stats
+from identity import IdentityIndex
+from ratelimit import get_limiter, limiter_for_url, print_limiter_stats
+from scraper import (
+    API_BASE,
+    BASE,
+    HEADERS,
+    S2_API_BASE,
+    WATERMARK_LOOKBACK_DAYS,
+    BenchmarkEntry,
+    DetailFetcher,
+    PageCallback,
+    PageCursor,
+    SearchWatermarks,
+    _hf_dataset_params,
+    _keep_since,
+    _parse_hf_dataset,
+    _parse_hf_paper,
+    _parse_papers_html,
+    _parse_s2_paper,
+    _s2_api_key,
+    _s2_bulk_params,
+    _s2_headers,
+)
+
+if TYPE_CHECKING:
+    from discovery_log import DiscoveryLog
+    from query_planner import QueryYield
+
+
+# ── Provider limits ──────────────────────────────────────────────────────────
+# Max in-flight requests per provider. Request *rates* come from the shared
+# token buckets in ratelimit.PROVIDER_RATES.
+
+PROVIDER_CONCURRENCY: dict[str, int] = {
+    "s2_keyed": 2,
+    "s2": 1,
+    "hf": 4,
+}
+
+
+# ── Per-provider gate + stats ────────────────────────────────────────────────
+
+@dataclass
+class ProviderStats:
+    """Request counters and timing for one provider."""
+    name: str
+    limiter_key: str = ""
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    busy_seconds: float = 0.0  # summed request latency
+    first_start: float = 0.0
+    last_end: float = 0.0
+
+    @property
+    def wall_seconds(self) -> float:
+        if not self.requests:
+            return 0.0
+        return max(self.last_end - self.first_start, 1e-9)
+
+    @property
+    def requests_per_second(self) -> float:
+        wall = self.wall_seconds
+        return self.requests / wall if wall else 0.0
+
+
+class ProviderGate:
+    """Caps in-flight requests for one provider and paces them via its token bucket."""
+
+    def __init__(self, name: str, limiter_key: str, max_in_flight: int):
+        self.stats = ProviderStats(name=name, limiter_key=limiter_key)
+        self._sem = asyncio.Semaphore(max_in_flight)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send one request once a slot is free and the provider's bucket has a token."""
+        limiter = limiter_for_url(url)
+        async with self._sem:
+            await limiter.acquire_async()
+
+            start = time.monotonic()
+            if not self.stats.first_start:
+                self.stats.first_start = start
+            self.stats.requests += 1
+            r = None
+            try:
+                r = await client.request(method, url, **kwargs)
+                return r
+            finally:
+                end = time.monotonic()
+                limiter.observe(r, end - start)
+                self.stats.busy_seconds += end - start
+                self.stats.last_end = max(self.stats.last_end, end)
+
+
+async def _fetch(
+    gate: ProviderGate,
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    as_json: bool = True,
+    attempts: int = 3,
+    timeout: float = 30,
+    **kwargs,
+) -> Optional[list | dict | str]:
+    """Async twin of ``_api_get_json`` / ``_get_html`` / ``_s2_request``."""
+    cache = get_response_cache() if as_json else None
+    lookup = (
+        cache.lookup(method, url, kwargs.get("params"), kwargs.get("json"))
+        if cache else None
+    )
+    if lookup and lookup.fresh:
+        return lookup.data
+    if lookup:
+        kwargs["headers"] = {**kwargs.get("headers", {}), **lookup.validators()}
+
+    for attempt in range(attempts):
+        try:
+            r = await gate.request(
+                client, method, url,
+                follow_redirects=True, timeout=timeout, **kwargs,
+            )
+            if r.status_code == 304 and lookup and lookup.entry:
+                return cache.revalidated(lookup)
+            if r.status_code == 200:
+                if not as_json:
+                    return r.text
+                data = r.json()
+                if lookup:
+                    cache.store(lookup, r, data)
+                return data
+            if r.status_code == 429:
+                # The shared bucket is now paused (Retry-After / back-off)
+                gate.stats.rate_limited += 1
+                print(f"  [{gate.stats.name}] rate-limited (attempt {attempt + 1}/{attempts}), backing off ...")
+                continue
+            print(f"  [{gate.stats.name}] HTTP {r.status_code} for {url}")
+            return None
+        except (httpx.HTTPError, ValueError) as exc:
+            gate.stats.errors += 1
+            print(f"  [{gate.stats.name}] error fetching {url}: {exc}")
+            await asyncio.sleep(1)
+    return None
+
+
+# ── Provider searches ────────────────────────────────────────────────────────
+
+async def _search_s2(
+    query: str,
+    client: httpx.AsyncClient,
+    gate: ProviderGate,
+    max_results: int,
+    since: str = "",
+    resume_from: Optional[PageCursor] = None,
+    on_page: Optional[PageCallback] = None,
+) -> list[BenchmarkEntry]:
+    """Async ``search_semantic_scholar`` (token-paginated bulk search)."""
+    results: list[BenchmarkEntry] = []
+    headers = _s2_headers()
+    continuation_token: Optional[str] = resume_from.cursor if resume_from else None
+    page = resume_from.page if resume_from else 0
+    already = resume_from.fetched if resume_from else 0
+
+    while already + len(results) < max_results:
+        params = _s2_bulk_params(query, continuation_token, since)
+        data = await _fetch(
+            gate, client, "GET", f"{S2_API_BASE}/paper/search/bulk",
+            headers=headers, params=params, timeout=60, attempts=4,
+        )
+        if not data or "data" not in data or not data["data"]:
+            break
+
+        page += 1
+        page_entries: list[BenchmarkEntry] = []
+        truncated = False
+        for paper in data["data"]:
+            if already + len(results) + len(page_entries) >= max_results:
+                truncated = True
+                break
+            entry = _parse_s2_paper(paper, query)
+            if entry:
+                page_entries.append(entry)
+        results.extend(page_entries)
+
+        continuation_token = data.get("token")
+        if on_page:
+            done = not continuation_token or already + len(results) >= max_results
+            on_page(page_entries, PageCursor(
+                page, None if done else continuation_token, already + len(results),
+                exhausted=not continuation_token and not truncated,
+            ))
+        if not continuation_token:
+            break
+
+    return results
+
+
+async def _search_hf_datasets(
+    query: str,
+    client: httpx.AsyncClient,
+    gate: ProviderGate,
+    max_results: int,
+    since: str = "",
+    resume_from: Optional[PageCursor] = None,
+    on_page: Optional[PageCallback] = None,
+) -> list[BenchmarkEntry]:
+    """Async ``search_datasets`` (offset-paginated)."""
+    PAGE_SIZE = 100
+    results: list[BenchmarkEntry] = []
+    offset = resume_from.cursor if resume_from else 0
+    page_no = resume_from.page if resume_from else 0
+
+    while offset < max_results:
+        batch_limit = min(PAGE_SIZE, max_results - offset)
+        data = await _fetch(
+            gate, client, "GET", f"{API_BASE}/datasets",
+            headers=HEADERS,
+            params=_hf_dataset_params(query, batch_limit, offset, since),
+        )
+        if not isinstance(data, list):   # an empty list is the end of the results
+            break
+
+        page = [e for e in (_parse_hf_dataset(ds, query) for ds in data) if e]
+        page, reached_older = _keep_since(page, since)
+        results.extend(page)
+        page_no += 1
+
+        last = len(data) < batch_limit or reached_older
+        offset += len(data)
+        if on_page:
+            on_page(page, PageCursor(page_no, None if last else offset, offset, exhausted=last))
+        if last:
+            break
+
+    return results
+
+
+async def _search_hf_papers(
+    query: str,
+    client: httpx.AsyncClient,
+    gate: ProviderGate,
+    max_results: int,
+) -> list[BenchmarkEntry]:
+    """Async ``search_papers`` (JSON API, then paginated HTML fallback)."""
+    data = await _fetch(
+        gate, client, "GET", f"{API_BASE}/papers/search",
+        headers=HEADERS, params={"q": query, "limit": min(max_results, 100)},
+    )
+    if data and isinstance(data, list):
+        results: list[BenchmarkEntry] = []
+        for item in data:
+            paper = item if "id" in item else item.get("paper", {})
+            entry = _parse_hf_paper(paper, [query])
+            if entry:
+                results.append(entry)
+        return results
+
+    html_headers = {**HEADERS, "Accept": "text/html,application/xhtml+xml"}
+    results = []
+    page = 0
+    while len(results) < max_results:
+        html = await _fetch(
+            gate, client, "GET", f"{BASE}/search/full-text", as_json=False,
+            headers=html_headers, params={"q": query, "type": "paper", "p": page},
+        )
+        if not html:
+            break
+        page_results = _parse_papers_html(html, query)
+        if not page_results:
+            break
+        results.extend(page_results[: max_results - len(results)])
+        page += 1
+    return results
+
+
+async def _fetch_daily_papers(
+    client: httpx.AsyncClient,
+    gate: ProviderGate,
+) -> list[BenchmarkEntry]:
+    """Async ``fetch_daily_papers``."""
+    data = await _fetch(gate, client, "GET", f"{API_BASE}/daily_papers", headers=HEADERS)
+    if not data or not isinstance(data, list):
+        return []
+    results: list[BenchmarkEntry] = []
+    for item in data:
+        entry = _parse_hf_paper(item.get("paper") or {}, ["daily_papers"])
+        if entry:
+            results.append(entry)
+    return results
+
+
+# ── Orchestrator ─────────────────────────────────────────────────────────────
+
+async def _run_search_async(
+    queries: list[str],
+    include_daily_papers: bool,
+    include_semantic_scholar: bool,
+    max_datasets_per_query: int,
+    max_papers_per_query: int,
+    concurrency: int,
+    watermarks: Optional[SearchWatermarks] = None,
+    log: Optional["DiscoveryLog"] = None,
+    logged: Optional[IdentityIndex] = None,
+    fetcher: Optional[DetailFetcher] = None,
+    query_scales: Optional[dict[str, float]] = None,
+) -> tuple[list[tuple[str, str, Optional[list[BenchmarkEntry]]]], dict[str, ProviderStats]]:
+    """
+    Run every (query, provider) search concurrently.
+
+    Returns ``(query, provider, results)`` per unit in serial-loop order
+    (results is None for a unit the log had already finished), plus stats.
+    *query_scales* caps a query's result limits to a fraction.
+    With *watermarks*, searches are date-bounded and the watermarks are
+    advanced from the results (only after a complete page walk, see
+    ``WATERMARK_COMPLETE_WALK``). With *log*, new entries (not in
+    *logged*) and finished pages are streamed to the discovery log as
+    they arrive, and units the log marks as done are skipped. Each
+    finished unit's papers are handed to *fetcher* for detail fetching.
+    """
+    logged = logged if logged is not None else IdentityIndex()
+
+    def _sink(q: str, provider: str, last: list[PageCursor]) -> PageCallback:
+        def on_page(page_entries: list[BenchmarkEntry], cursor: PageCursor):
+            last[:] = [cursor]
+            if not log:
+                return
+            for e in page_entries:
+                if logged.add(e.source_url):
+                    log.append(e)
+            log.record_page(q, provider, cursor)
+        return on_page
+
+    async def _unit(
+        q: str,
+        provider: str,
+        search: Callable[[Optional[PageCursor], Optional[PageCallback]], Awaitable[list[BenchmarkEntry]]],
+    ) -> tuple[str, str, Optional[list[BenchmarkEntry]]]:
+        if log and log.is_done(q, provider):
+            return q, provider, None
+        last = [PageCursor()]
+        found = await search(log.progress(q, provider) if log else None, _sink(q, provider, last))
+        if watermarks and provider in WATERMARK_LOOKBACK_DAYS:
+            watermarks.advance(provider, q, found, complete=last[0].exhausted)
+        if log:
+            log.mark_done(q, provider)
+        if fetcher and found:
+            # add() may block on the bounded batch queue -- keep the loop free
+            await asyncio.to_thread(fetcher.add, found)
+        return q, provider, found
+
+    s2_key = "s2_keyed" if _s2_api_key() else "s2"
+    gates = {
+        "s2": ProviderGate("s2", s2_key, PROVIDER_CONCURRENCY[s2_key]),
+        "hf": ProviderGate("hf", "hf", PROVIDER_CONCURRENCY["hf"]),
+    }
+    query_slots = asyncio.Semaphore(concurrency)
+
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+
+        def _cap(q: str, limit: int) -> int:
+            return max(1, int(limit * (query_scales or {}).get(q, 1.0)))
+
+        async def _papers(q: str):
+            async with query_slots:
+                if include_semantic_scholar:
+                    since = watermarks.since("s2", q) if watermarks else ""
+                    return await _unit(q, "s2", lambda resume_from, on_page: _search_s2(
+                        q, client, gates["s2"], _cap(q, max_papers_per_query), since,
+                        resume_from=resume_from, on_page=on_page,
+                    ))
+
+                async def _hf_papers(resume_from, on_page):
+                    found = await _search_hf_papers(q, client, gates["hf"], _cap(q, max_papers_per_query))
+                    if on_page:
+                        on_page(found, PageCursor(1, None, len(found)))
+                    return found
+                return await _unit(q, "hf_papers", _hf_papers)
+
+        async def _datasets(q: str):
+            async with query_slots:
+                since = watermarks.since("hf_datasets", q) if watermarks else ""
+                return await _unit(q, "hf_datasets", lambda resume_from, on_page: _search_hf_datasets(
+                    q, client, gates["hf"], _cap(q, max_datasets_per_query), since,
+                    resume_from=resume_from, on_page=on_page,
+                ))
+
+        async def _daily(resume_from, on_page) -> list[BenchmarkEntry]:
+            found = await _fetch_daily_papers(client, gates["hf"])
+            if on_page:
+                on_page(found, PageCursor(1, None, len(found)))
+            return found
+
+        units = []
+        if include_daily_papers:
+            units.append(_unit("", "daily_papers", _daily))
+        for q in queries:
+            units.append(_papers(q))
+            units.append(_datasets(q))
+
+        results = await asyncio.gather(*units)
+
+    return list(results), {g.stats.name: g.stats for g in gates.values()}
+
+
+def _print_provider_stats(
+    stats: dict[str, ProviderStats],
+    total_wall: float,
+):
+    """Print per-provider wall-clock / throughput and a serial-loop estimate."""
+    print("\nProvider stats:")
+    serial_estimate = 0.0
+    for s in stats.values():
+        if not s.requests:
+            continue
+        print(
+            f"  {s.name:<4} {s.requests:5d} requests  "
+            f"wall {s.wall_seconds:7.1f}s  {s.requests_per_second:6.2f} req/s  "
+            f"busy {s.busy_seconds:7.1f}s"
+            + (f"  ({s.rate_limited} rate-limited)" if s.rate_limited else "")
+            + (f"  ({s.errors} errors)" if s.errors else "")
+        )
+        # The serial loop runs providers one after another, each bounded by
+        # its summed latency or its bucket's pacing, whichever is slower
+        pacing = s.requests / get_limiter(s.limiter_key).spec.rate
+        serial_estimate += max(s.busy_seconds, pacing)
+    if total_wall > 0 and serial_estimate:
+        print(
+            f"  total wall {total_wall:.1f}s vs ~{serial_estimate:.1f}s serial "
+            f"(~{serial_estimate / total_wall:.1f}x faster)"
+        )
+
+
+def run_search_concurrent(
+    queries: list[str],
+    include_daily_papers: bool = True,
+    include_semantic_scholar: bool = True,
+    delay: float = 1.0,
+    max_datasets_per_query: int = 200,
+    max_papers_per_query: int = 1000,
+    fetch_details: bool = True,
+    details_output_path: str = DETAILS_DB,
+    watermarks: Optional[SearchWatermarks] = None,
+    known_urls: Iterable[str] = (),
+    log: Optional["DiscoveryLog"] = None,
+    concurrency: int = 8,
+    yields: Optional["QueryYield"] = None,
+    query_scales: Optional[dict[str, float]] = None,
+) -> list[BenchmarkEntry]:
+    """
+    Concurrent drop-in replacement for ``scraper.run_search``.
+
+    Takes the same arguments (plus *concurrency*, the number of query
+    searches in flight at once) and returns the same de-duplicated list.
+    With a discovery *log*, entries are logged in arrival order rather than
+    serial order; the returned list is still in serial order.
+    *delay* is only the pause after network errors in the detail fetch --
+    request pacing comes from the shared buckets in ratelimit.py.
+    """
+    if include_semantic_scholar:
+        if _s2_api_key():
+            print("Semantic Scholar API key detected.")
+        else:
+            print("No S2_API_KEY set -- using unauthenticated rate limit (slow).")
+            print("Set S2_API_KEY env var for faster paper search.\n")
+
+    all_results: list[BenchmarkEntry] = []
+    known_urls = list(known_urls)
+    seen = IdentityIndex(known_urls)
+    if log and log.mode == "resume":
+        for e in log.entries():
+            if seen.add(e.source_url):
+                all_results.append(e)
+        print(f"Resuming discovery: {len(all_results)} entries and "
+              f"{log.units_done} finished units already logged.")
+
+    # Paper details are fetched on a worker thread while the searches run
+    fetcher: Optional[DetailFetcher] = None
+    if include_semantic_scholar and fetch_details:
+        fetcher = DetailFetcher(details_output_path, delay=delay).start()
+        if all_results:
+            fetcher.add(all_results)
+
+    print(f"Running {len(queries)} queries concurrently (concurrency={concurrency}) ...")
+    t0 = time.monotonic()
+    unit_results, stats = asyncio.run(_run_search_async(
+        queries,
+        include_daily_papers=include_daily_papers,
+        include_semantic_scholar=include_semantic_scholar,
+        max_datasets_per_query=max_datasets_per_query,
+        max_papers_per_query=max_papers_per_query,
+        concurrency=max(1, concurrency),
+        watermarks=watermarks,
+        log=log,
+        logged=IdentityIndex(known_urls + [e.source_url for e in all_results]),
+        fetcher=fetcher,
+        query_scales=query_scales,
+    ))
+    total_wall = time.monotonic() - t0
+
+    # ── Merge in serial order so de-duplication matches run_search ───────
+    for q, provider, entries in unit_results:
+        if entries is None:
+            continue
+        new = [e for e in entries if seen.add(e.source_url)]
+        all_results.extend(new)
+        if yields:
+            yields.record_unit(q, provider, len(entries), new)
+
+    print(f"\nFound {len(all_results)} unique results across {len(queries)} queries.")
+    if seen.aliases:
+        print(f"  ({seen.aliases} cross-source duplicates merged by canonical ID)")
+    if yields:
+        yields.finish_run(query_scales)
+    _print_provider_stats(stats, total_wall)
+
+    # ── Finish the S2 paper detail batches still in flight ───────────────
+    if fetcher:
+        print("\nWaiting for the remaining S2 paper detail batches ...")
+        fetcher.close()
+        print(f"  Paper details: {fetcher.summary()}")
+
+    print_limiter_stats()
+    print_cache_stats()
+    return all_results
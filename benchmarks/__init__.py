@@ -0,0 +1,112 @@
+"""
+Offline performance benchmarks for the pipeline stages.
+
+Each module runs one stage against ``http_replay.FakeAPIServer`` (a local
+stand-in for HuggingFace, Semantic Scholar and PDF hosts) and reports
+requests/s, p50/p99 client latency and total wall-clock, so performance
+changes can be compared without touching the live APIs.
+
+Usage:
+    uv run python -m benchmarks.discovery                  # run_search / run_search_concurrent
+    uv run python -m benchmarks.downloads                  # download_papers.run_downloads (threads / async)
+    uv run python -m benchmarks.discovery --latency 0.1 --rate-429 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from http_replay import RequestTimer, percentile
+from ratelimit import PROVIDER_RATES, RateSpec, reset_limiters
+
+
+@dataclass
+class BenchResult:
+    """Timing of one benchmark run."""
+    name: str
+    wall_seconds: float
+    timer: RequestTimer
+    extra: str = ""
+
+    @property
+    def requests(self) -> int:
+        return len(self.timer.all_samples())
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+
+def add_server_args(parser: argparse.ArgumentParser):
+    """Fake-server knobs shared by every benchmark."""
+    parser.add_argument("--latency", type=float, default=0.05, help="Server latency per request in seconds (default: 0.05).")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra uniform random latency in seconds (default: 0.02).")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429 (default: 0).")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After on injected 429s (default: 0.5).")
+    parser.add_argument("--cassette", default="", help="Replay recorded responses from this cassette first.")
+    parser.add_argument("--live-rates", action="store_true",
+                        help="Keep the real per-provider rate limits (default: unlimited, to measure the engine).")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the stage's own output.")
+
+
+def prepare_rates(live_rates: bool):
+    """Fresh limiter buckets; unlimited unless *live_rates* is set."""
+    reset_limiters()
+    if not live_rates:
+        for key in list(PROVIDER_RATES):
+            PROVIDER_RATES[key] = RateSpec(rate=1e6, burst=1e6)
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool) -> Iterator[None]:
+    """Swallow the stage's stdout unless verbose."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def timed(
+    name: str,
+    fn: Callable[[], object],
+    verbose: bool = False,
+    read_bodies: bool = True,
+) -> tuple[BenchResult, object]:
+    """
+    Run *fn* under a request timer and return its timing plus result
+    (``read_bodies=False`` for streamed responses: latency is time to headers).
+    """
+    timer = RequestTimer(read_bodies=read_bodies)
+    with timer.active(), quiet(not verbose):
+        t0 = time.monotonic()
+        result = fn()
+        wall = time.monotonic() - t0
+    return BenchResult(name, wall, timer), result
+
+
+def print_results(results: list[BenchResult], server_stats: dict | None = None):
+    """Print one row per run plus per-mount latency percentiles."""
+    print(f"\n{'run':<28} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'wall s':>8}")
+    for r in results:
+        samples = r.timer.all_samples()
+        print(
+            f"{r.name:<28} {r.requests:9d} {r.requests_per_second:8.1f} "
+            f"{percentile(samples, 50) * 1000:8.1f} {percentile(samples, 99) * 1000:8.1f} "
+            f"{r.wall_seconds:8.2f}" + (f"  {r.extra}" if r.extra else "")
+        )
+        for group, values in sorted(r.timer.samples.items()):
+            print(
+                f"  {group:<26} {len(values):9d} {'':>8} "
+                f"{percentile(values, 50) * 1000:8.1f} {percentile(values, 99) * 1000:8.1f}"
+            )
+        non_ok = {s: n for s, n in r.timer.statuses.items() if s >= 400}
+        if non_ok:
+            print(f"  {'non-2xx responses':<26} {non_ok}")
+    if server_stats:
+        print(f"\nServer: {server_stats}")
+    sys.stdout.flush()
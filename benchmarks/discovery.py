@@ -0,0 +1,75 @@
+"""
+Discovery benchmark: ``scraper.run_search`` vs ``async_search.run_search_concurrent``.
+
+Runs the full discovery stage (daily papers, S2 bulk search, HF datasets,
+pipelined S2 detail batches) against the local fake API and reports
+requests/s, p50/p99 latency and wall-clock per engine. Output files go to
+a temporary directory; the HTTP response cache is left off so every run
+pays for its requests.
+
+Usage:
+    uv run python -m benchmarks.discovery
+    uv run python -m benchmarks.discovery --queries 20 --engine concurrent --concurrency 16
+    uv run python -m benchmarks.discovery --latency 0.2 --rate-429 0.05 --live-rates
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks import add_server_args, prepare_rates, print_results, timed
+from config import HF_SEARCH_QUERIES
+from http_replay import Cassette, FakeAPIServer, SyntheticData, pointed_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the discovery stage against a local fake API.")
+    add_server_args(parser)
+    parser.add_argument("--queries", type=int, default=8, help="Number of queries from config.HF_SEARCH_QUERIES (default: 8).")
+    parser.add_argument("--engine", choices=["serial", "concurrent", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight for the concurrent engine.")
+    parser.add_argument("--max-papers", type=int, default=1000, help="S2 papers per query (default: 1000).")
+    parser.add_argument("--max-datasets", type=int, default=200, help="HF datasets per query (default: 200).")
+    parser.add_argument("--no-details", action="store_true", help="Skip S2 detail batches.")
+    args = parser.parse_args()
+
+    queries = HF_SEARCH_QUERIES[: args.queries]
+    synthetic = SyntheticData(
+        s2_papers_per_query=args.max_papers,
+        datasets_per_query=args.max_datasets,
+    )
+    engines = ["serial", "concurrent"] if args.engine == "both" else [args.engine]
+    results = []
+
+    with FakeAPIServer(
+        cassette=Cassette(args.cassette) if args.cassette else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        synthetic=synthetic,
+    ) as server, pointed_at(server.base_url), tempfile.TemporaryDirectory() as tmp:
+        from async_search import run_search_concurrent
+        from scraper import run_search
+
+        for engine in engines:
+            prepare_rates(args.live_rates)
+            kwargs = dict(
+                max_datasets_per_query=args.max_datasets,
+                max_papers_per_query=args.max_papers,
+                fetch_details=not args.no_details,
+                details_output_path=os.path.join(tmp, f"details_{engine}.db"),
+            )
+            if engine == "serial":
+                fn = lambda: run_search(queries, **kwargs)
+            else:
+                fn = lambda: run_search_concurrent(queries, concurrency=args.concurrency, **kwargs)
+            result, entries = timed(f"{engine} ({len(queries)} queries)", fn, args.verbose)
+            result.extra = f"{len(entries)} entries"
+            results.append(result)
+
+        print_results(results, server.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Download benchmark: ``download_papers.run_downloads`` against synthetic PDFs.
+
+Serves ``--papers`` PDFs of ``--size-kb`` each from the local fake API (in a
+child process) and
+downloads them into a temporary directory, reporting requests/s, p50/p99
+latency (to response headers), throughput, peak RSS and wall-clock.
+``--engine both`` runs the thread engine and then the asyncio engine
+(async_download.py) on the same papers; RSS is sampled during each run.
+``--hosts N`` spreads the papers over N rate-limit keys (URL prefixes on the
+one server), so the per-host scheduler has hosts to interleave.
+
+Usage:
+    uv run python -m benchmarks.downloads
+    uv run python -m benchmarks.downloads --papers 500 --size-kb 2000 --workers 32
+    uv run python -m benchmarks.downloads --engine both --papers 2000 --latency 0.5
+    uv run python -m benchmarks.downloads --rate-drop 0.3     # flaky mirror: Range resume
+    uv run python -m benchmarks.downloads --hosts 4 --live-rates   # per-host scheduling
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional
+
+from rich.console import Console
+
+import download_papers
+from benchmarks import add_server_args, prepare_rates, print_results, timed
+from http_replay import FakeAPIProcess, SyntheticData
+from ratelimit import register_url_provider
+
+
+class RssSampler:
+    """Highest resident set size seen while active (Linux ``/proc``; else the process peak)."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_mb() -> Optional[float]:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self.current_mb() or 0.0)
+
+    def __enter__(self) -> "RssSampler":
+        if self.current_mb() is None:
+            self._thread = None
+        else:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is None:
+            self.peak_mb = download_papers.peak_rss_mb() or 0.0
+        else:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF downloads against a local fake server.")
+    add_server_args(parser)
+    parser.add_argument("--papers", type=int, default=200, help="Number of PDFs (default: 200).")
+    parser.add_argument("--size-kb", type=int, default=500, help="Size of each PDF in KB (default: 500).")
+    parser.add_argument("--engine", choices=["threads", "async", "both"], default="threads")
+    parser.add_argument("--workers", type=int, default=20, help="Thread engine workers (default: 20).")
+    parser.add_argument("--async-workers", type=int, default=download_papers.DEFAULT_WORKERS["async"],
+                        help=f"Async engine transfers in flight (default: {download_papers.DEFAULT_WORKERS['async']}).")
+    parser.add_argument("--host-concurrency", type=int, default=None,
+                        help="Per-host cap (default: the engine's worker count, or the real caps with --live-rates).")
+    parser.add_argument("--rate-drop", type=float, default=0.0,
+                        help="Fraction of PDF transfers the server cuts off half-way (default: 0).")
+    parser.add_argument("--hosts", type=int, default=1,
+                        help="Spread papers over this many fake hosts (default: 1).")
+    args = parser.parse_args()
+
+    engines = ["threads", "async"] if args.engine == "both" else [args.engine]
+    results = []
+    # The server runs in its own process: hundreds of handler threads in
+    # this one would compete with the client for the GIL
+    with FakeAPIProcess(
+        cassette_path=args.cassette,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        synthetic=SyntheticData(pdf_bytes=args.size_kb * 1024),
+        rate_drop=args.rate_drop,
+    ) as server, tempfile.TemporaryDirectory() as tmp:
+        if not args.verbose:
+            download_papers.console = Console(quiet=True)
+        for k in range(args.hosts):
+            register_url_provider(f"{server.base_url}/pdf/host{k}/", f"host{k}")
+
+        downloads = [
+            download_papers.PaperDownload(
+                paper_id=f"bench{i:06d}",
+                title=f"Benchmark paper {i}",
+                pdf_url=f"{server.base_url}/pdf/host{i % args.hosts}/bench{i:06d}.pdf",
+                source="openAccessPdf",
+                filename=f"bench_{i:06d}.pdf",
+            )
+            for i in range(args.papers)
+        ]
+
+        for engine in engines:
+            prepare_rates(args.live_rates)
+            workers = args.workers if engine == "threads" else args.async_workers
+            # Without live rates, lift the per-host caps too: measure the engine
+            host_cap = args.host_concurrency or (None if args.live_rates else workers)
+            download_papers.PAPERS_DIR = Path(tmp) / f"papers_{engine}"
+            download_papers.MANIFEST_PATH = Path(tmp) / f"papers_manifest_{engine}.json"
+            papers = [replace(p) for p in downloads]
+
+            with RssSampler() as rss:
+                result, _ = timed(
+                    f"{engine} ({workers} workers)",
+                    lambda: download_papers.run_downloads(
+                        papers, max_workers=workers, engine=engine, host_concurrency=host_cap,
+                    ),
+                    args.verbose,
+                    read_bodies=False,   # keep downloads streamed; latency is time to headers
+                )
+            files = list(download_papers.PAPERS_DIR.glob("*.pdf"))
+            total_mb = sum(f.stat().st_size for f in files) / (1024 ** 2)
+            result.extra = (
+                f"{len(files)} files, {total_mb / result.wall_seconds:.1f} MB/s, "
+                f"peak RSS {rss.peak_mb:.0f} MB, {threading.active_count()} threads after"
+            )
+            results.append(result)
+
+        print_results(results, server.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Micro-benchmark: mapper stage-1 keyword scoring, per-keyword regex vs ``KeywordMatcher``.
+
+Scores the same entries with the previous implementation (one
+``re.search`` / substring test per keyword, blob rebuilt for framework and
+tool scoring) and with the compiled single-pass matcher, checks that both
+give identical scores (framework, tool and ``config.CONCERNS``), and
+reports entries/s and the speed-up. Uses ``output/scraped_entries.jsonl``
+when it exists, otherwise a synthetic corpus.
+
+Usage:
+    uv run python -m benchmarks.keyword_matching
+    uv run python -m benchmarks.keyword_matching --entries 50000 --synthetic
+"""
+
+import argparse
+import random
+import re
+import time
+
+from config import CONCERNS
+from discovery_log import iter_scraped_entries, scraped_entries_exist
+from keyword_matcher import concern_matcher
+from mapper import FRAMEWORK_KEYWORDS, TOOL_KEYWORDS, _text_blob, keyword_matcher, score_entry
+from scraper import BenchmarkEntry
+
+
+# ── Previous implementation (baseline) ──────────────────────────────────────
+
+def _legacy_score_keywords(blob: str, keywords: list[str]) -> float:
+    score = 0.0
+    for kw in keywords:
+        kw_lower = kw.lower()
+        if " " in kw_lower:
+            if kw_lower in blob:
+                score += 2.0
+        else:
+            if re.search(r"\b" + re.escape(kw_lower) + r"\b", blob):
+                score += 1.0
+    return score
+
+
+def _legacy_score_entry(entry: BenchmarkEntry) -> tuple[dict[str, float], dict[str, float]]:
+    blob = _text_blob(entry)
+    fw = {fid: s for fid, kws in FRAMEWORK_KEYWORDS.items() if (s := _legacy_score_keywords(blob, kws)) > 0}
+    blob = _text_blob(entry)
+    tools = {tid: s for tid, kws in TOOL_KEYWORDS.items() if (s := _legacy_score_keywords(blob, kws)) > 0}
+    return fw, tools
+
+
+def _legacy_concerns(blob: str) -> set[str]:
+    return {
+        key for key, info in CONCERNS.items()
+        if any(re.search(r"\b" + re.escape(kw.lower()) + r"\b", blob) for kw in info["keywords"])
+    }
+
+
+# ── Corpus ───────────────────────────────────────────────────────────────────
+
+_FILLER = (
+    "a the of and to in for with on we model models language large dataset data "
+    "evaluation results task tasks performance learning training students study "
+    "approach method methods propose paper show benchmark accuracy aftermath "
+    "mathematics tutorial tutors feedbacks biased scoreboard its it's visionary "
+    "llm gpt transformer analysis human annotated questions answers k 12 grades"
+).split()
+
+
+def _synthetic_corpus(n: int, seed: int = 0) -> list[BenchmarkEntry]:
+    """Abstract-sized entries mixing filler, keywords and near-miss words."""
+    rng = random.Random(seed)
+    keywords = [kw for d in (FRAMEWORK_KEYWORDS, TOOL_KEYWORDS) for kws in d.values() for kw in kws]
+    keywords += [kw for info in CONCERNS.values() for kw in info["keywords"]]
+    entries = []
+    for i in range(n):
+        words = [rng.choice(_FILLER) for _ in range(rng.randint(60, 220))]
+        for _ in range(rng.randint(0, 6)):
+            pos = rng.randrange(len(words))
+            kw = rng.choice(keywords)
+            words[pos] = rng.choice([kw, kw.upper(), kw + "s", "x" + kw, kw + ",", f"({kw})"])
+        entries.append(BenchmarkEntry(
+            name=" ".join(words[:8]).title(),
+            source_url=f"https://example.org/{i}",
+            source_type="paper",
+            description=" ".join(words[8:]) + ".",
+            tags=rng.sample(["education", "math", "dataset:test", "llm", "k-12"], 2),
+        ))
+    return entries
+
+
+def _timeit(fn, entries: list[BenchmarkEntry], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for e in entries:
+            fn(e)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mapper keyword scoring.")
+    parser.add_argument("--entries", type=int, default=5000, help="Entries to score (default: 5000).")
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic corpus even if scraped entries exist.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions, best is reported (default: 3).")
+    args = parser.parse_args()
+
+    if scraped_entries_exist() and not args.synthetic:
+        entries = []
+        for e in iter_scraped_entries():
+            entries.append(e)
+            if len(entries) >= args.entries:
+                break
+        corpus = "scraped entries"
+    else:
+        entries = _synthetic_corpus(args.entries)
+        corpus = "synthetic entries"
+    avg_chars = sum(len(_text_blob(e)) for e in entries) / max(len(entries), 1)
+    print(f"{len(entries)} {corpus} (avg {avg_chars:.0f} chars), "
+          f"{len(keyword_matcher())} framework/tool + {len(concern_matcher())} concern keywords")
+
+    # ── Correctness ──────────────────────────────────────────────────────
+    mismatches = 0
+    for e in entries:
+        blob = _text_blob(e)
+        concerns = set(concern_matcher().scores(blob).get("concern", {}))
+        if score_entry(e) != _legacy_score_entry(e) or concerns != _legacy_concerns(blob):
+            mismatches += 1
+    print(f"Identical scores: {len(entries) - mismatches}/{len(entries)}")
+
+    # ── Timing ───────────────────────────────────────────────────────────
+    keyword_matcher()  # compile outside the timed region
+    legacy = _timeit(_legacy_score_entry, entries, args.repeat)
+    compiled = _timeit(score_entry, entries, args.repeat)
+    n = max(len(entries), 1)
+    print(f"\n{'implementation':<26} {'total s':>8} {'us/entry':>9} {'entries/s':>10}")
+    print(f"{'per-keyword re.search':<26} {legacy:8.3f} {legacy / n * 1e6:9.1f} {n / legacy:10.0f}")
+    print(f"{'KeywordMatcher':<26} {compiled:8.3f} {compiled / n * 1e6:9.1f} {n / compiled:10.0f}")
+    print(f"\nSpeed-up: {legacy / compiled:.1f}x")
+    if mismatches:
+        raise SystemExit(f"{mismatches} entries scored differently")
+
+
+if __name__ == "__main__":
+    main()
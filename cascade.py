@@ -0,0 +1,460 @@
+"""
+Confidence-gated LLM cascade for stage 2 of ``mapper.map_all``.
+
+Most entries are easy: an HF dataset with no education keyword at all, a
+paper whose S2 fields of study are all medicine or physics, or a paper
+whose stage-1 scores already point strongly at one category. Sending them
+to the LLM mostly confirms what the heuristics knew. The cascade puts
+every entry in a *stratum* --
+
+    source type | framework score band | on/off-domain fields | tool hit
+
+-- and calibrates, on an existing labelled run (the LLM-classified
+entries of ``output/education_benchmark_mapping.json``), what the LLM
+answered in each stratum. A stratum is decided without the LLM when at
+least ``--target`` of its labelled entries agree with the heuristic
+answer:
+
+  - ``skip-negative``: the LLM flagged them as not a benchmark;
+  - ``skip-positive``: the LLM called them benchmarks and its framework
+    categories overlap the heuristic ones (Jaccard >= 0.5).
+
+Everything else -- the uncertain middle -- is still classified by the
+LLM. Strata with fewer than ``--min-support`` labelled entries always go
+to the LLM. Entries a ``--cascade`` run skipped are labelled from the
+LLM cache where it still holds an answer for them, and a stratum with no
+labelled entries at all keeps its previous decision, so the gates do not
+flip between runs. Gates are saved to ``output/cascade_gates.json``; calibration
+reports the share of LLM calls saved and the agreement with the full-LLM
+labels, both in-sample and on a two-fold holdout.
+
+Usage:
+    uv run cascade.py                      # Calibrate gates on the latest labelled run
+    uv run cascade.py --target 0.98        # Stricter agreement required to skip a stratum
+    uv run main.py --cascade               # Only send uncertain entries to the LLM
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from config import FRAMEWORK
+from details_store import DetailsStore
+from identity import find_s2_detail
+from llm_cache import LLM_CACHE_DB
+from mapper import MIN_SCORE
+from scraper import BenchmarkEntry
+
+CASCADE_GATES = "output/cascade_gates.json"
+REPORT_JSON = "output/education_benchmark_mapping.json"
+DEFAULT_TARGET = 0.95
+DEFAULT_MIN_SUPPORT = 20
+POSITIVE_MIN_JACCARD = 0.5
+
+# Upper bounds of the max framework score bands
+SCORE_BANDS = (
+    (0.5, "none"),
+    (MIN_SCORE, "weak"),
+    (4.0, "moderate"),
+    (6.0, "strong"),
+    (float("inf"), "very-strong"),
+)
+
+# S2 fieldsOfStudy that can hold K-12 / AI-evaluation work; anything else is off-domain
+ON_DOMAIN_FIELDS = {"Computer Science", "Education", "Psychology", "Mathematics", "Linguistics"}
+S2_FIELDS = ON_DOMAIN_FIELDS | {
+    "Medicine", "Chemistry", "Biology", "Materials Science", "Physics", "Geology",
+    "Art", "History", "Geography", "Sociology", "Business", "Political Science",
+    "Economics", "Philosophy", "Engineering", "Environmental Science",
+    "Agricultural and Food Sciences", "Law",
+}
+# scraper.py stores fields as tags ("computer-science")
+_FIELD_TAGS = {f.lower().replace(" ", "-"): f for f in S2_FIELDS}
+
+DECISIONS = ("llm", "skip-negative", "skip-positive")
+
+
+# ── Strata ──────────────────────────────────────────────────────────────────
+
+def fields_of_study(entry: BenchmarkEntry, s2_lookup: DetailsStore | dict | None) -> list[str]:
+    """S2 fields of study of *entry* (from its S2 details, else from its field tags)."""
+    s2 = find_s2_detail(entry.source_url, s2_lookup) if s2_lookup is not None else None
+    if s2 and s2.get("fieldsOfStudy"):
+        return list(s2["fieldsOfStudy"])
+    return [_FIELD_TAGS[t] for t in entry.tags if t in _FIELD_TAGS]
+
+
+def is_off_domain(fields: list[str]) -> bool:
+    """True when an entry has fields of study and none of them is on-domain."""
+    return bool(fields) and not any(f in ON_DOMAIN_FIELDS for f in fields)
+
+
+def _band(score: float) -> str:
+    return next(label for upper, label in SCORE_BANDS if score < upper)
+
+
+def _max_scores(heuristic, group: str) -> np.ndarray:
+    s = heuristic.scores(group)
+    return s.max(axis=1) if s.shape[1] else np.zeros(s.shape[0], dtype=np.float32)
+
+
+def entry_strata(
+    entries: list[BenchmarkEntry],
+    heuristic,
+    s2_lookup: DetailsStore | dict | None = None,
+) -> list[str]:
+    """Stratum key of every entry; *heuristic* is the ``HeuristicScores`` of *entries*."""
+    fw_max = _max_scores(heuristic, "framework")
+    tool_max = _max_scores(heuristic, "tool")
+    return [
+        "|".join((
+            e.source_type,
+            _band(float(fw_max[i])),
+            "off-domain" if is_off_domain(fields_of_study(e, s2_lookup)) else "on-domain",
+            "tool" if tool_max[i] >= MIN_SCORE else "no-tool",
+        ))
+        for i, e in enumerate(entries)
+    ]
+
+
+# ── Labelled runs ───────────────────────────────────────────────────────────
+
+@dataclass
+class Label:
+    """What the LLM answered for one entry of a labelled run."""
+    is_benchmark: bool
+    framework_ids: list[str]
+    tool_types: list[str] = field(default_factory=list)
+    cached: bool = False   # taken from the LLM cache for an entry stage 2 skipped
+
+
+# Tags added by stage 2 (LLM reasoning, skip decisions)
+STAGE2_TAG_PREFIXES = ("llm:", "cascade:", "preclassifier:")
+
+
+def is_stage2_tag(tag: str) -> bool:
+    return tag.startswith(STAGE2_TAG_PREFIXES) or tag == "not-a-benchmark"
+
+
+def is_skip_decided(entry: BenchmarkEntry) -> bool:
+    """Whether the cascade or the pre-classifier kept *entry* away from the LLM."""
+    return any(t.startswith(("cascade:", "preclassifier:")) for t in entry.tags)
+
+
+def _clean(entry: BenchmarkEntry) -> BenchmarkEntry:
+    """Copy of a report entry without the tags stage 2 added (they would feed the keyword scan)."""
+    tags = [t for t in entry.tags if not is_stage2_tag(t)]
+    return BenchmarkEntry(**{**entry.to_dict(), "tags": tags, "framework_ids": [], "tool_types": []})
+
+
+def read_report(path: str = REPORT_JSON) -> list[BenchmarkEntry]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [BenchmarkEntry(**r) for r in json.load(f)]
+
+
+def cached_labels(
+    entries: list[BenchmarkEntry],
+    model: str,
+    cache_path: str = LLM_CACHE_DB,
+) -> dict[int, Label]:
+    """``{index: label}`` for the *entries* the LLM cache still holds a full-LLM answer for."""
+    from details_store import open_details_store
+    from llm_cache import ClassificationCache
+    from mapper import _get_entry_context, classification_fingerprint
+
+    if not entries or not os.path.exists(cache_path):
+        return {}
+    store = open_details_store()
+    cache = ClassificationCache(classification_fingerprint(), cache_path)
+    try:
+        s2_lookup = store if store is not None else {}
+        keys = {i: cache.key(model, _get_entry_context(e, s2_lookup)) for i, e in enumerate(entries)}
+        found = cache.get_many(keys, count=False)
+    finally:
+        cache.close()
+        if store is not None:
+            store.close()
+    return {
+        i: Label(
+            is_benchmark=r.get("is_benchmark", True),
+            framework_ids=[f for f in (r.get("framework_ids") or []) if f in FRAMEWORK],
+            tool_types=list(r.get("tool_types") or []),
+            cached=True,
+        )
+        for i, r in found.items()
+    }
+
+
+def load_labelled_run(
+    path: str = REPORT_JSON,
+    model: Optional[str] = None,
+    cache_path: str = LLM_CACHE_DB,
+) -> tuple[list[BenchmarkEntry], list[Label]]:
+    """
+    LLM-classified entries of a report, reset to their pre-stage-2 state,
+    with the LLM's answers. Entries the cascade or the pre-classifier
+    decided are left out -- unless *model* is given and the LLM cache in
+    *cache_path* still holds that model's answer for them, which then
+    serves as their label (``Label.cached``).
+    """
+    entries: list[BenchmarkEntry] = []
+    labels: list[Label] = []
+    decided: list[BenchmarkEntry] = []
+    for e in read_report(path):
+        if is_skip_decided(e):
+            decided.append(_clean(e))
+            continue
+        negative = "not-a-benchmark" in e.tags
+        if not negative and not any(t.startswith("llm:") for t in e.tags):
+            continue   # never seen by the LLM
+        entries.append(_clean(e))
+        labels.append(Label(
+            is_benchmark=not negative,
+            framework_ids=list(e.framework_ids),
+            tool_types=list(e.tool_types),
+        ))
+    if model:
+        for i, label in sorted(cached_labels(decided, model, cache_path).items()):
+            entries.append(decided[i])
+            labels.append(label)
+    return entries, labels
+
+
+def _jaccard(a: list[str], b: list[str]) -> float:
+    sa, sb = set(a), set(b)
+    return len(sa & sb) / len(sa | sb) if sa | sb else 1.0
+
+
+def agrees(decision: str, label: Label, heuristic_fw: list[str]) -> bool:
+    """Whether skipping with *decision* gives the LLM's answer for this entry."""
+    if decision == "skip-negative":
+        return not label.is_benchmark
+    if decision == "skip-positive":
+        return label.is_benchmark and _jaccard(heuristic_fw, label.framework_ids) >= POSITIVE_MIN_JACCARD
+    return True
+
+
+# ── Gates ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class CascadeGates:
+    """Per-stratum decisions calibrated on a labelled run."""
+    target: float = DEFAULT_TARGET
+    min_support: int = DEFAULT_MIN_SUPPORT
+    created_at: str = ""
+    labelled_entries: int = 0
+    # stratum -> {"n", "negative_rate", "positive_rate", "decision"}
+    strata: dict[str, dict] = field(default_factory=dict)
+
+    def decision(self, stratum: str) -> str:
+        """``llm`` for unknown or uncertain strata, else the calibrated skip."""
+        return self.strata.get(stratum, {}).get("decision", "llm")
+
+    def carry_over(self, previous: "CascadeGates") -> int:
+        """
+        Keep *previous* skip decisions for strata this calibration saw no
+        labelled entry of (their entries skipped the LLM last time); returns
+        how many were kept.
+        """
+        kept = 0
+        for s, info in previous.strata.items():
+            if s not in self.strata and info.get("decision", "llm") != "llm":
+                self.strata[s] = {**info, "carried_over": True}
+                kept += 1
+        return kept
+
+    def to_dict(self) -> dict:
+        return {
+            "target": self.target,
+            "min_support": self.min_support,
+            "created_at": self.created_at,
+            "labelled_entries": self.labelled_entries,
+            "strata": self.strata,
+        }
+
+    def save(self, path: str = CASCADE_GATES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @staticmethod
+    def load(path: str = CASCADE_GATES) -> Optional["CascadeGates"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return CascadeGates(**json.load(f))
+
+
+def calibrate(
+    strata: list[str],
+    labels: list[Label],
+    heuristic_fw: list[list[str]],
+    target: float = DEFAULT_TARGET,
+    min_support: int = DEFAULT_MIN_SUPPORT,
+) -> CascadeGates:
+    """Gates from the strata, LLM labels and heuristic framework IDs of a labelled run."""
+    by_stratum: dict[str, list[int]] = {}
+    for i, s in enumerate(strata):
+        by_stratum.setdefault(s, []).append(i)
+    gates = CascadeGates(
+        target=target,
+        min_support=min_support,
+        created_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        labelled_entries=len(labels),
+    )
+    for s, rows in sorted(by_stratum.items()):
+        n = len(rows)
+        neg = sum(agrees("skip-negative", labels[i], heuristic_fw[i]) for i in rows) / n
+        pos = sum(agrees("skip-positive", labels[i], heuristic_fw[i]) for i in rows) / n
+        decision = "llm"
+        if n >= min_support:
+            if neg >= target and neg >= pos:
+                decision = "skip-negative"
+            elif pos >= target:
+                decision = "skip-positive"
+        gates.strata[s] = {
+            "n": n,
+            "negative_rate": round(neg, 4),
+            "positive_rate": round(pos, 4),
+            "decision": decision,
+        }
+    return gates
+
+
+def evaluate(
+    gates: CascadeGates,
+    strata: list[str],
+    labels: list[Label],
+    heuristic_fw: list[list[str]],
+) -> tuple[int, int]:
+    """``(skipped, skipped entries agreeing with the LLM)`` of *gates* on a labelled set."""
+    skipped = agree = 0
+    for s, label, fw in zip(strata, labels, heuristic_fw):
+        decision = gates.decision(s)
+        if decision != "llm":
+            skipped += 1
+            agree += agrees(decision, label, fw)
+    return skipped, agree
+
+
+def holdout_agreement(
+    strata: list[str],
+    labels: list[Label],
+    heuristic_fw: list[list[str]],
+    target: float = DEFAULT_TARGET,
+    min_support: int = DEFAULT_MIN_SUPPORT,
+) -> tuple[int, int]:
+    """Two-fold (even / odd rows) ``(skipped, agreeing)``: calibrate on one half, score the other."""
+    skipped = agree = 0
+    for fold in (0, 1):
+        train = [i for i in range(len(labels)) if i % 2 == fold]
+        test = [i for i in range(len(labels)) if i % 2 != fold]
+        # Halve the support floor along with the data
+        gates = calibrate(
+            [strata[i] for i in train], [labels[i] for i in train],
+            [heuristic_fw[i] for i in train], target, max(1, min_support // 2),
+        )
+        s, a = evaluate(
+            gates, [strata[i] for i in test], [labels[i] for i in test],
+            [heuristic_fw[i] for i in test],
+        )
+        skipped += s
+        agree += a
+    return skipped, agree
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+
+def cli():
+    from rich.console import Console
+    from rich.table import Table
+
+    from details_store import open_details_store
+    from heuristic_scores import HeuristicScores
+
+    parser = argparse.ArgumentParser(description="Calibrate the stage-2 LLM cascade gates.")
+    parser.add_argument("--report", default=REPORT_JSON,
+                        help=f"Labelled run to calibrate on (default: {REPORT_JSON}).")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET,
+                        help=f"Agreement with the LLM needed to skip a stratum (default: {DEFAULT_TARGET}).")
+    parser.add_argument("--min-support", type=int, default=DEFAULT_MIN_SUPPORT,
+                        help=f"Labelled entries a stratum needs to be skipped (default: {DEFAULT_MIN_SUPPORT}).")
+    parser.add_argument("--path", default=CASCADE_GATES, help=f"Gates file (default: {CASCADE_GATES}).")
+    parser.add_argument("--model", default="claude-haiku-4-5-20251001",
+                        help="Model whose cached LLM answers label entries a --cascade run skipped "
+                             "(default: claude-haiku-4-5-20251001).")
+    parser.add_argument("--llm-cache", default=LLM_CACHE_DB,
+                        help=f"LLM classification cache (default: {LLM_CACHE_DB}).")
+    args = parser.parse_args()
+    console = Console()
+
+    entries, labels = load_labelled_run(args.report, model=args.model, cache_path=args.llm_cache)
+    if not entries:
+        console.print(f"[red]No LLM-labelled entries in {args.report} -- run main.py with the LLM first.[/red]")
+        return
+    decided = sum(is_skip_decided(e) for e in read_report(args.report))
+    if decided:
+        from_cache = sum(l.cached for l in labels)
+        console.print(
+            f"{decided} entries of {args.report} were decided by the cascade or the pre-filter; "
+            f"[green]{from_cache}[/green] labelled from cached LLM answers"
+            + (f", [yellow]{decided - from_cache} left out[/yellow] (no cached answer)"
+               if decided > from_cache else "")
+        )
+
+    heuristic = HeuristicScores.build(entries)
+    heuristic_fw = heuristic.mapped("framework", MIN_SCORE)
+    store = open_details_store()
+    try:
+        strata = entry_strata(entries, heuristic, store)
+    finally:
+        if store is not None:
+            store.close()
+
+    gates = calibrate(strata, labels, heuristic_fw, args.target, args.min_support)
+    previous = CascadeGates.load(args.path)
+    kept = gates.carry_over(previous) if previous is not None else 0
+    gates.save(args.path)
+
+    table = Table(title=f"Cascade strata ({len(entries)} labelled entries, target {args.target:.0%})")
+    for col, justify in (("Stratum", "left"), ("Entries", "right"), ("LLM negative", "right"),
+                         ("Heuristic agrees", "right"), ("Decision", "left")):
+        table.add_column(col, justify=justify)
+    for s, info in sorted(gates.strata.items(), key=lambda kv: -kv[1]["n"]):
+        style = "" if info["decision"] == "llm" else "green"
+        decision = info["decision"] + (" (kept)" if info.get("carried_over") else "")
+        table.add_row(s, str(info["n"]), f"{info['negative_rate']:.0%}",
+                      f"{info['positive_rate']:.0%}", decision, style=style)
+    console.print(table)
+    if kept:
+        console.print(
+            f"[yellow]{kept} strata had no labelled entries this time and keep their "
+            f"previous decision (marked 'kept').[/yellow]"
+        )
+
+    skipped, agree = evaluate(gates, strata, labels, heuristic_fw)
+    h_skipped, h_agree = holdout_agreement(strata, labels, heuristic_fw, args.target, args.min_support)
+    n = len(labels)
+    console.print(
+        f"LLM calls saved: [green]{skipped}/{n}[/green] entries ({skipped / n:.0%}); "
+        f"agreement with full-LLM output: {(n - skipped + agree) / n:.1%} overall, "
+        f"{agree / skipped:.1%} on skipped entries" if skipped else
+        "No stratum is confident enough to skip -- every entry still goes to the LLM."
+    )
+    if h_skipped:
+        console.print(
+            f"Two-fold holdout: {h_skipped / n:.0%} skipped, "
+            f"{h_agree / h_skipped:.1%} of them agree with the LLM"
+        )
+    console.print(f"Gates saved to [dim]{args.path}[/dim]")
+
+
+if __name__ == "__main__":
+    cli()
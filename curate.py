@@ -21,8 +21,10 @@ import re
 import sys
 from pathlib import Path
 
+from details_store import DetailsStore, open_details_store
+from identity import find_s2_detail
+
 PIPELINE_JSON = "output/education_benchmark_mapping.json"
-S2_DETAILS_JSON = "output/s2_paper_details.json"
 PAPER_SCORES_JSON = "output/paper_scores.json"
 WEBSITE_BENCHMARKS_TS = "website/src/lib/data/benchmarks.ts"
 WEBSITE_BENCHMARKS_JSON = "website/static/benchmarks.json"
@@ -81,55 +83,18 @@ def save_archived_dismissed(slugs: set[str]):
     print(f"Archived {len(slugs)} dismissed slugs -> {DISMISSED_ARCHIVE}")
 
 
-def _build_s2_lookup(s2_details: list[dict]) -> dict[str, dict]:
-    """Build a lookup dict from S2 paper details, indexed by paper ID and ArXiv ID."""
-    lookup: dict[str, dict] = {}
-    for paper in s2_details:
-        if not paper:
-            continue
-        pid = paper.get("paperId", "")
-        if pid:
-            lookup[pid] = paper
-        ext_ids = paper.get("externalIds") or {}
-        arxiv_id = ext_ids.get("ArXiv", "")
-        if arxiv_id:
-            lookup[f"arxiv:{arxiv_id.lower()}"] = paper
-            lookup[arxiv_id.lower()] = paper
-    return lookup
-
-
-def _find_s2_detail(source_url: str, s2_lookup: dict[str, dict]) -> dict | None:
-    """Try to find the S2 paper detail for an entry by its source URL."""
-    if "semanticscholar.org/paper/" in source_url:
-        pid = source_url.split("/paper/")[-1].split("/")[0].split("?")[0]
-        if pid in s2_lookup:
-            return s2_lookup[pid]
-    if "arxiv.org/abs/" in source_url:
-        arxiv_id = source_url.split("/abs/")[-1].split("?")[0]
-        arxiv_id = re.sub(r"v\d+$", "", arxiv_id).lower()
-        for key in [arxiv_id, f"arxiv:{arxiv_id}"]:
-            if key in s2_lookup:
-                return s2_lookup[key]
-    # HuggingFace paper URLs contain arXiv IDs (e.g. /papers/2402.08070)
-    if "huggingface.co/papers/" in source_url:
-        hf_id = source_url.split("/papers/")[-1].split("?")[0]
-        for key in [hf_id.lower(), f"arxiv:{hf_id.lower()}"]:
-            if key in s2_lookup:
-                return s2_lookup[key]
-    return None
+def _find_s2_detail(source_url: str, s2_lookup: DetailsStore | dict[str, dict]) -> dict | None:
+    """Try to find the S2 paper detail for an entry by its source URL (S2, arXiv, HF papers, DOI)."""
+    return find_s2_detail(source_url, s2_lookup)
 
 
-def load_s2_details() -> dict[str, dict]:
-    """Load S2 paper details and build a lookup dict. Returns empty dict if unavailable."""
-    if not os.path.exists(S2_DETAILS_JSON):
-        return {}
-    with open(S2_DETAILS_JSON, "r", encoding="utf-8") as f:
-        details = json.load(f)
-    if not isinstance(details, list):
+def load_s2_details() -> DetailsStore | dict[str, dict]:
+    """Open the S2 paper details store for keyed lookups. Returns empty dict if unavailable."""
+    store = open_details_store()
+    if store is None:
         return {}
-    lookup = _build_s2_lookup(details)
-    print(f"Loaded {len(details)} S2 paper details ({len(lookup)} lookup keys)")
-    return lookup
+    print(f"Opened {len(store)} S2 paper details in {store.path}")
+    return store
 
 
 def load_paper_scores() -> dict[str, dict]:
@@ -152,7 +117,7 @@ def load_paper_scores() -> dict[str, dict]:
         return {}
 
 
-def _find_paper_score(source_url: str, s2_lookup: dict[str, dict], scores_lookup: dict[str, dict]) -> dict | None:
+def _find_paper_score(source_url: str, s2_lookup: DetailsStore | dict[str, dict], scores_lookup: dict[str, dict]) -> dict | None:
     """Try to find the paper score for an entry by resolving its S2 paper ID."""
     # First find the S2 detail to get the paper ID
     s2 = _find_s2_detail(source_url, s2_lookup)
@@ -165,7 +130,7 @@ def _find_paper_score(source_url: str, s2_lookup: dict[str, dict], scores_lookup
 
 def generate_benchmarks_json(
     entries: list[dict],
-    s2_lookup: dict[str, dict] | None = None,
+    s2_lookup: DetailsStore | dict[str, dict] | None = None,
     scores_lookup: dict[str, dict] | None = None,
 ) -> list[dict]:
     """Generate benchmark JSON data from pipeline entries, enriched with S2 details and paper scores."""
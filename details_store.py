@@ -0,0 +1,160 @@
+"""
+Keyed on-disk store for Semantic Scholar paper details.
+
+Replaces ``output/s2_paper_details.json``, which was re-serialised in full
+after every 500-paper batch and loaded whole by every consumer:
+
+  - SQLite file (``output/s2_paper_details.db``), one row per paper with
+    indexed ``paperId``, arXiv ID and DOI columns, so lookups are O(1)
+    and writes only touch the new rows.
+  - Dict-like reads: ``key in store`` / ``store[key]`` / ``store.get(key)``
+    accept a paperId, ``arxiv:<id>`` / ``ArXiv:<id>`` (the S2 batch-API
+    form), ``doi:<doi>``, or a bare arXiv ID -- the same keys the old
+    in-memory lookups used, so ``_find_s2_detail`` works unchanged.
+  - The first open migrates an existing ``s2_paper_details.json``.
+
+Usage:
+    from details_store import open_details_store
+    store = open_details_store()          # None if nothing was fetched yet
+    detail = store.get("ArXiv:2402.08070")
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterator, Optional
+
+DETAILS_DB = "output/s2_paper_details.db"
+LEGACY_DETAILS_JSON = "output/s2_paper_details.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id TEXT PRIMARY KEY,
+    arxiv_id TEXT,
+    doi      TEXT,
+    data     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_arxiv ON papers (arxiv_id);
+CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers (doi);
+"""
+
+_ARXIV_VERSION = re.compile(r"v\d+$")
+
+
+def _normalise_arxiv(arxiv_id: str) -> str:
+    return _ARXIV_VERSION.sub("", arxiv_id.strip().lower())
+
+
+class DetailsStore:
+    """SQLite-backed S2 paper details, indexed by paperId, arXiv ID and DOI."""
+
+    def __init__(self, path: str = DETAILS_DB, legacy_json: str = LEGACY_DETAILS_JSON):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if legacy_json and len(self) == 0 and os.path.exists(legacy_json):
+            self._migrate(legacy_json)
+
+    def _migrate(self, legacy_json: str):
+        try:
+            with open(legacy_json, "r", encoding="utf-8") as f:
+                details = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        if isinstance(details, list):
+            added = self.add_many(details)
+            print(f"  Migrated {added} paper details from {legacy_json} -> {self.path}")
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    def add_many(self, papers: list[dict]) -> int:
+        """Insert (or replace) S2 detail records in one transaction; returns rows written."""
+        rows = []
+        for p in papers:
+            if not p or not p.get("paperId"):
+                continue
+            ext = p.get("externalIds") or {}
+            arxiv = ext.get("ArXiv") or ""
+            doi = ext.get("DOI") or ""
+            rows.append((
+                p["paperId"],
+                _normalise_arxiv(arxiv) if arxiv else None,
+                doi.lower() if doi else None,
+                json.dumps(p, ensure_ascii=False),
+            ))
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO papers (paper_id, arxiv_id, doi, data) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    # ── Reads ────────────────────────────────────────────────────────────
+
+    def _query(self, sql: str, arg: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(sql, (arg,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, key: str, default: Optional[dict] = None) -> Optional[dict]:
+        """Look a paper up by paperId, ``arxiv:<id>``, ``doi:<doi>`` or bare arXiv ID."""
+        if not key:
+            return default
+        prefix, sep, rest = key.partition(":")
+        prefix = prefix.lower()
+        if sep and prefix == "arxiv":
+            found = self._query("SELECT data FROM papers WHERE arxiv_id = ?", _normalise_arxiv(rest))
+        elif sep and prefix == "doi":
+            found = self._query("SELECT data FROM papers WHERE doi = ?", rest.strip().lower())
+        else:
+            found = (
+                self._query("SELECT data FROM papers WHERE paper_id = ?", key)
+                or self._query("SELECT data FROM papers WHERE arxiv_id = ?", _normalise_arxiv(key))
+            )
+        return found if found is not None else default
+
+    def __getitem__(self, key: str) -> dict:
+        found = self.get(key)
+        if found is None:
+            raise KeyError(key)
+        return found
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def __iter__(self) -> Iterator[dict]:
+        """Stream every stored detail record."""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM papers ORDER BY rowid").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def missing(self, ids: list[str]) -> list[str]:
+        """The subset of S2 batch-API IDs (paperId / ``ArXiv:<id>``) not stored yet."""
+        return [i for i in ids if i not in self]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_details_store(
+    path: str = DETAILS_DB,
+    legacy_json: str = LEGACY_DETAILS_JSON,
+) -> Optional[DetailsStore]:
+    """Open the store if it (or the legacy JSON to migrate from) exists, else None."""
+    if not os.path.exists(path) and not os.path.exists(legacy_json):
+        return None
+    return DetailsStore(path, legacy_json)
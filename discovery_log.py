@@ -0,0 +1,262 @@
+"""
+Crash-safe, append-only log of discovered entries.
+
+Discovery used to keep every ``BenchmarkEntry`` in memory and ``json.dump``
+them once the whole search had finished, so a crash on query 90 of 100
+threw away every API call made so far. Instead, the search engines now
+stream into two JSONL files:
+
+  - ``output/scraped_entries.jsonl`` -- one de-duplicated entry per line,
+    appended the moment it is found;
+  - ``output/discovery_units.jsonl`` -- one line per finished page of a
+    (query, provider) unit with the cursor to continue from (S2
+    continuation token / HF offset), plus a final ``done`` line per unit.
+
+Lines are flushed immediately and ``fsync``-ed every ``FSYNC_EVERY``
+writes or ``FSYNC_INTERVAL`` seconds. A unit's cursor is only written
+after that page's entries, so resuming never loses results (replayed
+pages are de-duplicated by canonical ID). A torn last line from a crash is trimmed
+when the log is reopened.
+
+Usage:
+    uv run main.py --resume          # Continue an interrupted search
+    uv run main.py --skip-search     # Reads the JSONL lazily
+
+    from discovery_log import iter_scraped_entries
+    for entry in iter_scraped_entries(): ...
+"""
+
+import json
+import os
+import time
+from typing import Iterator, Optional
+
+from identity import IdentityIndex
+from scraper import BenchmarkEntry, PageCursor
+
+ENTRIES_PATH = "output/scraped_entries.jsonl"
+UNITS_PATH = "output/discovery_units.jsonl"
+LEGACY_CACHE_PATH = "output/scraped_cache.json"   # pre-JSONL snapshot
+
+FSYNC_EVERY = 100
+FSYNC_INTERVAL = 5.0
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+def _iter_jsonl(path: str) -> Iterator[dict]:
+    """Yield records from a JSONL file, skipping a torn or corrupt line."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def iter_scraped_entries(
+    path: str = ENTRIES_PATH,
+    fallback_path: str = LEGACY_CACHE_PATH,
+) -> Iterator[BenchmarkEntry]:
+    """
+    Lazily yield scraped entries, de-duplicated by canonical identity.
+
+    Falls back to the old ``scraped_cache.json`` array when no JSONL log
+    exists yet. Yields nothing if neither file exists.
+    """
+    seen = IdentityIndex()
+    if os.path.exists(path):
+        records: Iterator[dict] = _iter_jsonl(path)
+    elif os.path.exists(fallback_path):
+        with open(fallback_path, "r", encoding="utf-8") as f:
+            records = iter(json.load(f))
+    else:
+        return
+    for r in records:
+        if seen.add(r.get("source_url", "")):
+            yield BenchmarkEntry(**r)
+
+
+def scraped_entries_exist(
+    path: str = ENTRIES_PATH,
+    fallback_path: str = LEGACY_CACHE_PATH,
+) -> bool:
+    return os.path.exists(path) or os.path.exists(fallback_path)
+
+
+def _trim_torn_tail(path: str):
+    """Cut a partially written last line left behind by a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline
+        pos = size - 1
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx >= 0:
+                f.truncate(pos - step + idx + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+# ── Writing ──────────────────────────────────────────────────────────────────
+
+class DiscoveryLog:
+    """
+    Append-only sink for one discovery run.
+
+    Modes:
+      - ``"new"``     start from scratch (truncate both files);
+      - ``"append"``  keep earlier entries, start a fresh unit log
+                      (``--incremental``); migrates ``scraped_cache.json``
+                      into the JSONL the first time;
+      - ``"resume"``  keep both files and continue unfinished units.
+    """
+
+    def __init__(
+        self,
+        mode: str = "new",
+        entries_path: str = ENTRIES_PATH,
+        units_path: str = UNITS_PATH,
+        fsync_every: int = FSYNC_EVERY,
+        fsync_interval: float = FSYNC_INTERVAL,
+    ):
+        if mode not in ("new", "append", "resume"):
+            raise ValueError(f"Unknown discovery log mode: {mode!r}")
+        self.mode = mode
+        self.entries_path = entries_path
+        self.units_path = units_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._units: dict[tuple[str, str], dict] = {}
+
+        for path in (entries_path, units_path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        migrate: list[dict] = []
+        if mode == "append" and not os.path.exists(entries_path) and os.path.exists(LEGACY_CACHE_PATH):
+            with open(LEGACY_CACHE_PATH, "r", encoding="utf-8") as f:
+                migrate = json.load(f)
+
+        if mode == "new":
+            entries_mode, units_mode = "w", "w"
+        elif mode == "append":
+            entries_mode, units_mode = "a", "w"
+        else:
+            entries_mode, units_mode = "a", "a"
+            _trim_torn_tail(entries_path)
+            _trim_torn_tail(units_path)
+            if os.path.exists(units_path):
+                for rec in _iter_jsonl(units_path):
+                    self._units[(rec["query"], rec["provider"])] = rec
+
+        self._entries_f = open(entries_path, entries_mode, encoding="utf-8")
+        self._units_f = open(units_path, units_mode, encoding="utf-8")
+
+        for r in migrate:
+            self._entries_f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        if migrate:
+            self.sync()
+
+    # ── Entries ──────────────────────────────────────────────────────────
+
+    def append(self, entry: BenchmarkEntry):
+        """Append one newly discovered entry."""
+        self._write(self._entries_f, entry.to_dict())
+
+    def entries(self) -> Iterator[BenchmarkEntry]:
+        """Entries written so far (including earlier runs in append/resume mode)."""
+        self._entries_f.flush()
+        return iter_scraped_entries(self.entries_path, fallback_path="")
+
+    # ── Units ────────────────────────────────────────────────────────────
+
+    def record_page(self, query: str, provider: str, cursor: PageCursor):
+        """Record that a page finished; call after its entries were appended."""
+        rec = {
+            "query": query,
+            "provider": provider,
+            "page": cursor.page,
+            "cursor": cursor.cursor,
+            "fetched": cursor.fetched,
+            "done": cursor.cursor is None,
+        }
+        self._units[(query, provider)] = rec
+        self._write(self._units_f, rec)
+
+    def mark_done(self, query: str, provider: str):
+        """Record that a whole (query, provider) unit finished."""
+        prev = self._units.get((query, provider), {})
+        rec = {
+            "query": query,
+            "provider": provider,
+            "page": prev.get("page", 0),
+            "cursor": None,
+            "fetched": prev.get("fetched", 0),
+            "done": True,
+        }
+        self._units[(query, provider)] = rec
+        self._write(self._units_f, rec)
+
+    def is_done(self, query: str, provider: str) -> bool:
+        return bool(self._units.get((query, provider), {}).get("done"))
+
+    def progress(self, query: str, provider: str) -> Optional[PageCursor]:
+        """Cursor to resume an unfinished unit from, or None to start fresh."""
+        rec = self._units.get((query, provider))
+        if not rec or rec.get("done") or rec.get("cursor") is None:
+            return None
+        return PageCursor(rec["page"], rec["cursor"], rec["fetched"])
+
+    @property
+    def units_done(self) -> int:
+        return sum(1 for rec in self._units.values() if rec.get("done"))
+
+    # ── Durability ───────────────────────────────────────────────────────
+
+    def _write(self, f, record: dict):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        self._unsynced += 1
+        if (
+            self._unsynced >= self.fsync_every
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self.sync()
+
+    def sync(self):
+        """Force both files to disk."""
+        for f in (self._entries_f, self._units_f):
+            f.flush()
+            os.fsync(f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._entries_f.closed:
+            return
+        self.sync()
+        self._entries_f.close()
+        self._units_f.close()
+
+    def __enter__(self) -> "DiscoveryLog":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,28 +2,46 @@
 Download full-text PDFs for all papers in the education benchmark mapping.
 
 Features:
-  - Parallel downloads (configurable concurrency)
+  - Parallel downloads (configurable concurrency), scheduled per host:
+    round-robin across hosts, per-host concurrency caps and rate limits,
+    --workers as the global connection cap (host_scheduler.py)
   - Progress bar with ETA (via rich)
   - Resume support: skips already-downloaded files
-  - Incremental manifest (papers_manifest.json) tracks status of every paper
+  - Manifest (papers_manifest.json) tracks status of every paper; each
+    finished download is appended to a journal at once and folded into
+    the snapshot in the background (manifest_journal.py)
   - Graceful error handling with retries
+  - Streaming writes: each PDF is streamed in chunks into a ``.part`` file,
+    checked, then atomically renamed -- memory stays flat and a killed run
+    never leaves a truncated ``.pdf``. Responses that do not start with
+    ``%PDF-`` or exceed --max-size-mb are aborted early
+  - Range resume: interrupted downloads keep their ``.part`` file and
+    continue from the last byte (``Range`` / ``If-Range``, checked against
+    ``Content-Length`` and ETag), within a run and across runs
+  - Peak RSS reported before and after the run
+  - Two engines: worker threads (default), or ``--engine async`` --
+    coroutines on one event loop with an ``httpx.AsyncClient``
+    (async_download.py), for hundreds of transfers in flight. Both share
+    the resume, checking and retry rules in pdf_transfer.py
 
 Usage:
-    uv run download_papers.py                    # Download all (default 20 workers)
+    uv run download_papers.py                    # Download all (default 20 worker threads)
     uv run download_papers.py --workers 10       # Fewer concurrent downloads
+    uv run download_papers.py --engine async     # asyncio engine (default 200 in flight)
     uv run download_papers.py --limit 100        # Download only first 100
     uv run download_papers.py --dry-run          # Show what would be downloaded
+    uv run download_papers.py --max-size-mb 50   # Skip PDFs larger than 50 MB
 """
 
 import argparse
 import json
-import os
+import queue
 import re
+import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import httpx
 from rich.console import Console
@@ -37,36 +55,60 @@ from rich.progress import (
     TransferSpeedColumn,
 )
 
+from details_store import open_details_store
+from host_scheduler import HostScheduler
+from identity import find_s2_detail
+from manifest_journal import ManifestJournal, read_manifest
+from pdf_transfer import (
+    CHUNK_SIZE,
+    MAX_PDF_MB,
+    MAX_RETRIES,
+    STREAM,
+    TIMEOUT,
+    PaperDownload,
+    Plan,
+    _Abort,
+    _already_downloaded,
+    _finish,
+    _give_up,
+    _keep_trying,
+    _on_error,
+    _open_part,
+    _range_headers,
+    _resume_point,
+    part_path,
+    plan_response,
+)
+from ratelimit import limited_stream
+
 # ── Config ────────────────────────────────────────────────────────────────────
 
 PAPERS_DIR = Path("output/papers")
 MANIFEST_PATH = Path("output/papers_manifest.json")
-S2_DETAILS_PATH = Path("output/s2_paper_details.json")
 MAPPING_PATH = Path("output/education_benchmark_mapping.json")
 
-MAX_RETRIES = 3
-TIMEOUT = 60  # seconds per request
-USER_AGENT = "edu-benchmark-mapper/0.1 (research tool; bulk PDF download)"
+# Default global connection cap per engine (--workers)
+DEFAULT_WORKERS = {"threads": 20, "async": 200}
 
 console = Console()
 
 
-# ── Data structures ───────────────────────────────────────────────────────────
+# ── Helpers ───────────────────────────────────────────────────────────────────
 
-@dataclass
-class PaperDownload:
-    """Tracks a single paper's download state."""
-    paper_id: str
-    title: str
-    pdf_url: str
-    source: str  # "openAccessPdf" | "arxiv"
-    filename: str
-    status: str = "pending"  # "pending" | "downloaded" | "failed" | "skipped"
-    error: str = ""
-    size_bytes: int = 0
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where ``resource`` is unavailable)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
 
 
-# ── Helpers ───────────────────────────────────────────────────────────────────
+def _format_rss(mb: Optional[float]) -> str:
+    return f"{mb:.0f} MB" if mb is not None else "n/a"
+
 
 def sanitise_filename(title: str, max_len: int = 120) -> str:
     """Create a filesystem-safe filename from a paper title."""
@@ -89,35 +131,18 @@ def build_download_list() -> list[PaperDownload]:
     with open(MAPPING_PATH, "r", encoding="utf-8") as f:
         benchmarks = json.load(f)
 
-    with open(S2_DETAILS_PATH, "r", encoding="utf-8") as f:
-        s2_details = json.load(f)
-
-    # Build lookups
-    by_pid: dict[str, dict] = {}
-    by_arxiv: dict[str, dict] = {}
-    for p in s2_details:
-        pid = p.get("paperId", "")
-        if pid:
-            by_pid[pid] = p
-        arxiv = (p.get("externalIds") or {}).get("ArXiv", "")
-        if arxiv:
-            by_arxiv[arxiv] = p
+    store = open_details_store()
+    if store is None:
+        console.print("[red]No S2 paper details found. Run 'uv run main.py' first.[/red]")
+        return []
 
     papers = [b for b in benchmarks if b.get("source_type") == "paper"]
     downloads: list[PaperDownload] = []
     seen_ids: set[str] = set()
 
     for paper in papers:
-        url = paper.get("source_url", "")
-        detail = None
-
-        # Match to S2 detail record
-        if "semanticscholar.org/paper/" in url:
-            pid = url.split("/paper/")[-1].split("/")[0].split("?")[0]
-            detail = by_pid.get(pid)
-        elif "arxiv.org/abs/" in url:
-            aid = url.split("/abs/")[-1].split("?")[0]
-            detail = by_arxiv.get(aid)
+        # Match to S2 detail record (S2, arXiv any version, HF papers, DOI)
+        detail = find_s2_detail(paper.get("source_url", ""), store)
 
         if not detail:
             continue
@@ -155,6 +180,7 @@ def build_download_list() -> list[PaperDownload]:
             filename=filename,
         ))
 
+    store.close()
     console.print(f"  Papers in mapping: [cyan]{len(papers)}[/cyan]")
     console.print(f"  Downloadable PDFs: [green]{len(downloads)}[/green]")
 
@@ -164,91 +190,102 @@ def build_download_list() -> list[PaperDownload]:
 # ── Manifest (tracks state across runs) ───────────────────────────────────────
 
 def load_manifest() -> dict[str, dict]:
-    """Load the download manifest from disk, or return empty dict."""
-    if MANIFEST_PATH.exists():
-        try:
-            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return {item["paper_id"]: item for item in data}
-        except (json.JSONDecodeError, KeyError, OSError):
-            pass
-    return {}
+    """The download manifest (snapshot + journal, see manifest_journal.py), or an empty dict."""
+    return read_manifest(MANIFEST_PATH)
+
 
+# ── Download logic ────────────────────────────────────────────────────────────
 
-def save_manifest(manifest: dict[str, dict]):
-    """Save the download manifest to disk."""
-    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
-    items = list(manifest.values())
-    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
-        json.dump(items, f, indent=2, ensure_ascii=False)
+def _stream_to_file(r: httpx.Response, part: Path, max_bytes: int, plan: Plan) -> int:
+    """Stream the body of *r* into *part* (see ``_PartWriter``); returns the file's total size."""
+    with _open_part(plan, r.headers, part, max_bytes) as w:
+        for chunk in r.iter_bytes(CHUNK_SIZE):
+            w.write(chunk)
+        return w.finish()
 
 
-# ── Download logic ────────────────────────────────────────────────────────────
+def download_one(
+    paper: PaperDownload,
+    client: httpx.Client,
+    max_bytes: int = MAX_PDF_MB * 1024 ** 2,
+    prepaid: bool = False,
+) -> PaperDownload:
+    """
+    Download a single PDF. Returns the updated PaperDownload.
+
+    The body is streamed into ``<filename>.part`` and only renamed to
+    ``<filename>`` once it is complete and starts with ``%PDF-``.
+
+    When the server advertises ``Accept-Ranges: bytes``, an interrupted
+    transfer keeps its ``.part`` file plus a ``.part.json`` with the
+    ``Content-Length`` / ETag / Last-Modified it was started with; the
+    next attempt (in this run or a later one) asks only for the missing
+    bytes with ``Range`` + ``If-Range``. A 206 whose ``Content-Range``
+    does not line up with the saved length, or a 200 answer (the file
+    changed), restarts from byte zero.
 
-def download_one(paper: PaperDownload, client: httpx.Client) -> PaperDownload:
-    """Download a single PDF. Returns the updated PaperDownload."""
+    *prepaid*: the scheduler already took the rate-limit token for the
+    first request.
+    """
     dest = PAPERS_DIR / paper.filename
+    part = part_path(dest)
 
-    # Already downloaded?
-    if dest.exists() and dest.stat().st_size > 1000:
-        paper.status = "downloaded"
-        paper.size_bytes = dest.stat().st_size
+    if _already_downloaded(paper, dest):
         return paper
 
     for attempt in range(MAX_RETRIES):
+        offset, state = _resume_point(part, paper.pdf_url)
+        if state and offset == state.content_length:
+            return _finish(paper, dest, offset)   # complete, but the run died before the rename
+
         try:
-            r = client.get(
-                paper.pdf_url,
+            with limited_stream(
+                client, "GET", paper.pdf_url,
+                prepaid=prepaid and attempt == 0,
                 follow_redirects=True,
                 timeout=TIMEOUT,
-                headers={"User-Agent": USER_AGENT},
-            )
-
-            if r.status_code == 200:
-                content_type = r.headers.get("content-type", "")
-                # Verify we got a PDF, not an HTML error page
-                if "pdf" in content_type or r.content[:5] == b"%PDF-":
-                    dest.write_bytes(r.content)
-                    paper.status = "downloaded"
-                    paper.size_bytes = len(r.content)
-                    return paper
-                else:
-                    paper.error = f"Not a PDF (content-type: {content_type})"
-                    paper.status = "failed"
-                    return paper
-
-            if r.status_code == 429:
-                wait = min(2 ** (attempt + 1), 30)
-                time.sleep(wait)
-                continue
-
-            if r.status_code in (403, 451):
-                paper.error = f"Access denied (HTTP {r.status_code})"
-                paper.status = "failed"
-                return paper
-
-            paper.error = f"HTTP {r.status_code}"
-
-        except httpx.TimeoutException:
-            paper.error = "Timeout"
-            time.sleep(2)
-        except httpx.HTTPError as e:
-            paper.error = str(e)[:200]
-            time.sleep(1)
-
-    paper.status = "failed"
-    return paper
+                headers=_range_headers(offset, state),
+            ) as r:
+                plan = plan_response(paper.pdf_url, r.status_code, r.headers, offset, state)
+                if plan.action == STREAM:
+                    size = _stream_to_file(r, part, max_bytes, plan)
+                    return _finish(paper, dest, size, resumed=plan.offset)
+            if not _keep_trying(plan, paper, part):
+                break
+        except (_Abort, httpx.HTTPError) as e:
+            pause = _on_error(e, paper, part)
+            if pause is None:
+                break
+            time.sleep(pause)
+
+    return _give_up(paper, part)
 
 
 def run_downloads(
     downloads: list[PaperDownload],
-    max_workers: int = 20,
+    max_workers: Optional[int] = None,
     limit: Optional[int] = None,
     dry_run: bool = False,
+    max_size_mb: float = MAX_PDF_MB,
+    engine: str = "threads",
+    host_concurrency: Optional[int] = None,
 ):
-    """Download PDFs in parallel with progress tracking and manifest saving."""
+    """
+    Download PDFs in parallel with progress tracking and manifest saving.
+
+    *engine*: ``"threads"`` (a worker thread per connection) or ``"async"``
+    (coroutines on one event loop, async_download.py). *max_workers* is the
+    global connection cap (default: ``DEFAULT_WORKERS[engine]``);
+    *host_concurrency* overrides every per-host cap.
+    """
+    if engine not in DEFAULT_WORKERS:
+        raise ValueError(f"Unknown download engine: {engine!r}")
+    max_workers = max_workers or DEFAULT_WORKERS[engine]
     PAPERS_DIR.mkdir(parents=True, exist_ok=True)
-    manifest = load_manifest()
+    max_bytes = int(max_size_mb * 1024 ** 2)
+    rss_before = peak_rss_mb()
+    journal = ManifestJournal(MANIFEST_PATH)
+    manifest = journal.index
 
     # Filter out already-downloaded papers
     pending: list[PaperDownload] = []
@@ -265,11 +302,21 @@ def run_downloads(
         pending = pending[:limit]
 
     console.print(f"\n[bold]Download plan:[/bold]")
+    resumable = sum(1 for p in pending if part_path(PAPERS_DIR / p.filename).exists())
     console.print(f"  Already downloaded: [green]{already_done}[/green]")
+    if resumable:
+        console.print(f"  Partial (resume):   [yellow]{resumable}[/yellow]")
     console.print(f"  To download:        [cyan]{len(pending)}[/cyan]")
-    console.print(f"  Workers:            [yellow]{max_workers}[/yellow]")
+    console.print(f"  Engine:             [yellow]{engine}[/yellow]")
+    console.print(f"  Workers:            [yellow]{max_workers}[/yellow] (global connection cap)")
+    if host_concurrency:
+        console.print(f"  Per-host cap:       [yellow]{host_concurrency}[/yellow]")
+    console.print(f"  Size cap:           [yellow]{max_size_mb:g} MB[/yellow] per file")
     console.print(f"  Output dir:         [dim]{PAPERS_DIR}[/dim]\n")
 
+    if dry_run or not pending:
+        journal.close(compact=False)
+
     if dry_run:
         console.print("[yellow]Dry run — no files will be downloaded.[/yellow]")
         for p in pending[:20]:
@@ -285,70 +332,120 @@ def run_downloads(
     downloaded = 0
     failed = 0
     total_bytes = 0
-    save_every = 50  # Save manifest every N completions
-
-    with httpx.Client() as client:
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold blue]{task.description}"),
-            BarColumn(bar_width=40),
-            MofNCompleteColumn(),
-            TextColumn("•"),
-            TransferSpeedColumn(),
-            TextColumn("•"),
-            TimeRemainingColumn(),
-            console=console,
-        ) as progress:
-            task = progress.add_task("Downloading papers", total=len(pending))
-
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {
-                    executor.submit(download_one, paper, client): paper
-                    for paper in pending
-                }
-
-                for future in as_completed(futures):
-                    result = future.result()
-                    completed_count = downloaded + failed + 1
-
-                    # Update manifest
-                    manifest[result.paper_id] = {
-                        "paper_id": result.paper_id,
-                        "title": result.title,
-                        "pdf_url": result.pdf_url,
-                        "source": result.source,
-                        "filename": result.filename,
-                        "status": result.status,
-                        "error": result.error,
-                        "size_bytes": result.size_bytes,
-                    }
-
-                    if result.status == "downloaded":
-                        downloaded += 1
-                        total_bytes += result.size_bytes
-                    else:
-                        failed += 1
-
-                    progress.update(task, advance=1, completed=completed_count)
-
-                    # Incremental manifest save
-                    if completed_count % save_every == 0:
-                        save_manifest(manifest)
-
-    # Final manifest save
-    save_manifest(manifest)
+    resumed = 0
+    resumed_bytes = 0
+
+    # Workers take papers from the host-aware scheduler
+    if host_concurrency:
+        scheduler = HostScheduler(
+            pending, url_of=lambda p: p.pdf_url,
+            host_concurrency={}, default_concurrency=host_concurrency,
+        )
+    else:
+        scheduler = HostScheduler(pending, url_of=lambda p: p.pdf_url)
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(bar_width=40),
+        MofNCompleteColumn(),
+        TextColumn("•"),
+        TransferSpeedColumn(),
+        TextColumn("•"),
+        TimeRemainingColumn(),
+        console=console,
+    ) as progress:
+        task = progress.add_task("Downloading papers", total=len(pending))
+
+        def record(result: PaperDownload):
+            """Fold one finished download into the manifest and progress bar (one caller at a time)."""
+            nonlocal downloaded, failed, total_bytes, resumed, resumed_bytes
+            completed_count = downloaded + failed + 1
+
+            # Append the paper's new record to the manifest journal
+            journal.record({
+                "paper_id": result.paper_id,
+                "title": result.title,
+                "pdf_url": result.pdf_url,
+                "source": result.source,
+                "filename": result.filename,
+                "status": result.status,
+                "error": result.error,
+                "size_bytes": result.size_bytes,
+            })
+
+            if result.status == "downloaded":
+                downloaded += 1
+                total_bytes += result.size_bytes
+                if result.resumed_bytes:
+                    resumed += 1
+                    resumed_bytes += result.resumed_bytes
+            else:
+                failed += 1
+
+            progress.update(task, advance=1, completed=completed_count)
+
+        try:
+            if engine == "async":
+                from async_download import run_async_downloads
+                run_async_downloads(scheduler, PAPERS_DIR, max_workers, max_bytes, on_result=record)
+            else:
+                _run_threaded(scheduler, len(pending), max_workers, max_bytes, on_result=record)
+        finally:
+            # Fold the journal into the snapshot
+            journal.close()
 
     # Summary
     console.print(f"\n[bold]Download complete![/bold]")
     console.print(f"  Downloaded: [green]{downloaded}[/green]")
     console.print(f"  Failed:     [red]{failed}[/red]")
     console.print(f"  Total size: [cyan]{total_bytes / (1024**3):.2f} GB[/cyan]")
+    if resumed:
+        console.print(
+            f"  Resumed:    [yellow]{resumed}[/yellow] "
+            f"({resumed_bytes / (1024**2):.1f} MB not downloaded again)"
+        )
     console.print(f"  Manifest:   [dim]{MANIFEST_PATH}[/dim]")
+    console.print(
+        f"  Peak RSS:   {_format_rss(rss_before)} before -> {_format_rss(peak_rss_mb())} after"
+    )
+
+    # Per-host throughput and throttling (scheduler + rate-limiter accounting)
+    scheduler.print_stats(console)
 
     if failed > 0:
         console.print(f"\n[yellow]Run again to retry failed downloads.[/yellow]")
 
 
+def _run_threaded(
+    scheduler: HostScheduler,
+    total: int,
+    max_workers: int,
+    max_bytes: int,
+    on_result: Callable[[PaperDownload], None],
+):
+    """Thread engine: *max_workers* threads share one ``httpx.Client``; results are recorded on this thread."""
+    results: queue.Queue = queue.Queue()
+
+    def worker(client: httpx.Client):
+        while (job := scheduler.next()) is not None:
+            result = job.item
+            try:
+                result = download_one(job.item, client, max_bytes, prepaid=True)
+            except Exception as e:  # keep the pool alive; record the paper as failed
+                result.status, result.error = "failed", str(e)[:200]
+            finally:
+                scheduler.done(job, result.size_bytes if result.status == "downloaded" else 0)
+                results.put(result)
+
+    limits = httpx.Limits(max_connections=max_workers, max_keepalive_connections=max_workers)
+    with httpx.Client(limits=limits) as client, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in range(min(max_workers, total)):
+            executor.submit(worker, client)
+        for _ in range(total):
+            on_result(results.get())
+
+
 # ── CLI ───────────────────────────────────────────────────────────────────────
 
 def main():
@@ -358,8 +455,22 @@ def main():
     parser.add_argument(
         "--workers", "-w",
         type=int,
-        default=20,
-        help="Number of parallel download workers (default: 20).",
+        default=None,
+        help="Concurrent downloads, the global connection cap "
+             f"(default: {DEFAULT_WORKERS['threads']} threads, {DEFAULT_WORKERS['async']} with --engine async).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(DEFAULT_WORKERS),
+        default="threads",
+        help="Download engine: a thread per connection, or asyncio coroutines "
+             "for hundreds of transfers in flight (default: threads).",
+    )
+    parser.add_argument(
+        "--host-concurrency",
+        type=int,
+        default=None,
+        help="Concurrent downloads per host, overriding the per-host caps in host_scheduler.py.",
     )
     parser.add_argument(
         "--limit", "-n",
@@ -372,6 +483,12 @@ def main():
         action="store_true",
         help="Show what would be downloaded without actually downloading.",
     )
+    parser.add_argument(
+        "--max-size-mb",
+        type=float,
+        default=MAX_PDF_MB,
+        help=f"Abort downloads larger than this many MB (default: {MAX_PDF_MB}).",
+    )
     parser.add_argument(
         "--retry-failed",
         action="store_true",
@@ -388,14 +505,13 @@ def main():
 
     # If retrying, clear failed status in manifest so they're re-attempted
     if args.retry_failed:
-        manifest = load_manifest()
         cleared = 0
-        for pid, entry in manifest.items():
-            if entry.get("status") == "failed":
-                entry["status"] = "pending"
-                cleared += 1
+        with ManifestJournal(MANIFEST_PATH) as journal:
+            for pid, entry in journal.items():
+                if entry.get("status") == "failed":
+                    journal.record({**entry, "status": "pending"})
+                    cleared += 1
         if cleared:
-            save_manifest(manifest)
             console.print(f"[yellow]Cleared {cleared} failed entries for retry.[/yellow]")
 
     run_downloads(
@@ -403,6 +519,9 @@ def main():
         max_workers=args.workers,
         limit=args.limit,
         dry_run=args.dry_run,
+        max_size_mb=args.max_size_mb,
+        engine=args.engine,
+        host_concurrency=args.host_concurrency,
     )
 
 
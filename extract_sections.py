@@ -477,12 +477,12 @@ def load_papers_jsonl() -> dict[str, dict]:
 
 
 def load_scores() -> dict[str, dict]:
-    """Load paper scores. Returns {paper_id: score_dict}."""
+    """Load LLM-scored papers (not failed or prefiltered ones). Returns {paper_id: score_dict}."""
     if not SCORES_PATH.exists():
         return {}
     with open(SCORES_PATH, "r", encoding="utf-8") as f:
         data = json.load(f)
-    return {s["paper_id"]: s for s in data if s.get("paper_id")}
+    return {s["paper_id"]: s for s in data if s.get("paper_id") and s.get("status") == "scored"}
 
 
 def load_benchmarks() -> list[dict]:
@@ -522,7 +522,6 @@ def load_and_extract_all(
     relevant_ids = {
         pid for pid, s in scores.items()
         if s.get("relevance_score", 0) >= min_relevance
-        and s.get("status") == "scored"
     }
 
     # Extract sections
@@ -555,20 +554,18 @@ def load_and_extract_all(
     # Group by the requested dimension
     grouped_papers: dict[str, list[ExtractedPaper]] = defaultdict(list)
     if group_by == "concern":
-        # Keyword-match papers to concern themes
+        # Keyword-match papers to concern themes (one scan per paper)
         from config import CONCERNS
-        import re as _re
+        from keyword_matcher import concern_matcher
 
+        matcher = concern_matcher()
         for ep in extracted.values():
             # Build a searchable blob from title + summary + extracted text
             blob = (ep.title + " " + ep.summary + " " + ep.to_text()).lower()
-            matched_any = False
-            for concern_key, concern_info in CONCERNS.items():
-                for kw in concern_info["keywords"]:
-                    if _re.search(r'\b' + _re.escape(kw.lower()) + r'\b', blob):
-                        grouped_papers[concern_key].append(ep)
-                        matched_any = True
-                        break  # one keyword match is enough per concern
+            matched = matcher.scores(blob).get("concern", {})
+            for concern_key in CONCERNS:
+                if concern_key in matched:
+                    grouped_papers[concern_key].append(ep)
             # Don't add to uncategorized — we only want matched papers
     elif group_by == "tool_type":
         for ep in extracted.values():
@@ -0,0 +1,337 @@
+"""
+Vectorised heuristic scores: an entries × categories matrix for the whole corpus.
+
+``map_all`` used to score entries one at a time and throw the raw scores
+away after thresholding. ``HeuristicScores`` keeps them instead:
+
+  - every entry is scanned once by the compiled ``KeywordMatcher``
+    (keyword_matcher.py) into a sparse entries × keywords match matrix
+    (row / column index arrays);
+  - each group (``framework``, ``tool``) has a keywords × categories
+    weight matrix (2.0 for phrases, 1.0 for single words, as before);
+  - the entries × categories scores are one sparse-dense product per group.
+
+Because matches and weights are kept apart, threshold sweeps, per-category
+precision against the LLM labels and re-weighting after keyword edits are
+array operations over the stored matrix; only keywords that are new since
+the matrix was built need a re-scan. The matrix is saved next to the
+reports as ``output/heuristic_scores.npz``.
+
+Usage:
+    uv run heuristic_scores.py                     # Threshold sweep + precision vs. LLM labels
+    uv run heuristic_scores.py --min-score 3       # Precision at a different threshold
+    uv run heuristic_scores.py --rescore           # Re-apply edited mapper keywords to the saved matrix
+
+    from heuristic_scores import HeuristicScores
+    hs = HeuristicScores.load()
+    hs.scores("framework")                         # (n_entries, n_categories) float32
+    hs.mapped("tool", min_score=3.0)
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from identity import canonical_id
+from keyword_matcher import KeywordMatcher
+from mapper import FRAMEWORK_KEYWORDS, MIN_SCORE, TOOL_KEYWORDS, _keyword_rule, _text_blob
+from scraper import BenchmarkEntry
+
+HEURISTIC_SCORES_PATH = "output/heuristic_scores.npz"
+REPORT_JSON = "output/education_benchmark_mapping.json"
+SWEEP_THRESHOLDS = (1.0, 2.0, 3.0, 4.0, 5.0)
+
+KeywordGroups = dict[str, dict[str, list[str]]]   # group -> {category: [keyword, ...]}
+
+
+def default_keyword_groups() -> KeywordGroups:
+    return {"framework": FRAMEWORK_KEYWORDS, "tool": TOOL_KEYWORDS}
+
+
+def _build_matcher(
+    groups: KeywordGroups,
+    rule: Callable[[str], tuple[bool, float]],
+) -> KeywordMatcher:
+    m = KeywordMatcher()
+    for group, keywords in groups.items():
+        m.add_group(group, keywords, rule)
+    return m
+
+
+def _scan(
+    blobs: Iterable[str],
+    matcher: KeywordMatcher,
+    col_of: Optional[list[int]] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Row / column indices of every (entry, keyword) match, in row order."""
+    rows: list[int] = []
+    cols: list[int] = []
+    for i, blob in enumerate(blobs):
+        for kid in sorted(matcher.matches(blob)):
+            rows.append(i)
+            cols.append(col_of[kid] if col_of is not None else kid)
+    return np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32)
+
+
+@dataclass
+class HeuristicScores:
+    """Keyword matches of a corpus plus per-group weights; scores on demand."""
+    entry_ids: list[str]                     # canonical ID per row
+    keywords: list[tuple[str, bool]]         # (text, word-bounded) per column
+    rows: np.ndarray                         # match matrix, row indices (int32)
+    cols: np.ndarray                         # match matrix, keyword indices (int32)
+    categories: dict[str, list[str]]         # group -> category IDs (score columns)
+    weights: dict[str, np.ndarray]           # group -> (n_keywords, n_categories) float32
+    _scores: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    # ── Construction ─────────────────────────────────────────────────────
+
+    @classmethod
+    def build(
+        cls,
+        entries: list[BenchmarkEntry],
+        groups: Optional[KeywordGroups] = None,
+        rule: Callable[[str], tuple[bool, float]] = _keyword_rule,
+    ) -> "HeuristicScores":
+        """Scan every entry once and keep the match matrix."""
+        groups = groups if groups is not None else default_keyword_groups()
+        matcher = _build_matcher(groups, rule)
+        rows, cols = _scan((_text_blob(e) for e in entries), matcher)
+        hs = cls(
+            entry_ids=[canonical_id(e.source_url) for e in entries],
+            keywords=matcher.keywords,
+            rows=rows,
+            cols=cols,
+            categories={},
+            weights={},
+        )
+        hs._set_weights(groups, matcher)
+        return hs
+
+    def _set_weights(self, groups: KeywordGroups, matcher: KeywordMatcher):
+        """Weight matrices from *matcher*, whose keyword ids must index ``self.keywords``."""
+        col_of = {kw: j for j, kw in enumerate(self.keywords)}
+        self.categories = {g: list(cats) for g, cats in groups.items()}
+        self.weights = {
+            g: np.zeros((len(self.keywords), len(cats)), dtype=np.float32)
+            for g, cats in self.categories.items()
+        }
+        cat_index = {g: {c: j for j, c in enumerate(cats)} for g, cats in self.categories.items()}
+        for kid, kw in enumerate(matcher.keywords):
+            for group, category, weight in matcher.targets(kid):
+                self.weights[group][col_of[kw], cat_index[group][category]] += weight
+        self._scores = {}
+
+    def rekey(
+        self,
+        groups: Optional[KeywordGroups] = None,
+        entries: Optional[list[BenchmarkEntry]] = None,
+        rule: Callable[[str], tuple[bool, float]] = _keyword_rule,
+    ) -> "HeuristicScores":
+        """
+        Scores for edited keyword lists, reusing the stored matches.
+
+        Removed or re-weighted keywords and moved categories only rebuild
+        the weight matrices. Keywords that were never scanned need the
+        original *entries* (same order) for a scan restricted to them.
+        """
+        groups = groups if groups is not None else default_keyword_groups()
+        matcher = _build_matcher(groups, rule)
+        known = {kw: j for j, kw in enumerate(self.keywords)}
+        new_kws = [kw for kw in matcher.keywords if kw not in known]
+
+        keywords, rows, cols = list(self.keywords), self.rows, self.cols
+        if new_kws:
+            if entries is None or len(entries) != len(self.entry_ids):
+                raise ValueError(
+                    f"{len(new_kws)} new keywords need the original entries to be scanned"
+                )
+            extra = KeywordMatcher()
+            for text, bounded in new_kws:
+                extra.add("new", "new", text, bounded)
+            offset = len(keywords)
+            keywords += extra.keywords
+            new_rows, new_cols = _scan((_text_blob(e) for e in entries), extra)
+            rows = np.concatenate([rows, new_rows])
+            cols = np.concatenate([cols, new_cols + offset])
+            order = np.argsort(rows, kind="stable")
+            rows, cols = rows[order], cols[order]
+
+        hs = HeuristicScores(list(self.entry_ids), keywords, rows, cols, {}, {})
+        hs._set_weights(groups, matcher)
+        return hs
+
+    # ── Scores ───────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def scores(self, group: str) -> np.ndarray:
+        """``(n_entries, n_categories)`` scores for *group* (cached)."""
+        if group not in self._scores:
+            w = self.weights[group]
+            n, c = len(self.entry_ids), w.shape[1]
+            # Sparse (entries × keywords) @ dense (keywords × categories)
+            flat = (self.rows.astype(np.int64)[:, None] * c + np.arange(c)).ravel()
+            self._scores[group] = np.bincount(
+                flat, weights=w[self.cols].ravel(), minlength=n * c,
+            ).reshape(n, c).astype(np.float32)
+        return self._scores[group]
+
+    def mapped(self, group: str, min_score: float = MIN_SCORE) -> list[list[str]]:
+        """Per entry, the categories scoring at least *min_score* (category order)."""
+        cats = self.categories[group]
+        hits = self.scores(group) >= min_score
+        return [[cats[j] for j in np.flatnonzero(row)] for row in hits]
+
+    def row_scores(self, i: int, group: str) -> dict[str, float]:
+        """``{category: score}`` of entry *i* for every category with a match."""
+        row = self.scores(group)[i]
+        return {self.categories[group][j]: float(row[j]) for j in np.flatnonzero(row)}
+
+    def sweep(self, group: str, thresholds: Iterable[float] = SWEEP_THRESHOLDS) -> dict[float, np.ndarray]:
+        """Entries mapped to each category at every threshold."""
+        s = self.scores(group)
+        return {t: (s >= t).sum(axis=0) for t in thresholds}
+
+    def precision_recall(
+        self,
+        group: str,
+        labels: dict[str, list[str]],
+        min_score: float = MIN_SCORE,
+    ) -> dict[str, tuple[int, float, float]]:
+        """
+        Per category ``(support, precision, recall)`` against reference labels.
+
+        *labels* maps canonical ID -> category IDs (e.g. the LLM's
+        ``framework_ids``); only entries present in *labels* are counted.
+        """
+        rows = [i for i, eid in enumerate(self.entry_ids) if eid in labels]
+        if not rows:
+            return {}
+        cats = self.categories[group]
+        col = {c: j for j, c in enumerate(cats)}
+        truth = np.zeros((len(rows), len(cats)), dtype=bool)
+        for r, i in enumerate(rows):
+            for c in labels[self.entry_ids[i]]:
+                if c in col:
+                    truth[r, col[c]] = True
+        pred = self.scores(group)[rows] >= min_score
+        tp = (pred & truth).sum(axis=0)
+        n_pred, n_true = pred.sum(axis=0), truth.sum(axis=0)
+        return {
+            c: (int(n_true[j]),
+                float(tp[j] / n_pred[j]) if n_pred[j] else 0.0,
+                float(tp[j] / n_true[j]) if n_true[j] else 0.0)
+            for j, c in enumerate(cats)
+        }
+
+    # ── Persistence ──────────────────────────────────────────────────────
+
+    def save(self, path: str = HEURISTIC_SCORES_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {
+            "entry_ids": np.asarray(self.entry_ids, dtype=str),
+            "keyword_text": np.asarray([t for t, _ in self.keywords], dtype=str),
+            "keyword_bounded": np.asarray([b for _, b in self.keywords], dtype=bool),
+            "rows": self.rows,
+            "cols": self.cols,
+            "groups": np.asarray(list(self.categories), dtype=str),
+        }
+        for g, cats in self.categories.items():
+            arrays[f"categories_{g}"] = np.asarray(cats, dtype=str)
+            arrays[f"weights_{g}"] = self.weights[g]
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str = HEURISTIC_SCORES_PATH) -> "HeuristicScores":
+        with np.load(path, allow_pickle=False) as data:
+            groups = [str(g) for g in data["groups"]]
+            return cls(
+                entry_ids=[str(x) for x in data["entry_ids"]],
+                keywords=[(str(t), bool(b)) for t, b in zip(data["keyword_text"], data["keyword_bounded"])],
+                rows=data["rows"],
+                cols=data["cols"],
+                categories={g: [str(c) for c in data[f"categories_{g}"]] for g in groups},
+                weights={g: data[f"weights_{g}"] for g in groups},
+            )
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+
+def _llm_labels(entries: list[BenchmarkEntry], attr: str) -> dict[str, list[str]]:
+    """Canonical ID -> LLM-assigned categories for entries the LLM classified."""
+    return {
+        canonical_id(e.source_url): getattr(e, attr)
+        for e in entries
+        if any(t.startswith("llm:") for t in e.tags) or "not-a-benchmark" in e.tags
+    }
+
+
+def cli():
+    from rich.console import Console
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Inspect the saved heuristic score matrix.")
+    parser.add_argument("--path", default=HEURISTIC_SCORES_PATH)
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE,
+                        help=f"Threshold for precision/recall (default: {MIN_SCORE}).")
+    parser.add_argument("--rescore", action="store_true",
+                        help=f"Re-apply the current mapper keywords (scans {REPORT_JSON} for new ones) and save.")
+    args = parser.parse_args()
+    console = Console()
+
+    if not os.path.exists(args.path):
+        console.print(f"[red]No heuristic scores at {args.path} -- run main.py first.[/red]")
+        return
+
+    hs = HeuristicScores.load(args.path)
+    report: list[BenchmarkEntry] = []
+    if os.path.exists(REPORT_JSON):
+        with open(REPORT_JSON, "r", encoding="utf-8") as f:
+            report = [BenchmarkEntry(**r) for r in json.load(f)]
+
+    if args.rescore:
+        from cascade import _clean
+
+        # Scan new keywords over the scraped text, not the tags stage 2 added
+        by_id = {canonical_id(e.source_url): _clean(e) for e in report}
+        entries = [by_id.get(eid) for eid in hs.entry_ids]
+        try:
+            hs = hs.rekey(entries=entries if all(entries) else None)
+        except ValueError as e:
+            console.print(f"[red]{e}: not every scored entry is in {REPORT_JSON} -- run main.py first.[/red]")
+            return
+        hs.save(args.path)
+        console.print(f"Re-scored {len(hs)} entries with the current keywords -> {args.path}")
+
+    console.print(f"{len(hs)} entries, {len(hs.keywords)} keywords, {len(hs.rows)} matches")
+    for group, attr in (("framework", "framework_ids"), ("tool", "tool_types")):
+        if group not in hs.categories:
+            continue
+        sweep = hs.sweep(group)
+        pr = hs.precision_recall(group, _llm_labels(report, attr), args.min_score) if report else {}
+        table = Table(title=f"{group}: entries mapped per threshold"
+                            + (f", precision/recall vs LLM at >= {args.min_score:g}" if pr else ""))
+        table.add_column("Category")
+        for t in sweep:
+            table.add_column(f">= {t:g}", justify="right")
+        if pr:
+            for col in ("LLM support", "Precision", "Recall"):
+                table.add_column(col, justify="right")
+        for j, cat in enumerate(hs.categories[group]):
+            row = [cat] + [str(int(counts[j])) for counts in sweep.values()]
+            if pr:
+                support, precision, recall = pr[cat]
+                row += [str(support), f"{precision:.0%}", f"{recall:.0%}"]
+            table.add_row(*row)
+        console.print(table)
+
+
+if __name__ == "__main__":
+    cli()
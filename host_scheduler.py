@@ -0,0 +1,209 @@
+"""
+Per-host politeness scheduler for download pools.
+
+A flat thread pool hands every worker the next paper in file order. With
+most PDFs on ``arxiv.org``, all workers end up queued on the arXiv token
+bucket (ratelimit.py) while papers on other hosts wait behind them.
+``HostScheduler`` decides *which* task a free worker takes instead:
+
+  - one FIFO queue per host (the rate-limit key from ratelimit.py, so
+    ``arxiv.org`` and ``export.arxiv.org`` share one);
+  - hosts are visited round-robin, so transfers interleave across hosts;
+  - a host gets a task only while it is under its concurrency cap
+    (``HOST_CONCURRENCY``, default ``DEFAULT_HOST_CONCURRENCY``) and its
+    token bucket has a token *now* (``TokenBucket.try_acquire``) -- the
+    token is taken at dispatch, so the first request does not wait again;
+  - the number of workers is the global connection cap.
+
+When no host can take a task, workers wait until the earliest bucket
+refills or a transfer finishes. Threads call ``next``; coroutines of the
+asyncio engine (async_download.py) call ``next_async``. Per host, the
+scheduler counts tasks, bytes, busy time and *throttled* time (work and a
+free slot, but no token).
+
+Usage:
+    sched = HostScheduler(papers, url_of=lambda p: p.pdf_url)
+    while (task := sched.next()) is not None:      # in each worker thread
+        try:
+            result = download(task.item, prepaid=True)
+        finally:
+            sched.done(task, nbytes=result.size_bytes)
+    sched.print_stats(console)
+
+    task = await sched.next_async()                # in each coroutine
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Optional, TypeVar
+
+from ratelimit import get_limiter, provider_for_url
+
+T = TypeVar("T")
+
+DEFAULT_HOST_CONCURRENCY = 4
+# Concurrent transfers per rate-limit key (provider / host)
+HOST_CONCURRENCY: dict[str, int] = {
+    "arxiv": 4,
+}
+
+
+@dataclass
+class HostStats:
+    """Counters for one host."""
+    tasks: int = 0
+    bytes: int = 0
+    busy_seconds: float = 0.0        # summed transfer time
+    throttled_seconds: float = 0.0   # had work and a free slot, but no token
+    first_start: float = 0.0
+    last_end: float = 0.0
+
+    @property
+    def active_seconds(self) -> float:
+        return max(0.0, self.last_end - self.first_start)
+
+    @property
+    def throughput_mb_s(self) -> float:
+        return self.bytes / (1024 ** 2) / self.active_seconds if self.active_seconds > 0 else 0.0
+
+
+@dataclass
+class Task(Generic[T]):
+    """An item handed to a worker, with its host and dispatch time."""
+    item: T
+    host: str
+    started: float = field(default_factory=time.monotonic)
+
+
+class HostScheduler(Generic[T]):
+    """Thread-safe dispatcher of items to workers under per-host caps and rates."""
+
+    def __init__(
+        self,
+        items: list[T],
+        url_of: Callable[[T], str],
+        host_concurrency: Optional[dict[str, int]] = None,
+        default_concurrency: int = DEFAULT_HOST_CONCURRENCY,
+    ):
+        self._queues: dict[str, deque[T]] = {}
+        for item in items:
+            self._queues.setdefault(provider_for_url(url_of(item)), deque()).append(item)
+        self._hosts = deque(self._queues)
+        caps = HOST_CONCURRENCY if host_concurrency is None else host_concurrency
+        self._caps = {h: max(1, caps.get(h, default_concurrency)) for h in self._queues}
+        self._active = {h: 0 for h in self._queues}
+        self._throttled_since = {h: 0.0 for h in self._queues}
+        self.stats = {h: HostStats() for h in self._queues}
+        self._remaining = len(items)
+        self._cond = threading.Condition(threading.RLock())   # poll() re-enters from next()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def cap(self, host: str) -> int:
+        return self._caps[host]
+
+    @property
+    def finished(self) -> bool:
+        """Every item was handed out."""
+        return self._remaining == 0
+
+    def _pick(self) -> tuple[Optional[str], float]:
+        """``(host, wait)``: the next host with work, a free slot and a token."""
+        now = time.monotonic()
+        wait = float("inf")
+        for _ in range(len(self._hosts)):
+            host = self._hosts[0]
+            self._hosts.rotate(-1)
+            if not self._queues[host] or self._active[host] >= self._caps[host]:
+                continue
+            host_wait = get_limiter(host).try_acquire()
+            if host_wait <= 0:
+                self._end_throttle(host, now)
+                return host, 0.0
+            # Work and a free slot, but no token: throttled until it dispatches
+            self._throttled_since[host] = self._throttled_since[host] or now
+            wait = min(wait, host_wait)
+        return None, wait
+
+    def _end_throttle(self, host: str, now: float):
+        if self._throttled_since[host]:
+            self.stats[host].throttled_seconds += now - self._throttled_since[host]
+            self._throttled_since[host] = 0.0
+
+    def poll(self) -> tuple[Optional[Task[T]], float]:
+        """
+        Non-blocking ``next``: ``(task, 0.0)``, or ``(None, seconds)`` until
+        the earliest token (``inf`` if only a finished transfer can help).
+        """
+        with self._cond:
+            if self.finished:
+                return None, 0.0
+            host, wait = self._pick()
+            if host is None:
+                return None, wait
+            self._remaining -= 1
+            self._active[host] += 1
+            task = Task(self._queues[host].popleft(), host)
+            s = self.stats[host]
+            s.first_start = s.first_start or task.started
+            return task, 0.0
+
+    def next(self) -> Optional[Task[T]]:
+        """Block until a task may start; ``None`` once every item was handed out."""
+        with self._cond:
+            while True:
+                task, wait = self.poll()
+                if task is not None or self.finished:
+                    return task
+                # Wake for the earliest token, or when a transfer frees a slot
+                self._cond.wait(None if wait == float("inf") else wait)
+
+    async def next_async(self) -> Optional[Task[T]]:
+        """``next`` for coroutines on one event loop (pair with ``done`` on the same loop)."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        while True:
+            task, wait = self.poll()
+            if task is not None or self.finished:
+                return task
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), None if wait == float("inf") else wait,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def done(self, task: Task[T], nbytes: int = 0):
+        """Release *task*'s slot and record its transfer."""
+        now = time.monotonic()
+        with self._cond:
+            self._active[task.host] -= 1
+            s = self.stats[task.host]
+            s.tasks += 1
+            s.bytes += nbytes
+            s.busy_seconds += now - task.started
+            s.last_end = max(s.last_end, now)
+            self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def print_stats(self, console):
+        """Per-host throughput and throttling table (rich console)."""
+        from rich.table import Table
+
+        table = Table(title="Per-host downloads")
+        for col, justify in (("Host", "left"), ("Cap", "right"), ("Files", "right"), ("MB", "right"),
+                             ("MB/s", "right"), ("Busy s", "right"), ("Throttled s", "right"),
+                             ("429s", "right")):
+            table.add_column(col, justify=justify)
+        for host, s in sorted(self.stats.items(), key=lambda kv: -kv[1].tasks):
+            bucket = get_limiter(host).stats()
+            table.add_row(
+                host, str(self._caps[host]), str(s.tasks), f"{s.bytes / 1024**2:.1f}",
+                f"{s.throughput_mb_s:.2f}", f"{s.busy_seconds:.1f}", f"{s.throttled_seconds:.1f}",
+                str(bucket["throttled_responses"]),
+            )
+        console.print(table)
@@ -0,0 +1,296 @@
+"""
+Persistent on-disk cache for HuggingFace / Semantic Scholar JSON responses.
+
+Sits underneath ``scraper._api_get_json`` and ``scraper._s2_request`` (and
+the async engine's twin) so a re-run only pays for requests it has not made
+recently:
+
+  - Keyed by sha256(method, URL, sorted params, JSON body) -- auth headers
+    are not part of the key. One file per key under ``output/http_cache/``.
+  - Per-endpoint TTLs (``ENDPOINT_TTLS``): S2 batch details live for a month,
+    bulk-search pages for a week, HF listings for a day, daily papers for
+    an hour.
+  - Stale entries that carry an ``ETag`` / ``Last-Modified`` are revalidated
+    with ``If-None-Match`` / ``If-Modified-Since``; a 304 refreshes them
+    without re-downloading the body.
+  - Size-bounded: when the cache grows past ``max_bytes`` the least recently
+    used entries are evicted.
+  - Hit / miss / revalidation counters are printed at the end of a run.
+
+Usage:
+    from http_cache import enable_response_cache, print_cache_stats
+    enable_response_cache()            # main.py does this unless --no-cache
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+
+CACHE_DIR = Path("output/http_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# First matching URL fragment wins.
+ENDPOINT_TTLS: list[tuple[str, int]] = [
+    ("/paper/batch", 30 * DAY),
+    ("/paper/search/bulk", 7 * DAY),
+    ("/api/daily_papers", 1 * HOUR),
+    ("/api/datasets", 1 * DAY),
+    ("/api/papers/search", 1 * DAY),
+    ("/search/full-text", 1 * DAY),
+]
+DEFAULT_TTL = 1 * DAY
+
+
+def ttl_for_url(url: str) -> int:
+    """TTL in seconds for the endpoint serving *url*."""
+    for fragment, ttl in ENDPOINT_TTLS:
+        if fragment in url:
+            return ttl
+    return DEFAULT_TTL
+
+
+def request_key(
+    method: str,
+    url: str,
+    params: dict | None = None,
+    body: Any = None,
+) -> str:
+    """Content address for a request: sha256 of method, URL, params and body."""
+    canonical = json.dumps(
+        {
+            "method": method.upper(),
+            "url": url,
+            "params": sorted((str(k), str(v)) for k, v in (params or {}).items()),
+            "body": body,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ── Cache lookups ────────────────────────────────────────────────────────────
+
+@dataclass
+class CacheLookup:
+    """Result of looking up one request in the cache."""
+    key: str
+    url: str
+    entry: Optional[dict] = None   # stored record, if any
+    fresh: bool = False
+
+    @property
+    def data(self) -> Any:
+        return self.entry["data"] if self.entry else None
+
+    def validators(self) -> dict[str, str]:
+        """Conditional-request headers for revalidating a stale entry."""
+        if not self.entry or self.fresh:
+            return {}
+        headers = {}
+        if self.entry.get("etag"):
+            headers["If-None-Match"] = self.entry["etag"]
+        if self.entry.get("last_modified"):
+            headers["If-Modified-Since"] = self.entry["last_modified"]
+        return headers
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0       # stale entry confirmed by a 304
+    stores: int = 0
+    evictions: int = 0
+    by_endpoint: dict[str, list[int]] = field(default_factory=dict)  # fragment -> [hits, misses]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / total if total else 0.0
+
+
+class ResponseCache:
+    """Thread-safe, size-bounded LRU cache of JSON responses on disk."""
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # key -> (size_bytes, last_access)
+        self._index: dict[str, tuple[int, float]] = {}
+        self._total_bytes = 0
+        self._load_index()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        """Rebuild the LRU index from file sizes and mtimes (mtime = last access)."""
+        if not self.root.exists():
+            return
+        for sub in self.root.iterdir():
+            if not sub.is_dir():
+                continue
+            for path in sub.glob("*.json"):
+                st = path.stat()
+                self._index[path.stem] = (st.st_size, st.st_mtime)
+                self._total_bytes += st.st_size
+
+    def _count(self, url: str, hit: bool):
+        fragment = next((f for f, _ in ENDPOINT_TTLS if f in url), "other")
+        counts = self.stats.by_endpoint.setdefault(fragment, [0, 0])
+        counts[0 if hit else 1] += 1
+
+    # ── Public API ───────────────────────────────────────────────────────
+
+    def lookup(
+        self,
+        method: str,
+        url: str,
+        params: dict | None = None,
+        body: Any = None,
+    ) -> CacheLookup:
+        """Find a stored response; ``fresh`` is True when it is within its TTL."""
+        key = request_key(method, url, params, body)
+        result = CacheLookup(key=key, url=url)
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.stats.misses += 1
+                self._count(url, hit=False)
+            return result
+
+        result.entry = entry
+        result.fresh = time.time() - entry.get("stored_at", 0) < entry.get("ttl", 0)
+        if result.fresh:
+            self._touch(key, path)
+            with self._lock:
+                self.stats.hits += 1
+                self._count(url, hit=True)
+        return result
+
+    def revalidated(self, lookup: CacheLookup) -> Any:
+        """Record a 304 for a stale entry: refresh its timestamp and return its data."""
+        entry = dict(lookup.entry or {})
+        entry["stored_at"] = time.time()
+        self._write(lookup.key, entry)
+        with self._lock:
+            self.stats.revalidated += 1
+            self._count(lookup.url, hit=True)
+        return entry.get("data")
+
+    def store(self, lookup: CacheLookup, response: httpx.Response, data: Any):
+        """Store a 200 response's parsed JSON (plus validators) under the lookup's key."""
+        if lookup.entry is not None and not lookup.fresh:
+            # Stale entry that came back 200: counts as a miss
+            with self._lock:
+                self.stats.misses += 1
+                self._count(lookup.url, hit=False)
+        entry = {
+            "url": lookup.url,
+            "stored_at": time.time(),
+            "ttl": ttl_for_url(lookup.url),
+            "etag": response.headers.get("etag", ""),
+            "last_modified": response.headers.get("last-modified", ""),
+            "data": data,
+        }
+        self._write(lookup.key, entry)
+        with self._lock:
+            self.stats.stores += 1
+
+    # ── Storage + eviction ───────────────────────────────────────────────
+
+    def _touch(self, key: str, path: Path):
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            size, _ = self._index.get(key, (0, now))
+            self._index[key] = (size, now)
+
+    def _write(self, key: str, entry: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+        with self._lock:
+            old_size, _ = self._index.get(key, (0, 0.0))
+            self._index[key] = (len(payload), time.time())
+            self._total_bytes += len(payload) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self):
+        """Drop least recently used entries until we are under 90% of the budget."""
+        target = int(self.max_bytes * 0.9)
+        for key, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total_bytes <= target:
+                break
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            del self._index[key]
+            self._total_bytes -= size
+            self.stats.evictions += 1
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+# ── Process-wide cache ───────────────────────────────────────────────────────
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def enable_response_cache(
+    root: Path = CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> ResponseCache:
+    """Turn on the shared response cache for all scraper HTTP helpers."""
+    global _response_cache
+    _response_cache = ResponseCache(root, max_bytes)
+    return _response_cache
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The shared response cache, or None when caching is off."""
+    return _response_cache
+
+
+def print_cache_stats():
+    """Print hit / miss statistics for the shared cache."""
+    cache = _response_cache
+    if cache is None:
+        return
+    s = cache.stats
+    print(
+        f"\nHTTP cache: {s.hits} hits, {s.revalidated} revalidated (304), "
+        f"{s.misses} misses -- hit rate {s.hit_rate:.0%}; "
+        f"{s.stores} stored, {s.evictions} evicted, "
+        f"{cache.total_bytes / (1024 ** 2):.1f} MB on disk"
+    )
+    for fragment, (hits, misses) in sorted(s.by_endpoint.items()):
+        print(f"  {fragment:<22} {hits:6d} hits  {misses:6d} misses")
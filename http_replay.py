@@ -0,0 +1,723 @@
+"""
+Record / replay harness for offline, deterministic scraper benchmarks.
+
+Three pieces:
+
+  - **Recorder** -- ``record_http(cassette_path)`` taps every httpx
+    transport in the process (sync and async, so clients created deep
+    inside ``run_search`` or the downloader are covered) and appends each
+    real request/response pair to a JSONL cassette.
+  - **Fake API server** -- ``FakeAPIServer`` is a local threaded HTTP
+    server that replays a cassette and synthesises anything it does not
+    cover: HF daily papers / dataset listing (offset pagination) / paper
+    search, S2 bulk search (token pagination) and ``/paper/batch``, and
+    PDF downloads (with ETag and ``Range`` support). Latency, jitter,
+    429 injection (with ``Retry-After``) and transfers dropped half-way
+    are configurable.
+    ``FakeAPIProcess`` runs the same server in a child process.
+  - **Latency tap** -- ``RequestTimer`` records the client-side latency of
+    every request so benchmarks can report requests/s and p50/p99.
+
+The server mounts providers under path prefixes on one host (``/hf``,
+``/s2``, ``/pdf``, ``/x/<host>`` for anything else). ``pointed_at(base)``
+redirects the scraper's endpoints to it and registers the prefixes with
+ratelimit.py so each still draws from its provider's bucket.
+
+Usage:
+    uv run http_replay.py record --cassette output/cassettes/live.jsonl -q "math benchmark"
+    uv run http_replay.py serve --cassette output/cassettes/live.jsonl --latency 0.05 --rate-429 0.02
+    uv run python -m benchmarks.discovery      # benchmarks/ drives the server in-process
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import httpx
+
+import ratelimit
+
+# Live URL prefix -> mount point on the fake server (first match wins)
+MOUNTS: list[tuple[str, str]] = [
+    ("https://api.semanticscholar.org/graph/v1", "/s2"),
+    ("https://huggingface.co", "/hf"),
+]
+
+# Response headers worth replaying (hop-by-hop / encoding headers are dropped)
+_KEPT_HEADERS = {
+    "content-type", "etag", "last-modified", "retry-after",
+    "x-ratelimit-remaining", "x-ratelimit-reset",
+    "ratelimit-remaining", "ratelimit-reset", "ratelimit",
+}
+
+
+def mount_path(url: str) -> str:
+    """Path (with query) a live URL is served under on the fake server."""
+    for prefix, mount in MOUNTS:
+        if url.startswith(prefix):
+            return mount + url[len(prefix):]
+    parsed = urlparse(url)
+    path = f"/x/{parsed.hostname}{parsed.path}"
+    return f"{path}?{parsed.query}" if parsed.query else path
+
+
+def interaction_key(method: str, path_with_query: str, body: bytes = b"") -> str:
+    """Match key for a request: method, path, sorted query and body hash."""
+    parsed = urlparse(path_with_query)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    digest = hashlib.sha256(body or b"").hexdigest()[:16]
+    return f"{method.upper()} {parsed.path}?{query} {digest}"
+
+
+# ── Cassettes ────────────────────────────────────────────────────────────────
+
+@dataclass
+class Interaction:
+    """One recorded request/response pair."""
+    key: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    elapsed: float = 0.0
+
+    def to_json(self) -> str:
+        is_text = self.headers.get("content-type", "").startswith(("application/json", "text/"))
+        return json.dumps({
+            "key": self.key,
+            "status": self.status,
+            "headers": self.headers,
+            "elapsed": round(self.elapsed, 4),
+            "encoding": "utf-8" if is_text else "hex",
+            "body": self.body.decode("utf-8", "replace") if is_text else self.body.hex(),
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "Interaction":
+        rec = json.loads(line)
+        body = rec["body"].encode("utf-8") if rec.get("encoding") == "utf-8" else bytes.fromhex(rec["body"])
+        return cls(rec["key"], rec["status"], rec["headers"], body, rec.get("elapsed", 0.0))
+
+
+class Cassette:
+    """JSONL file of interactions; repeated keys replay in recorded order, then cycle."""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._by_key: dict[str, list[Interaction]] = {}
+        self._cursor: dict[str, int] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        it = Interaction.from_json(line)
+                        self._by_key.setdefault(it.key, []).append(it)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._by_key.values())
+
+    def append(self, interaction: Interaction):
+        with self._lock:
+            self._by_key.setdefault(interaction.key, []).append(interaction)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(interaction.to_json() + "\n")
+
+    def match(self, key: str) -> Optional[Interaction]:
+        with self._lock:
+            options = self._by_key.get(key)
+            if not options:
+                return None
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return options[i % len(options)]
+
+
+# ── Transport tap (recorder + latency timer) ─────────────────────────────────
+
+TapCallback = Callable[[httpx.Request, httpx.Response, float], None]
+
+
+@contextlib.contextmanager
+def tap_transports(callback: TapCallback, read_bodies: bool = True) -> Iterator[None]:
+    """
+    Call *callback(request, response, elapsed)* for every request made by any
+    httpx client in the process while the context is active. Response
+    bodies are read eagerly so the callback can inspect them, unless
+    *read_bodies* is off (streamed downloads; *elapsed* is then the time
+    to the response headers).
+    """
+    sync_orig = httpx.HTTPTransport.handle_request
+    async_orig = httpx.AsyncHTTPTransport.handle_async_request
+
+    def handle_request(self, request):
+        t0 = time.monotonic()
+        response = sync_orig(self, request)
+        if read_bodies:
+            response.read()
+        callback(request, response, time.monotonic() - t0)
+        return response
+
+    async def handle_async_request(self, request):
+        t0 = time.monotonic()
+        response = await async_orig(self, request)
+        if read_bodies:
+            await response.aread()
+        callback(request, response, time.monotonic() - t0)
+        return response
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+    try:
+        yield
+    finally:
+        httpx.HTTPTransport.handle_request = sync_orig
+        httpx.AsyncHTTPTransport.handle_async_request = async_orig
+
+
+@contextlib.contextmanager
+def record_http(cassette_path: str) -> Iterator[Cassette]:
+    """Append every live request/response made inside the block to a cassette."""
+    cassette = Cassette(cassette_path)
+
+    def _record(request: httpx.Request, response: httpx.Response, elapsed: float):
+        headers = {k.lower(): v for k, v in response.headers.items() if k.lower() in _KEPT_HEADERS}
+        key = interaction_key(request.method, mount_path(str(request.url)), request.content)
+        cassette.append(Interaction(key, response.status_code, headers, response.content, elapsed))
+
+    with tap_transports(_record):
+        yield cassette
+
+
+@dataclass
+class RequestTimer:
+    """Client-side latency per request, grouped by mount (``/hf``, ``/s2``, ...)."""
+    samples: dict[str, list[float]] = field(default_factory=dict)
+    statuses: dict[int, int] = field(default_factory=dict)
+    read_bodies: bool = True   # False: time to headers, bodies left to stream
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def observe(self, request: httpx.Request, response: httpx.Response, elapsed: float):
+        path = urlparse(str(request.url)).path
+        group = "/" + path.strip("/").split("/")[0] if path.strip("/") else "/"
+        with self._lock:
+            self.samples.setdefault(group, []).append(elapsed)
+            self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+
+    @contextlib.contextmanager
+    def active(self) -> Iterator["RequestTimer"]:
+        with tap_transports(self.observe, self.read_bodies):
+            yield self
+
+    def all_samples(self) -> list[float]:
+        return [s for group in self.samples.values() for s in group]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+# ── Synthetic data ───────────────────────────────────────────────────────────
+
+def _hash(*parts) -> str:
+    return hashlib.sha1(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SyntheticData:
+    """Shape of the data the fake server invents for requests not in the cassette."""
+    daily_papers: int = 30
+    datasets_per_query: int = 250
+    s2_papers_per_query: int = 1500
+    s2_page_size: int = 1000
+    hf_papers_per_query: int = 50
+    pdf_bytes: int = 200_000
+    shared_fraction: float = 0.2   # share of S2 hits that recur across queries
+
+
+class SyntheticPdf:
+    """A synthetic PDF body generated in chunks, so large files are never held in memory."""
+
+    TRAILER = b"\n%%EOF"
+
+    def __init__(self, header: bytes, size: int):
+        self.header = header
+        self.size = max(size, len(header))
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def etag(self) -> str:
+        return f'"{_hash(self.header, self.size)[:16]}"'
+
+    def slice(self, start: int, end: int) -> bytes:
+        """Bytes ``[start, end)`` of the file."""
+        end = min(end, self.size)
+        trailer_at = max(len(self.header), self.size - len(self.TRAILER))
+        out = bytearray()
+        pos = start
+        while pos < end:
+            if pos < len(self.header):
+                piece = self.header[pos:min(end, len(self.header))]
+            elif pos < trailer_at:
+                piece = b"0" * (min(end, trailer_at) - pos)
+            else:
+                piece = self.TRAILER[pos - trailer_at:end - trailer_at]
+            out += piece
+            pos += len(piece)
+        return bytes(out)
+
+    def chunks(self, start: int = 0, end: Optional[int] = None, size: int = 64 * 1024) -> Iterator[bytes]:
+        end = self.size if end is None else min(end, self.size)
+        for pos in range(start, end, size):
+            yield self.slice(pos, min(pos + size, end))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(
+        self,
+        status: int,
+        body: bytes | SyntheticPdf,
+        content_type: str = "application/json",
+        headers: dict | None = None,
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        try:
+            if isinstance(body, SyntheticPdf):
+                for chunk in body.chunks():
+                    self.wfile.write(chunk)
+            else:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # client aborted the transfer
+
+    def _json(self, obj, status: int = 200):
+        self._send(status, json.dumps(obj).encode("utf-8"))
+
+    def do_GET(self):
+        self._dispatch(b"")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._dispatch(self.rfile.read(length) if length else b"")
+
+    def _dispatch(self, body: bytes):
+        fake = self.server.fake
+        fake._count("requests")
+        if fake.should_throttle():
+            fake._count("injected_429")
+            return self._send(
+                429, b'{"message": "Too Many Requests"}',
+                headers={"Retry-After": f"{fake.retry_after:g}"},
+            )
+        fake.sleep()
+
+        recorded = fake.cassette.match(interaction_key(self.command, self.path, body))
+        if recorded:
+            fake._count("replayed")
+            return self._send(
+                recorded.status, recorded.body,
+                recorded.headers.get("content-type", "application/json"),
+                {k: v for k, v in recorded.headers.items() if k != "content-type"},
+            )
+
+        parsed = urlparse(self.path)
+        q = dict(parse_qsl(parsed.query))
+        synth = fake.synthetic_response(self.command, parsed.path, q, body)
+        if synth is None:
+            fake._count("not_found")
+            return self._json({"error": "not found"}, 404)
+        fake._count("synthetic")
+        status, payload, content_type = synth
+        if isinstance(payload, SyntheticPdf):
+            return self._send_pdf(payload)
+        self._send(status, payload, content_type)
+
+    def _send_pdf(self, pdf: "SyntheticPdf"):
+        """A synthetic PDF with ETag / Accept-Ranges, honouring ``Range`` + ``If-Range``."""
+        fake = self.server.fake
+        headers = {"Accept-Ranges": "bytes", "ETag": pdf.etag}
+        start = 0
+        m = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if m and (if_range is None or if_range == pdf.etag):
+            start = int(m.group(1))
+            if start >= len(pdf):
+                headers["Content-Range"] = f"bytes */{len(pdf)}"
+                return self._send(416, b"", "application/pdf", headers)
+            fake._count("range_requests")
+            headers["Content-Range"] = f"bytes {start}-{len(pdf) - 1}/{len(pdf)}"
+        status = 206 if start else 200
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(pdf) - start))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        # Flaky mirror: drop the connection part-way through the body
+        stop = len(pdf)
+        if fake.should_drop():
+            fake._count("dropped_transfers")
+            stop = start + (len(pdf) - start) // 2
+            self.close_connection = True
+        try:
+            for chunk in pdf.chunks(start, stop):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # client aborted the transfer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # hundreds of clients may connect at once
+    fake: "FakeAPIServer"
+
+
+class FakeAPIServer:
+    """Local stand-in for HuggingFace, Semantic Scholar and PDF hosts."""
+
+    def __init__(
+        self,
+        cassette: Optional[Cassette] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: float = 1.0,
+        synthetic: Optional[SyntheticData] = None,
+        seed: int = 0,
+        port: int = 0,
+        rate_drop: float = 0.0,
+    ):
+        self.cassette = cassette or Cassette()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_drop = rate_drop      # share of PDF transfers cut off half-way
+        self.synthetic = synthetic or SyntheticData()
+        self.port = port
+        self.stats: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        if not self._server:
+            raise RuntimeError("FakeAPIServer is not running")
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeAPIServer":
+        self._server = _Server(("127.0.0.1", self.port), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ── Behaviour knobs ──────────────────────────────────────────────────
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def should_throttle(self) -> bool:
+        if self.rate_429 <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.rate_429
+
+    def should_drop(self) -> bool:
+        if self.rate_drop <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.rate_drop
+
+    def sleep(self):
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self._rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    # ── Synthetic endpoints ──────────────────────────────────────────────
+
+    def synthetic_response(self, method: str, path: str, q: dict, body: bytes):
+        """(status, body, content type) for a request, or None if unknown."""
+        d = self.synthetic
+        if method == "GET" and path == "/hf/api/daily_papers":
+            return self._ok([{"paper": self._hf_paper("daily", i)} for i in range(d.daily_papers)])
+        if method == "GET" and path == "/hf/api/datasets":
+            search = q.get("search", "")
+            offset, limit = int(q.get("offset", 0)), int(q.get("limit", 100))
+            end = min(d.datasets_per_query, offset + limit)
+            return self._ok([self._hf_dataset(search, i) for i in range(offset, end)])
+        if method == "GET" and path == "/hf/api/papers/search":
+            query = q.get("q", "")
+            limit = min(int(q.get("limit", 50)), d.hf_papers_per_query)
+            return self._ok([{"paper": self._hf_paper(query, i)} for i in range(limit)])
+        if method == "GET" and path == "/s2/paper/search/bulk":
+            query = q.get("query", "")
+            start = int(q.get("token") or 0)
+            end = min(d.s2_papers_per_query, start + d.s2_page_size)
+            out: dict = {
+                "total": d.s2_papers_per_query,
+                "data": [self._s2_hit(query, i) for i in range(start, end)],
+            }
+            if end < d.s2_papers_per_query:
+                out["token"] = str(end)
+            return self._ok(out)
+        if method == "POST" and path == "/s2/paper/batch":
+            try:
+                ids = json.loads(body or b"{}").get("ids", [])
+            except json.JSONDecodeError:
+                return 400, b'{"error": "bad body"}', "application/json"
+            return self._ok([self._s2_detail(pid) for pid in ids])
+        if method in ("GET", "HEAD") and path.startswith("/pdf/"):
+            return 200, self._pdf(path), "application/pdf"
+        return None
+
+    @staticmethod
+    def _ok(obj) -> tuple[int, bytes, str]:
+        return 200, json.dumps(obj).encode("utf-8"), "application/json"
+
+    def _arxiv_for(self, seed: str) -> str:
+        h = int(_hash("arxiv", seed)[:8], 16)
+        return f"24{h % 12 + 1:02d}.{h % 100000:05d}"
+
+    def _hf_paper(self, query: str, i: int) -> dict:
+        aid = self._arxiv_for(f"{query}:{i}")
+        return {"id": aid, "title": f"{query} paper {i}", "summary": f"Synthetic abstract for {query} {i}.",
+                "publishedAt": f"2024-{i % 12 + 1:02d}-01T00:00:00.000Z"}
+
+    def _hf_dataset(self, search: str, i: int) -> dict:
+        slug = search.split()[0] if search.split() else "ds"
+        return {
+            "id": f"org{i % 17}/{slug}-{i}",
+            "tags": ["language:en", "task_categories:question-answering"],
+            "lastModified": f"2024-{12 - i % 12:02d}-{i % 28 + 1:02d}T00:00:00.000Z",
+            "cardData": {"pretty_name": f"{search} dataset {i}"},
+            "description": f"Synthetic dataset {i} for {search}.",
+        }
+
+    def _s2_hit(self, query: str, i: int) -> dict:
+        # A share of hits recurs across queries, like real overlapping searches
+        shared = (i % 100) < self.synthetic.shared_fraction * 100
+        seed = f"shared:{i}" if shared else f"{query}:{i}"
+        pid = _hash("s2", seed)
+        hit = {
+            "paperId": pid,
+            "title": f"Paper {seed}",
+            "abstract": f"Synthetic abstract about {query}.",
+            "year": 2020 + i % 5,
+            "citationCount": 1000 - i % 1000,
+            "url": f"https://www.semanticscholar.org/paper/{pid}",
+            "externalIds": {},
+            "publicationDate": f"{2020 + i % 5}-{i % 12 + 1:02d}-01",
+            "fieldsOfStudy": ["Computer Science"],
+        }
+        if i % 3 == 0:
+            hit["externalIds"]["ArXiv"] = self._arxiv_for(seed)
+        return hit
+
+    def _s2_detail(self, batch_id: str) -> Optional[dict]:
+        if batch_id.startswith("DOI:"):
+            return None
+        pid = batch_id if not batch_id.startswith("ArXiv:") else _hash("s2", "arxiv", batch_id[6:])
+        ext = {"ArXiv": batch_id[6:]} if batch_id.startswith("ArXiv:") else {}
+        base = self.base_url
+        return {
+            "paperId": pid,
+            "externalIds": ext,
+            "title": f"Details for {batch_id}",
+            "abstract": "Synthetic details.",
+            "tldr": {"text": "Synthetic TLDR."},
+            "openAccessPdf": {"url": f"{base}/pdf/{pid}.pdf"},
+        }
+
+    def _pdf(self, path: str) -> SyntheticPdf:
+        return SyntheticPdf(b"%PDF-1.4\n%" + path.encode("utf-8") + b"\n", self.synthetic.pdf_bytes)
+
+
+def _serve_in_child(conn, cassette_path: str, kwargs: dict):
+    with FakeAPIServer(cassette=Cassette(cassette_path) if cassette_path else None, **kwargs) as server:
+        conn.send(server.base_url)
+        conn.recv()                 # parent asks to stop
+        conn.send(dict(server.stats))
+
+
+class FakeAPIProcess:
+    """
+    ``FakeAPIServer`` in a child process, so its handler threads do not
+    share the GIL with the client being measured (high-concurrency
+    benchmarks). Same arguments, with the cassette given as a path;
+    ``stats`` is filled in when the server stops.
+    """
+
+    def __init__(self, cassette_path: str = "", **kwargs):
+        self.cassette_path = cassette_path
+        self.kwargs = kwargs
+        self.base_url = ""
+        self.stats: dict[str, int] = {}
+        self._conn = None
+        self._process = None
+
+    def __enter__(self) -> "FakeAPIProcess":
+        import multiprocessing
+
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve_in_child, args=(child, self.cassette_path, self.kwargs), daemon=True,
+        )
+        self._process.start()
+        self.base_url = self._conn.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.send("stop")
+        self.stats = self._conn.recv()
+        self._process.join(timeout=5)
+
+
+# ── Pointing the scraper at the fake server ──────────────────────────────────
+
+@contextlib.contextmanager
+def pointed_at(base_url: str) -> Iterator[None]:
+    """Redirect scraper / async_search endpoints to *base_url* for the block."""
+    import scraper
+    modules = [scraper]
+    try:
+        import async_search
+        modules.append(async_search)
+    except ImportError:
+        pass
+
+    names = {"BASE": f"{base_url}/hf", "API_BASE": f"{base_url}/hf/api", "S2_API_BASE": f"{base_url}/s2"}
+    saved = [(m, n, getattr(m, n)) for m in modules for n in names if hasattr(m, n)]
+    for m, n, _ in saved:
+        setattr(m, n, names[n])
+
+    prefixes = {f"{base_url}/hf": "hf", f"{base_url}/s2": "s2"}
+    for prefix, provider in prefixes.items():
+        ratelimit.register_url_provider(prefix, provider)
+    try:
+        yield
+    finally:
+        for m, n, value in saved:
+            setattr(m, n, value)
+        for prefix in prefixes:
+            ratelimit.URL_PREFIX_PROVIDERS.pop(prefix, None)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+
+def _cmd_record(args):
+    from scraper import run_search
+    with record_http(args.cassette) as cassette:
+        before = len(cassette)
+        run_search(
+            args.query,
+            include_daily_papers=not args.no_daily_papers,
+            max_datasets_per_query=args.max_datasets,
+            max_papers_per_query=args.max_papers,
+            fetch_details=not args.no_details,
+            details_output_path=os.path.join(os.path.dirname(args.cassette) or ".", "recorded_details.db"),
+        )
+    print(f"\nRecorded {len(cassette) - before} interactions -> {args.cassette}")
+
+
+def _cmd_serve(args):
+    server = FakeAPIServer(
+        cassette=Cassette(args.cassette) if args.cassette else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        port=args.port,
+        rate_drop=args.rate_drop,
+    ).start()
+    print(f"Fake API on {server.base_url}  (HF: /hf, S2: /s2, PDFs: /pdf)")
+    print(f"  {len(server.cassette)} recorded interactions; everything else is synthesised.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\nStats: {server.stats}")
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record live API traffic or serve it back locally.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Run a live search and record every response.")
+    rec.add_argument("--cassette", default="output/cassettes/live.jsonl")
+    rec.add_argument("--query", "-q", action="append", required=True, help="Search query (repeatable).")
+    rec.add_argument("--max-datasets", type=int, default=100)
+    rec.add_argument("--max-papers", type=int, default=200)
+    rec.add_argument("--no-daily-papers", action="store_true")
+    rec.add_argument("--no-details", action="store_true")
+    rec.set_defaults(func=_cmd_record)
+
+    srv = sub.add_parser("serve", help="Serve a cassette (plus synthetic data) locally.")
+    srv.add_argument("--cassette", default="")
+    srv.add_argument("--port", type=int, default=8765)
+    srv.add_argument("--latency", type=float, default=0.05, help="Base latency per request in seconds.")
+    srv.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random latency (seconds).")
+    srv.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    srv.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with injected 429s.")
+    srv.add_argument("--rate-drop", type=float, default=0.0, help="Fraction of PDF transfers cut off half-way.")
+    srv.set_defaults(func=_cmd_serve)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
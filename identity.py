@@ -0,0 +1,148 @@
+"""
+Canonical identities for discovered papers and datasets.
+
+The same paper reaches the pipeline under several URLs -- HF daily papers
+(``huggingface.co/papers/2402.08070``), S2 bulk search
+(``arxiv.org/abs/2402.08070``), a versioned arXiv link
+(``arxiv.org/abs/2402.08070v2``) or a PDF link. ``canonical_id`` maps all
+of them to one key so they are de-duplicated (and classified) once:
+
+    arxiv:<id>          arXiv abs / pdf / HF papers URLs, any version
+    s2:<paperId>        Semantic Scholar paper URLs without an arXiv ID
+    doi:<doi>           doi.org links
+    hf_dataset:<repo>   HF dataset pages (case-insensitive repo id)
+    url:<host/path>     anything else (scheme, "www.", trailing "/" dropped)
+
+``IdentityIndex`` is the hash index used by ``run_search`` and
+``main.merge_entries``: one dict lookup per entry, with a count of the
+duplicates it absorbed. ``s2_lookup_keys`` turns a URL into the keys the
+S2 details lookups (``details_store.DetailsStore`` or an in-memory dict)
+are indexed by.
+
+Usage:
+    from identity import IdentityIndex, canonical_id
+    canonical_id("https://arxiv.org/pdf/2402.08070v2.pdf")  # "arxiv:2402.08070"
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import unquote, urlparse
+
+# New-style (2402.08070) and old-style (math.GT/0309136, cs/0112017) arXiv IDs
+_ARXIV_ID = re.compile(r"^(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[a-z]{2})?/\d{7})(?:v\d+)?$", re.IGNORECASE)
+_S2_ID = re.compile(r"^[0-9a-f]{40}$", re.IGNORECASE)
+
+
+def _arxiv_id(candidate: str) -> str:
+    """Normalise an arXiv ID (drop ``.pdf`` and version suffix), or "" if it is not one."""
+    candidate = candidate.strip().lower()
+    if candidate.endswith(".pdf"):
+        candidate = candidate[:-4]
+    m = _ARXIV_ID.match(candidate)
+    return m.group(1) if m else ""
+
+
+@lru_cache(maxsize=200_000)
+def canonical_id(url: str) -> str:
+    """Map a source URL to its canonical identity key (see module docstring)."""
+    if not url:
+        return ""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = unquote(parsed.path).rstrip("/")
+    parts = [p for p in path.split("/") if p]
+
+    if host.endswith("arxiv.org") and len(parts) >= 2 and parts[0] in ("abs", "pdf", "html"):
+        aid = _arxiv_id("/".join(parts[1:]))
+        if aid:
+            return f"arxiv:{aid}"
+
+    if host == "huggingface.co" and len(parts) >= 2:
+        if parts[0] == "papers":
+            aid = _arxiv_id(parts[1])
+            if aid:
+                return f"arxiv:{aid}"
+        if parts[0] == "datasets" and len(parts) >= 3:
+            return f"hf_dataset:{parts[1].lower()}/{parts[2].lower()}"
+        if parts[0] == "datasets":
+            return f"hf_dataset:{parts[1].lower()}"
+
+    if host == "semanticscholar.org" and len(parts) >= 2 and parts[0] == "paper":
+        # /paper/<id> or /paper/<title-slug>/<id>
+        pid = next((p for p in reversed(parts[1:]) if _S2_ID.match(p)), parts[1])
+        return f"s2:{pid.lower()}"
+
+    if host in ("doi.org", "dx.doi.org") and len(parts) >= 2:
+        return f"doi:{'/'.join(parts).lower()}"
+
+    return f"url:{host}{path}" + (f"?{parsed.query}" if parsed.query else "")
+
+
+def s2_lookup_keys(url: str) -> list[str]:
+    """Keys to try in an S2 details lookup for *url* (paperId, ``arxiv:``, ``doi:``)."""
+    key = canonical_id(url)
+    kind, _, value = key.partition(":")
+    if kind == "s2":
+        return [value]
+    if kind in ("arxiv", "doi"):
+        return [key]
+    return []
+
+
+def s2_batch_id(url: str) -> str:
+    """The ``POST /paper/batch`` ID for a paper URL (paperId / ``ArXiv:`` / ``DOI:``), or ""."""
+    kind, _, value = canonical_id(url).partition(":")
+    if kind == "s2":
+        return value
+    if kind == "arxiv":
+        return f"ArXiv:{value}"
+    if kind == "doi":
+        return f"DOI:{value}"
+    return ""
+
+
+def find_s2_detail(url: str, s2_lookup) -> dict | None:
+    """Find the S2 detail for *url* in a dict-like lookup (dict or DetailsStore)."""
+    for key in s2_lookup_keys(url):
+        detail = s2_lookup.get(key)
+        if detail is not None:
+            return detail
+    return None
+
+
+class IdentityIndex:
+    """
+    Hash index of canonical IDs seen so far, counting absorbed duplicates.
+
+    ``duplicates`` counts every rejected URL; ``aliases`` counts only those
+    whose URL differs from the first one seen for that identity -- the
+    duplicates plain URL de-duplication would have let through.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._keys: dict[str, str] = {}
+        for u in urls:
+            self._keys.setdefault(canonical_id(u), u)
+        self.duplicates = 0
+        self.aliases = 0
+
+    def add(self, url: str) -> bool:
+        """Register *url*; True if its identity is new, False for a duplicate."""
+        key = canonical_id(url)
+        first = self._keys.get(key)
+        if first is not None:
+            self.duplicates += 1
+            if first != url:
+                self.aliases += 1
+            return False
+        self._keys[key] = url
+        return True
+
+    def __contains__(self, url: object) -> bool:
+        return isinstance(url, str) and canonical_id(url) in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
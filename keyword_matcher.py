@@ -0,0 +1,159 @@
+"""
+Single-pass keyword matcher for the heuristic classifiers.
+
+The heuristic stage used to run one ``re.search(r"\\bkw\\b", blob)`` (or a
+substring test) per keyword, per category, per entry -- ~350 searches for
+every scraped entry, most of them through ``re``'s compile cache.
+``KeywordMatcher`` compiles every keyword of every category once into a
+trie and a single regex built from it, then scores *all* categories of
+all groups in one scan of a text blob.
+
+Matching rules (same as the per-keyword searches they replace):
+  - ``bounded`` keywords must sit on word boundaries (``\\b...\\b``), so
+    "math" does not match "aftermath";
+  - unbounded keywords (multi-word phrases in ``mapper``) are plain
+    substring matches;
+  - each distinct keyword counts once per blob, with its category weight.
+
+Overlapping keywords ("reasoning" inside "general reasoning", "tutor" at
+the start of "tutoring") are all found: the regex is a zero-width
+lookahead that stops at every position where some keyword starts, and the
+trie walk from there yields every keyword ending further on.
+
+Usage:
+    from keyword_matcher import KeywordMatcher, concern_matcher
+
+    m = KeywordMatcher()
+    m.add("tool", "ai_tutor", "tutor", bounded=True, weight=1.0)
+    m.scores("an llm tutor")          # {"tool": {"ai_tutor": 1.0}}
+
+    concern_matcher().scores(blob)["concern"]
+"""
+
+import re
+from functools import lru_cache
+
+_END = ""   # trie key holding the keyword ids that end at a node
+
+
+def _is_word(ch: str) -> bool:
+    """Same notion of a word character as ``re``'s ``\\w`` for str patterns."""
+    return ch.isalnum() or ch == "_"
+
+
+def _trie_regex(node: dict) -> str:
+    """Regex matching any key of a trie node's subtree (longest branches first)."""
+    branches = [
+        re.escape(ch) + _trie_regex(child)
+        for ch, child in sorted(node.items()) if ch != _END
+    ]
+    if not branches:
+        return ""
+    if len(branches) == 1 and _END not in node:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ("|" if _END in node else "") + ")"
+
+
+class KeywordMatcher:
+    """
+    Keywords of several groups (e.g. ``framework``, ``tool``) compiled into
+    one matcher. Add keywords with ``add`` (or ``add_group``); the matcher
+    compiles itself on first use.
+    """
+
+    def __init__(self):
+        self._keywords: list[tuple[str, bool]] = []        # id -> (text, bounded)
+        self._ids: dict[tuple[str, bool], int] = {}
+        self._targets: list[list[tuple[str, str, float]]] = []   # id -> (group, category, weight)
+        self._trie: dict = {}
+        self._regex: re.Pattern | None = None
+
+    def add(self, group: str, category: str, keyword: str, bounded: bool, weight: float = 1.0):
+        """Register *keyword* (case-insensitive) as evidence for *category* in *group*."""
+        text = keyword.lower()
+        if not text:
+            return
+        key = (text, bounded)
+        kid = self._ids.get(key)
+        if kid is None:
+            kid = self._ids[key] = len(self._keywords)
+            self._keywords.append(key)
+            self._targets.append([])
+            node = self._trie
+            for ch in text:
+                node = node.setdefault(ch, {})
+            node.setdefault(_END, []).append(kid)
+            self._regex = None
+        self._targets[kid].append((group, category, weight))
+
+    def add_group(self, group: str, keywords: dict[str, list[str]], rule):
+        """Add ``{category: [keyword, ...]}``; ``rule(keyword) -> (bounded, weight)``."""
+        for category, words in keywords.items():
+            for kw in words:
+                bounded, weight = rule(kw)
+                self.add(group, category, kw, bounded, weight)
+
+    def _compiled(self) -> re.Pattern:
+        if self._regex is None:
+            body = _trie_regex(self._trie) or "(?!)"
+            self._regex = re.compile(f"(?=({body}))")
+        return self._regex
+
+    def matches(self, blob: str) -> set[int]:
+        """IDs of the distinct keywords found in an already-lowercased *blob*."""
+        found: set[int] = set()
+        n = len(blob)
+        keywords = self._keywords
+        for m in self._compiled().finditer(blob):
+            start = m.start()
+            left_ok = start == 0 or not _is_word(blob[start - 1])
+            node = self._trie
+            i = start
+            # Every keyword starting here is a prefix of the longest match
+            while i < n:
+                node = node.get(blob[i])
+                if node is None:
+                    break
+                i += 1
+                ids = node.get(_END)
+                if ids:
+                    right_ok = i == n or not _is_word(blob[i])
+                    for kid in ids:
+                        if not keywords[kid][1] or (left_ok and right_ok):
+                            found.add(kid)
+        return found
+
+    def scores(self, blob: str) -> dict[str, dict[str, float]]:
+        """``{group: {category: score}}`` for every category with a match."""
+        out: dict[str, dict[str, float]] = {}
+        for kid in self.matches(blob):
+            for group, category, weight in self._targets[kid]:
+                cats = out.setdefault(group, {})
+                cats[category] = cats.get(category, 0.0) + weight
+        return out
+
+    @property
+    def keywords(self) -> list[tuple[str, bool]]:
+        """``(text, bounded)`` of every distinct keyword, indexed by keyword id."""
+        return list(self._keywords)
+
+    def targets(self, kid: int) -> list[tuple[str, str, float]]:
+        """``(group, category, weight)`` a keyword id counts towards."""
+        return list(self._targets[kid])
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+
+@lru_cache(maxsize=1)
+def concern_matcher() -> KeywordMatcher:
+    """Matcher for ``config.CONCERNS`` keywords (group ``"concern"``, all word-bounded)."""
+    from config import CONCERNS
+
+    m = KeywordMatcher()
+    m.add_group(
+        "concern",
+        {key: info["keywords"] for key, info in CONCERNS.items()},
+        lambda kw: (True, 1.0),
+    )
+    return m
@@ -0,0 +1,145 @@
+"""
+Durable cache of LLM classification results.
+
+``map_all`` used to send every entry to the LLM on every run, although
+most entries -- and their S2 context -- do not change between runs. This
+SQLite cache (``output/llm_classifications.db``) keeps one result per
+
+    hash(model, prompt fingerprint, entry context)
+
+where the *prompt fingerprint* hashes everything else the answer depends
+on: the prompt version, the system prompt and the ``config.FRAMEWORK`` /
+``config.TOOL_TYPES`` definitions (``mapper.classification_fingerprint``).
+Rows written under a different fingerprint are purged when the cache is
+opened, so editing a framework category or tool type invalidates every
+cached answer instead of serving stale ones.
+
+Usage:
+    uv run main.py                  # Only new or changed entries are classified
+    uv run main.py --no-llm-cache   # Re-classify everything (cache is refreshed)
+
+    from llm_cache import ClassificationCache
+    cache = ClassificationCache(fingerprint="...")
+    cache.get_many({i: cache.key(model, ctx) for i, ctx in ...})
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+LLM_CACHE_DB = "output/llm_classifications.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key         TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    result      TEXT NOT NULL,
+    created     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_fingerprint ON results (fingerprint);
+"""
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of JSON-serialisable parts (dict key order does not matter)."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def entry_key(model: str, prompt_fingerprint: str, context: str) -> str:
+    """Cache key of one entry's classification."""
+    return fingerprint(model, prompt_fingerprint, context)
+
+
+class ClassificationCache:
+    """SQLite-backed ``key -> classification result`` cache for one prompt fingerprint."""
+
+    def __init__(self, fingerprint: str, path: str = LLM_CACHE_DB):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Answers given under other definitions / prompts are stale
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM results WHERE fingerprint != ?", (fingerprint,))
+        self.invalidated = cur.rowcount
+
+    def key(self, model: str, context: str) -> str:
+        return entry_key(model, self.fingerprint, context)
+
+    def get_many(self, keys: dict[int, str], count: bool = True) -> dict[int, dict]:
+        """
+        Look up ``{entry_index: key}``; returns ``{entry_index: result}`` for
+        the hits. With ``count=False`` the lookup is left out of the hit rate.
+        """
+        found: dict[int, dict] = {}
+        by_key: dict[str, list[int]] = {}
+        for idx, k in keys.items():
+            by_key.setdefault(k, []).append(idx)
+        unique = list(by_key)
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, result FROM results WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for k, result in rows:
+                    for idx in by_key[k]:
+                        found[idx] = json.loads(result)
+        if count:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, results: Iterable[tuple[str, dict]]):
+        """Store ``(key, result)`` pairs (the ``index`` field is dropped) in one transaction."""
+        now = time.time()
+        rows = [
+            (k, self.fingerprint, model,
+             json.dumps({f: v for f, v in r.items() if f != "index"}, ensure_ascii=False), now)
+            for k, r in results
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (key, fingerprint, model, result, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        self.stored += len(rows)
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def summary(self) -> str:
+        rate = self.hit_rate
+        return (
+            f"{self.hits} hits / {self.hits + self.misses} lookups"
+            + (f" ({rate:.0%})" if rate is not None else "")
+            + f", {self.stored} new results stored"
+            + (f", {self.invalidated} stale results invalidated" if self.invalidated else "")
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -9,44 +9,81 @@ Usage:
     uv run main.py --no-s2          # Skip Semantic Scholar; only use HuggingFace
     uv run main.py --no-details     # Skip fetching full paper details after search
     uv run main.py --no-llm         # Skip LLM classification; heuristic keywords only
+    uv run main.py --llm-mode batch # Classify via the Message Batches API (50% cheaper; resumable)
+    uv run main.py --cascade        # Skip the LLM for entries stage 1 decides (gates from cascade.py)
+    uv run main.py --prefilter      # Skip the LLM for entries the learned pre-classifier rejects
+    uv run main.py --no-llm-cache   # Re-classify every entry instead of reusing output/llm_classifications.db
+    uv run main.py --max-input-tokens 4000  # Smaller LLM prompts (entries are packed by estimated tokens)
     uv run main.py --model claude-sonnet-4-20250514  # Use a different Anthropic model
     uv run main.py --query "math"   # Add a custom query to the search list
+    uv run main.py --concurrent     # Run the query searches concurrently (asyncio engine)
+    uv run main.py --no-cache       # Bypass the on-disk HTTP response cache (output/http_cache/)
+    uv run main.py --incremental    # Only fetch items newer than the last run; append to the scraped log
+    uv run main.py --resume         # Continue an interrupted search from output/discovery_units.jsonl
+    uv run main.py --plan-queries   # Order queries by past yield; cap (or --low-yield skip) low-yield ones
 """
 
 import argparse
-import json
 import os
 import sys
+from typing import Iterable
 
 from dotenv import load_dotenv
 load_dotenv()  # Load .env file (e.g. S2_API_KEY, ANTHROPIC_API_KEY)
 
 from config import HF_SEARCH_QUERIES
-from scraper import BenchmarkEntry, run_search
+from details_store import open_details_store
+from discovery_log import (
+    ENTRIES_PATH,
+    DiscoveryLog,
+    iter_scraped_entries,
+    scraped_entries_exist,
+)
+from http_cache import DEFAULT_MAX_BYTES, enable_response_cache
+from identity import IdentityIndex
+from scraper import BenchmarkEntry, SearchWatermarks, run_search
 from known_benchmarks import KNOWN_BENCHMARKS
-from mapper import map_all
+from query_planner import (
+    DEFAULT_MIN_YIELD,
+    YIELD_PATH,
+    QueryYield,
+    plan_queries,
+    refresh_scores,
+)
+from mapper import INPUT_TOKEN_BUDGET, OUTPUT_TOKEN_BUDGET, map_all
+from cascade import CASCADE_GATES
+from preclassifier import PRECLASSIFIER_PATH
 from report import write_reports, generate_markdown
 
 
 def merge_entries(
-    scraped: list[BenchmarkEntry],
+    scraped: Iterable[BenchmarkEntry],
     known: list[BenchmarkEntry],
 ) -> list[BenchmarkEntry]:
-    """Merge scraped and known entries, preferring known entries on URL collision."""
-    seen_urls = set()
+    """
+    Merge scraped and known entries, preferring known entries on collision.
+
+    Entries collide when they share a canonical identity (identity.py), so
+    e.g. an HF daily-papers link and the arXiv link S2 returned for the same
+    paper are merged. *scraped* may be a lazy generator (e.g.
+    ``iter_scraped_entries()``); it is consumed once.
+    """
+    seen = IdentityIndex()
     merged = []
 
     # Known benchmarks take priority (they have hand-curated mappings)
     for entry in known:
-        seen_urls.add(entry.source_url)
-        merged.append(entry)
+        if seen.add(entry.source_url):
+            merged.append(entry)
 
     # Add scraped entries that aren't already known
     for entry in scraped:
-        if entry.source_url not in seen_urls:
-            seen_urls.add(entry.source_url)
+        if seen.add(entry.source_url):
             merged.append(entry)
 
+    if seen.aliases:
+        print(f"Identity resolution merged {seen.aliases} duplicate entries "
+              f"({seen.aliases} fewer LLM classifications).")
     return merged
 
 
@@ -62,7 +99,8 @@ def cli():
     parser.add_argument(
         "--skip-search",
         action="store_true",
-        help="Skip search; reload previously cached scraped results from output/scraped_cache.json.",
+        help=f"Skip search; reload previously scraped results from {ENTRIES_PATH} "
+             "(or the older output/scraped_cache.json).",
     )
     parser.add_argument(
         "--search-only",
@@ -79,7 +117,61 @@ def cli():
         "--delay",
         type=float,
         default=1.0,
-        help="Delay between HTTP requests in seconds (default: 1.0).",
+        help="Pause after network errors in seconds (default: 1.0). "
+             "Request pacing is handled by the per-provider rate limiter.",
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Run searches concurrently with the asyncio engine (async_search.py).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Query searches in flight at once with --concurrent (default: 8).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only search for items newer than each query's last-run watermark "
+             f"(output/search_watermarks.json) and append them to {ENTRIES_PATH}.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted search: skip (query, provider) units already "
+             "finished and continue unfinished ones from their last page.",
+    )
+    parser.add_argument(
+        "--plan-queries",
+        action="store_true",
+        help=f"Order queries by expected yield from {YIELD_PATH} and cap or skip low-yield ones.",
+    )
+    parser.add_argument(
+        "--min-query-yield",
+        type=float,
+        default=DEFAULT_MIN_YIELD,
+        help=f"With --plan-queries: expected new benchmarks per run below which a query "
+             f"is pruned (default: {DEFAULT_MIN_YIELD}).",
+    )
+    parser.add_argument(
+        "--low-yield",
+        choices=["cap", "skip"],
+        default="cap",
+        help="With --plan-queries: cap low-yield queries to a fraction of the result "
+             "limits, or skip them (default: cap).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the on-disk HTTP response cache (output/http_cache/).",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help=f"Size limit of the HTTP response cache in MB (default: {DEFAULT_MAX_BYTES // (1024 * 1024)}).",
     )
     parser.add_argument(
         "--no-daily-papers",
@@ -113,6 +205,31 @@ def cli():
         action="store_true",
         help="Skip LLM classification; use heuristic keyword mapping only.",
     )
+    parser.add_argument(
+        "--llm-mode",
+        choices=["realtime", "batch"],
+        default="realtime",
+        help="LLM classification via parallel real-time calls, or the Message Batches API "
+             "(50%% cheaper; submitted batches are saved and a re-run resumes polling them).",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Ignore cached LLM classifications (output/llm_classifications.db) and "
+             "re-classify every entry; the cache is refreshed with the new results.",
+    )
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Only send entries the heuristic stage is unsure about to the LLM, using the "
+             "gates calibrated by cascade.py (output/cascade_gates.json).",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Skip the LLM for entries the local pre-classifier (preclassifier.py, "
+             "output/preclassifier.npz) is confident are not benchmarks.",
+    )
     parser.add_argument(
         "--model",
         type=str,
@@ -122,14 +239,28 @@ def cli():
     parser.add_argument(
         "--batch-size",
         type=int,
-        default=20,
-        help="Entries per LLM batch (default: 20).",
+        default=40,
+        help="Max entries per LLM prompt (default: 40); prompts are packed by token budget.",
+    )
+    parser.add_argument(
+        "--max-input-tokens",
+        type=int,
+        default=INPUT_TOKEN_BUDGET,
+        help=f"Estimated entry-context tokens per LLM prompt (default: {INPUT_TOKEN_BUDGET}).",
+    )
+    parser.add_argument(
+        "--max-output-tokens",
+        type=int,
+        default=OUTPUT_TOKEN_BUDGET,
+        help=f"Ceiling on max_tokens per LLM prompt; also caps entries per prompt "
+             f"(default: {OUTPUT_TOKEN_BUDGET}).",
     )
     parser.add_argument(
         "--max-workers",
         type=int,
-        default=5,
-        help="Parallel LLM workers (default: 5).",
+        default=16,
+        help="Upper bound on concurrent LLM calls; the actual concurrency adapts to "
+             "rate limits (AIMD, default max: 16).",
     )
     parser.add_argument(
         "--print",
@@ -140,23 +271,30 @@ def cli():
     args = parser.parse_args()
 
     # ── Collect entries ──────────────────────────────────────────────────
-    scraped: list[BenchmarkEntry] = []
+    scraped: Iterable[BenchmarkEntry] = []
     known: list[BenchmarkEntry] = []
-    scraped_cache_path = os.path.join("output", "scraped_cache.json")
+    yields = QueryYield.load()
 
     if args.skip_search:
-        # Reload from cached scraped results
-        if os.path.exists(scraped_cache_path):
-            with open(scraped_cache_path, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-            scraped = [BenchmarkEntry(**r) for r in raw]
-            print(f"Loaded {len(scraped)} cached scraped entries from {scraped_cache_path}")
+        # Stream previously scraped results from the discovery log
+        if scraped_entries_exist():
+            scraped = iter_scraped_entries()
+            print(f"Loading scraped entries from {ENTRIES_PATH} ...")
         else:
-            print(f"ERROR: No cached scraped results found at {scraped_cache_path}")
-            print("Run without --skip-search first to populate the cache.")
+            print(f"ERROR: No scraped results found at {ENTRIES_PATH}")
+            print("Run without --skip-search first to populate it.")
             sys.exit(1)
     elif not args.known_only:
         queries = HF_SEARCH_QUERIES + args.query
+        query_scales: dict[str, float] = {}
+        if args.plan_queries:
+            planned = plan_queries(queries, yields, args.min_query_yield, args.low_yield)
+            skipped = [p.query for p in planned if p.action == "skip"]
+            query_scales = {p.query: p.scale for p in planned if p.action == "cap"}
+            queries = [p.query for p in planned if p.action != "skip"]
+            yields.note_skipped(skipped)
+            print(f"Query plan: {len(queries)} queries by expected yield "
+                  f"({len(query_scales)} capped, {len(skipped)} skipped as low-yield).")
         use_s2 = not args.no_s2
         sources = []
         if use_s2:
@@ -164,25 +302,53 @@ def cli():
         sources.append("HuggingFace")
         print(f"Starting search with {len(queries)} queries across {', '.join(sources)} ...")
         if use_s2 and not args.no_details:
-            print("Full paper details will be fetched after search.\n")
+            print("S2 paper details are fetched in the background during the search.\n")
         else:
             print()
 
-        scraped = run_search(
-            queries,
+        if not args.no_cache:
+            enable_response_cache(max_bytes=args.cache_max_mb * 1024 * 1024)
+
+        previous: list[BenchmarkEntry] = []
+        watermarks = None
+        if args.incremental:
+            previous = list(iter_scraped_entries())
+            watermarks = SearchWatermarks.load()
+            print(f"Incremental mode: {len(previous)} previously scraped entries, "
+                  f"watermarks for {sum(len(m) for m in watermarks.marks.values())} (provider, query) pairs.\n")
+
+        search_kwargs = dict(
             include_daily_papers=not args.no_daily_papers,
             include_semantic_scholar=use_s2,
             delay=args.delay,
             max_datasets_per_query=args.max_datasets,
             max_papers_per_query=args.max_papers,
             fetch_details=use_s2 and not args.no_details,
+            watermarks=watermarks,
+            known_urls={e.source_url for e in previous},
+            yields=yields,
+            query_scales=query_scales,
         )
+        # Entries are streamed to the log as they are found (crash-safe)
+        log_mode = "resume" if args.resume else ("append" if args.incremental else "new")
+        with DiscoveryLog(mode=log_mode) as log:
+            if args.concurrent:
+                from async_search import run_search_concurrent
+                scraped = run_search_concurrent(
+                    queries, concurrency=args.concurrency, log=log, **search_kwargs,
+                )
+            else:
+                scraped = run_search(queries, log=log, **search_kwargs)
+
+        if args.incremental:
+            print(f"Incremental search found {len(scraped)} new entries.")
+            scraped = previous + scraped
+            watermarks.save()
+            print(f"Saved search watermarks to {watermarks.path}")
 
-        # Save scraped results to cache for --skip-search later
-        os.makedirs("output", exist_ok=True)
-        with open(scraped_cache_path, "w", encoding="utf-8") as f:
-            json.dump([e.to_dict() for e in scraped], f, indent=2)
-        print(f"Saved {len(scraped)} scraped entries to {scraped_cache_path}")
+        print(f"Scraped entries are in {ENTRIES_PATH} ({len(scraped)} total)")
+        yields.save()
+        print(f"Saved per-query yield stats to {yields.path}")
 
     if not args.search_only:
         known = list(KNOWN_BENCHMARKS)
@@ -190,7 +356,7 @@ def cli():
 
     # ── Merge & map ──────────────────────────────────────────────────────
     if args.search_only:
-        entries = scraped
+        entries = list(scraped)
     elif args.known_only:
         entries = known
     else:
@@ -198,13 +364,10 @@ def cli():
 
     print(f"\nTotal entries: {len(entries)}")
 
-    # Load S2 paper details (for LLM context enrichment)
-    s2_details = None
-    details_path = "output/s2_paper_details.json"
-    if os.path.exists(details_path):
-        with open(details_path, "r", encoding="utf-8") as f:
-            s2_details = json.load(f)
-        print(f"Loaded {len(s2_details)} S2 paper details from {details_path}")
+    # Open the S2 paper details store (for LLM context enrichment)
+    s2_details = open_details_store()
+    if s2_details is not None:
+        print(f"Opened {len(s2_details)} S2 paper details in {s2_details.path}")
 
     print("Mapping to framework categories and tool types ...")
     entries = map_all(
@@ -214,8 +377,22 @@ def cli():
         model=args.model,
         batch_size=args.batch_size,
         max_workers=args.max_workers,
+        max_input_tokens=args.max_input_tokens,
+        max_output_tokens=args.max_output_tokens,
+        refresh_llm_cache=args.no_llm_cache,
+        llm_mode=args.llm_mode,
+        cascade_gates_path=CASCADE_GATES if args.cascade else None,
+        preclassifier_path=PRECLASSIFIER_PATH if args.prefilter else None,
     )
 
+    # Credit classification results and paper scores back to the queries
+    if yields.owners:
+        if not args.no_llm:
+            yields.record_classification(entries)
+        refresh_scores(yields)
+        yields.save()
+        print(f"Saved per-query yield stats to {yields.path}")
+
     # ── Report ───────────────────────────────────────────────────────────
     print("\nGenerating reports ...")
     md_path, csv_path, json_path = write_reports(entries)
@@ -0,0 +1,230 @@
+"""
+Append-only journal for the PDF download manifest.
+
+``papers_manifest.json`` used to be rewritten in full every 50 completed
+downloads and at the end of a run: each save cost O(total papers), and a
+crash lost up to 49 results. The manifest is now two files:
+
+  - ``papers_manifest.json`` -- the snapshot, a JSON array of records
+    (same format as before, so anything reading it keeps working);
+  - ``papers_manifest.journal.jsonl`` -- one status event per line (the
+    paper's full record after the change), appended as each download
+    finishes.
+
+Recording is O(1): one line, flushed immediately (a killed process loses
+nothing) and ``fsync``-ed every ``FSYNC_EVERY`` events or ``FSYNC_INTERVAL``
+seconds. Readers load the snapshot and replay the journal over it into an
+in-memory ``paper_id -> record`` index; a torn last line is skipped.
+
+Once the journal holds ``COMPACT_EVERY`` events, it is compacted in the
+background: under the lock the journal is renamed to ``.compacting`` and a
+fresh one started, then a thread writes the index as of the rename to a
+new snapshot (temp file + ``os.replace``) and deletes the ``.compacting``
+file. Readers replay snapshot, ``.compacting`` (left by a crash mid-
+compaction), journal, in that order; events carry full records, so
+replaying one twice is harmless. ``close`` compacts everything into the
+snapshot.
+
+Usage:
+    from manifest_journal import ManifestJournal, read_manifest
+    with ManifestJournal("output/papers_manifest.json") as journal:
+        journal.record({"paper_id": ..., "status": "downloaded", ...})
+    manifest = read_manifest("output/papers_manifest.json")   # {paper_id: record}
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from discovery_log import _iter_jsonl, _trim_torn_tail
+
+COMPACT_EVERY = 1000          # journal events before a background compaction
+FSYNC_EVERY = 100
+FSYNC_INTERVAL = 5.0
+
+PathLike = Union[str, Path]
+
+
+def journal_path(snapshot: PathLike) -> Path:
+    """``papers_manifest.json`` -> ``papers_manifest.journal.jsonl``."""
+    snapshot = Path(snapshot)
+    return snapshot.with_name(snapshot.stem + ".journal.jsonl")
+
+
+def _compacting_path(snapshot: PathLike) -> Path:
+    journal = journal_path(snapshot)
+    return journal.with_name(journal.name + ".compacting")
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+def _iter_events(snapshot: PathLike) -> Iterator[dict]:
+    """Snapshot records, then journal events, in replay order."""
+    snapshot = Path(snapshot)
+    if snapshot.exists():
+        try:
+            with open(snapshot, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    for path in (_compacting_path(snapshot), journal_path(snapshot)):
+        if path.exists():
+            yield from _iter_jsonl(str(path))
+
+
+def read_manifest(snapshot: PathLike) -> dict[str, dict]:
+    """The current manifest as ``{paper_id: record}`` (read-only; empty if none)."""
+    index: dict[str, dict] = {}
+    for rec in _iter_events(snapshot):
+        if isinstance(rec, dict) and rec.get("paper_id"):
+            index[rec["paper_id"]] = rec
+    return index
+
+
+def _write_snapshot(snapshot: Path, records: list[dict]):
+    tmp = snapshot.with_name(snapshot.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, snapshot)
+
+
+# ── Writing ──────────────────────────────────────────────────────────────────
+
+class ManifestJournal:
+    """
+    In-memory manifest index backed by an append-only journal.
+
+    ``record`` may be called from any thread; compaction runs on its own
+    thread and never blocks it for longer than a file rename.
+    """
+
+    def __init__(
+        self,
+        snapshot: PathLike,
+        compact_every: int = COMPACT_EVERY,
+        fsync_every: int = FSYNC_EVERY,
+        fsync_interval: float = FSYNC_INTERVAL,
+    ):
+        self.snapshot = Path(snapshot)
+        self.journal = journal_path(self.snapshot)
+        self.compact_every = compact_every
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+
+        _trim_torn_tail(str(self.journal))
+        self.index = read_manifest(self.snapshot)
+        self._events = sum(1 for _ in _iter_jsonl(str(self.journal))) if self.journal.exists() else 0
+        self._f = open(self.journal, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._compactor: Optional[threading.Thread] = None
+        self.compactions = 0
+
+        # A crash mid-compaction left its events in .compacting: finish the job
+        if _compacting_path(self.snapshot).exists():
+            self._start_compaction(rotate=False)
+
+    # ── Index ────────────────────────────────────────────────────────────
+
+    def get(self, paper_id: str) -> Optional[dict]:
+        return self.index.get(paper_id)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def items(self) -> list[tuple[str, dict]]:
+        with self._lock:
+            return list(self.index.items())
+
+    # ── Recording ────────────────────────────────────────────────────────
+
+    def record(self, rec: dict):
+        """Set *rec* as its paper's current record and append it to the journal."""
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.index[rec["paper_id"]] = rec
+            self._f.write(line)
+            self._f.flush()
+            self._events += 1
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self._sync()
+            if self._events >= self.compact_every and self._compactor is None:
+                self._start_compaction()
+
+    def _sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    # ── Compaction ───────────────────────────────────────────────────────
+
+    def _start_compaction(self, rotate: bool = True):
+        """Freeze the current state and write it to the snapshot on a thread (caller holds the lock)."""
+        # (a failed compaction keeps its .compacting file; fold into the snapshot without rotating)
+        if rotate and not _compacting_path(self.snapshot).exists():
+            self._sync()
+            self._f.close()
+            os.replace(self.journal, _compacting_path(self.snapshot))
+            self._f = open(self.journal, "a", encoding="utf-8")
+            self._events = 0
+        records = list(self.index.values())
+        self._compactor = threading.Thread(target=self._compact, args=(records,), daemon=True)
+        self._compactor.start()
+
+    def _compact(self, records: list[dict]):
+        try:
+            _write_snapshot(self.snapshot, records)
+            # Only now are the .compacting events in the snapshot
+            _compacting_path(self.snapshot).unlink(missing_ok=True)
+            self.compactions += 1
+        finally:
+            with self._lock:
+                self._compactor = None
+
+    def wait(self):
+        """Block until a running background compaction has finished."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def compact(self):
+        """Fold the whole journal into the snapshot now (blocking)."""
+        while True:
+            self.wait()
+            with self._lock:
+                if self._compactor is None:
+                    self._start_compaction()
+                    break
+        self.wait()
+
+    def close(self, compact: bool = True):
+        """Close the journal, by default folding it into the snapshot first."""
+        if self._f.closed:
+            return
+        if compact:
+            self.compact()
+        else:
+            self.wait()
+        with self._lock:
+            self._sync()
+            self._f.close()
+            if self.journal.stat().st_size == 0:
+                self.journal.unlink()
+
+    def __enter__(self) -> "ManifestJournal":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
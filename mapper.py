@@ -1,17 +1,24 @@
 """
 Benchmark Mapper — two-stage classification pipeline.
 
-Stage 1: Heuristic scoring with word-boundary keyword matching
-Stage 2: LLM classification via Anthropic Claude (uses S2 TLDRs for context)
+Stage 1: Heuristic scoring with word-boundary keyword matching (one compiled pass per entry)
+Stage 2: LLM classification via Anthropic Claude (uses S2 TLDRs for context),
+         entries packed into prompts by estimated input/output tokens
 
 Falls back to heuristic-only if no ANTHROPIC_API_KEY is set or --no-llm is used.
+With --llm-mode batch, stage 2 goes through the Message Batches API (50%
+cheaper, no rate-limit contention); submitted batches are persisted and a
+restarted run resumes polling them instead of resubmitting.
 """
 
 import json
 import os
 import re
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
 
 from rich.console import Console
@@ -24,7 +31,14 @@ from rich.progress import (
     TimeRemainingColumn,
 )
 
+from anthropic_utils import (
+    ConcurrencyController, UsageTracker, cached_system, get_controller, is_overload,
+)
 from config import FRAMEWORK, TOOL_TYPES
+from details_store import DetailsStore
+from identity import find_s2_detail
+from keyword_matcher import KeywordMatcher
+from llm_cache import LLM_CACHE_DB, ClassificationCache, entry_key, fingerprint
 from scraper import BenchmarkEntry
 
 console = Console()
@@ -160,57 +174,64 @@ TOOL_KEYWORDS: dict[str, list[str]] = {
 
 # ── Stage 1: Heuristic scoring ──────────────────────────────────────────────
 
+# Threshold: require a multi-word phrase match (2.0) or 2+ single words
+MIN_SCORE = 2.0
+
 def _text_blob(entry: BenchmarkEntry) -> str:
     """Combine searchable text fields into one lowercase string."""
     parts = [entry.name, entry.description] + entry.tags
     return " ".join(parts).lower()
 
 
-def _score_keywords(blob: str, keywords: list[str]) -> float:
+def _keyword_rule(kw: str) -> tuple[bool, float]:
     """
-    Score keyword matches against a text blob.
+    Matching rule for a keyword: (word-bounded, weight).
 
     Multi-word phrases use substring matching (weight 2.0 — more specific).
-    Single words use word-boundary regex (weight 1.0 — avoids false positives).
+    Single words use word-boundary matching (weight 1.0 — avoids "math"
+    in "aftermath").
     """
-    score = 0.0
-    for kw in keywords:
-        kw_lower = kw.lower()
-        if " " in kw_lower:
-            # Multi-word phrase → substring match is sufficiently specific
-            if kw_lower in blob:
-                score += 2.0
-        else:
-            # Single word → word-boundary match to avoid "math" in "aftermath"
-            if re.search(r"\b" + re.escape(kw_lower) + r"\b", blob):
-                score += 1.0
-    return score
+    if " " in kw:
+        return False, 2.0
+    return True, 1.0
+
+
+@lru_cache(maxsize=1)
+def keyword_matcher() -> KeywordMatcher:
+    """All framework and tool keywords compiled into one single-pass matcher."""
+    m = KeywordMatcher()
+    m.add_group("framework", FRAMEWORK_KEYWORDS, _keyword_rule)
+    m.add_group("tool", TOOL_KEYWORDS, _keyword_rule)
+    return m
+
+
+def score_entry(entry: BenchmarkEntry) -> tuple[dict[str, float], dict[str, float]]:
+    """Return ({framework_id: score}, {tool_type: score}) from one scan of the entry."""
+    scores = keyword_matcher().scores(_text_blob(entry))
+    return scores.get("framework", {}), scores.get("tool", {})
 
 
 def score_framework(entry: BenchmarkEntry) -> dict[str, float]:
     """Return {framework_id: score} for all matching categories."""
-    blob = _text_blob(entry)
-    return {
-        fid: score
-        for fid, keywords in FRAMEWORK_KEYWORDS.items()
-        if (score := _score_keywords(blob, keywords)) > 0
-    }
+    return score_entry(entry)[0]
 
 
 def score_tools(entry: BenchmarkEntry) -> dict[str, float]:
     """Return {tool_type: score} for all matching tool types."""
-    blob = _text_blob(entry)
-    return {
-        tid: score
-        for tid, keywords in TOOL_KEYWORDS.items()
-        if (score := _score_keywords(blob, keywords)) > 0
-    }
+    return score_entry(entry)[1]
 
 
 # ── S2 paper details lookup ─────────────────────────────────────────────────
 
-def _build_s2_lookup(s2_details: list[dict]) -> dict[str, dict]:
-    """Build a lookup dict from S2 paper details, indexed by various IDs."""
+def _build_s2_lookup(s2_details: DetailsStore | list[dict]) -> DetailsStore | dict[str, dict]:
+    """
+    Build a lookup dict from S2 paper details, indexed by various IDs.
+
+    A ``DetailsStore`` already supports the same keys and is queried
+    directly instead of being loaded into memory.
+    """
+    if isinstance(s2_details, DetailsStore):
+        return s2_details
     lookup: dict[str, dict] = {}
     for paper in s2_details:
         if not paper:
@@ -223,27 +244,18 @@ def _build_s2_lookup(s2_details: list[dict]) -> dict[str, dict]:
         if arxiv_id:
             lookup[f"arxiv:{arxiv_id.lower()}"] = paper
             lookup[arxiv_id.lower()] = paper
+        doi = ext_ids.get("DOI", "")
+        if doi:
+            lookup[f"doi:{doi.lower()}"] = paper
     return lookup
 
 
-def _find_s2_detail(entry: BenchmarkEntry, s2_lookup: dict) -> Optional[dict]:
+def _find_s2_detail(entry: BenchmarkEntry, s2_lookup: DetailsStore | dict) -> Optional[dict]:
     """Try to find the S2 paper detail for a BenchmarkEntry."""
-    url = entry.source_url
-    if "semanticscholar.org/paper/" in url:
-        pid = url.split("/paper/")[-1].split("/")[0].split("?")[0]
-        if pid in s2_lookup:
-            return s2_lookup[pid]
-    if "arxiv.org/abs/" in url:
-        arxiv_id = url.split("/abs/")[-1].split("?")[0]
-        # Strip version suffix (e.g., v1, v2)
-        arxiv_id = re.sub(r"v\d+$", "", arxiv_id).lower()
-        for key in [arxiv_id, f"arxiv:{arxiv_id}"]:
-            if key in s2_lookup:
-                return s2_lookup[key]
-    return None
-
-
-def _get_entry_context(entry: BenchmarkEntry, s2_lookup: dict) -> str:
+    return find_s2_detail(entry.source_url, s2_lookup)
+
+
+def _get_entry_context(entry: BenchmarkEntry, s2_lookup: DetailsStore | dict) -> str:
     """Build rich context string for an entry (used by the LLM prompt)."""
     parts = [f"Name: {entry.name}", f"Type: {entry.source_type}"]
 
@@ -276,6 +288,10 @@ def _get_entry_context(entry: BenchmarkEntry, s2_lookup: dict) -> str:
 
 # ── Stage 2: LLM classification via Anthropic ───────────────────────────────
 
+# Bump when the prompt or response handling changes in a way the
+# fingerprint below cannot see (it already covers the prompt texts)
+PROMPT_VERSION = 2
+
 _SYSTEM_PROMPT = (
     "You are an expert in AI for K-12 education research, with deep knowledge of "
     "learning science, cognitive load theory, and the impact of AI on student learning.\n\n"
@@ -315,13 +331,10 @@ def _build_tool_desc() -> str:
     return "\n".join(lines)
 
 
-def _build_prompt(entries_with_context: list[tuple[int, str]]) -> str:
-    """Build the full user prompt for a batch of entries."""
+def _build_instructions() -> str:
+    """Static part of the classification prompt: taxonomy, rules and response format."""
     fw_desc = _build_framework_desc()
     tool_desc = _build_tool_desc()
-    entries_block = "\n\n".join(
-        f"Entry {idx}:\n  {ctx}" for idx, ctx in entries_with_context
-    )
     return (
         f"## Education Framework Categories\n{fw_desc}\n\n"
         f"## Education Tool Types\n{tool_desc}\n\n"
@@ -339,86 +352,629 @@ def _build_prompt(entries_with_context: list[tuple[int, str]]) -> str:
         "5. Prefer precision over recall — when unsure, leave a category out.\n"
         "6. Carefully read the AI Summary / Description to understand what "
         "the entry actually measures or evaluates.\n\n"
-        f"## Entries to Classify\n\n{entries_block}\n\n"
         "## Required Response Format\n"
-        "Return a JSON array. Each element:\n"
+        "Return a JSON array with one element per entry in the user message:\n"
         '{"index": <int>, "is_benchmark": <bool>, '
         '"framework_ids": [<str>, ...], "tool_types": [<str>, ...], '
         '"reasoning": "<one sentence>"}'
     )
 
 
+def _classification_system() -> list[dict]:
+    """System blocks (role + instructions), cached as one prefix shared by every request."""
+    return cached_system(_SYSTEM_PROMPT, _build_instructions())
+
+
+def _build_prompt(entries_with_context: list[tuple[int, str]]) -> str:
+    """Build the per-request user prompt: only the entries to classify."""
+    entries_block = "\n\n".join(
+        f"Entry {idx}:\n  {ctx}" for idx, ctx in entries_with_context
+    )
+    return f"## Entries to Classify\n\n{entries_block}"
+
+
+def classification_fingerprint() -> str:
+    """Hash of everything besides model and entry context an LLM answer depends on."""
+    return fingerprint(
+        PROMPT_VERSION, _SYSTEM_PROMPT, _build_instructions(), _build_prompt([]),
+        FRAMEWORK, TOOL_TYPES,
+    )
+
+
+def _salvage_json_array(text: str) -> tuple[list, bool]:
+    """
+    Parse a JSON array element by element; returns ``(elements, complete)``.
+
+    A response cut off by ``max_tokens`` (or broken half-way) still yields
+    every element before the damage. ``complete`` is True only when the
+    whole text was one well-formed array.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?\s*", "", text)
+        text = re.sub(r"\s*```$", "", text)
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, list):
+            return parsed, True
+    except json.JSONDecodeError:
+        pass
+    start = text.find("[")
+    if start < 0:
+        return [], False
+    decoder = json.JSONDecoder()
+    items: list = []
+    pos = start + 1
+    n = len(text)
+    while pos < n:
+        while pos < n and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= n or text[pos] == "]":
+            break
+        try:
+            item, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            break
+        items.append(item)
+    return items, False
+
+
+class RetryStats:
+    """Per-run counts of salvaged, re-queued and isolated classification entries (thread-safe)."""
+
+    def __init__(self):
+        self.salvaged = 0        # results kept from truncated / malformed responses
+        self.requeued = 0        # entries re-sent because their result was missing
+        self.bisections = 0      # failing prompts split in half
+        self.isolated: list[int] = []   # entries that failed alone (left to heuristics)
+        self._lock = threading.Lock()
+
+    def add(self, salvaged: int = 0, requeued: int = 0, bisections: int = 0, isolated=()):
+        with self._lock:
+            self.salvaged += salvaged
+            self.requeued += requeued
+            self.bisections += bisections
+            self.isolated.extend(isolated)
+
+    def __bool__(self) -> bool:
+        return bool(self.salvaged or self.requeued or self.bisections or self.isolated)
+
+    def summary(self) -> str:
+        return (
+            f"{self.salvaged} results salvaged from partial responses, "
+            f"{self.requeued} entries re-queued, {self.bisections} prompts bisected, "
+            f"{len(self.isolated)} entries isolated as unclassifiable"
+        )
+
+
 def _call_anthropic(
     prompt: str,
     client,
     model: str,
     max_retries: int = 3,
-) -> list[dict]:
-    """Call Anthropic API, parse JSON response, retry on failure."""
+    usage: Optional[UsageTracker] = None,
+    max_tokens: int = 4096,
+    stats: Optional[RetryStats] = None,
+    controller: Optional[ConcurrencyController] = None,
+) -> Optional[list[dict]]:
+    """
+    Call Anthropic API and parse the JSON array it returns.
+
+    API errors are retried with backoff (None once retries are exhausted);
+    with a *controller*, the call waits for a concurrency slot and 429 /
+    529 responses shrink the shared limit.
+    A malformed or truncated response is not retried: every complete
+    element is salvaged and returned, and the caller re-queues whatever is
+    missing.
+    """
     for attempt in range(max_retries):
+        params = dict(
+            model=model,
+            max_tokens=max_tokens,
+            system=_classification_system(),
+            messages=[{"role": "user", "content": prompt}],
+        )
         try:
-            resp = client.messages.create(
-                model=model,
-                max_tokens=4096,
-                system=_SYSTEM_PROMPT,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            text = resp.content[0].text.strip()
-
-            # Strip markdown fences if the model added them
-            if text.startswith("```"):
-                text = re.sub(r"^```(?:json)?\s*", "", text)
-                text = re.sub(r"\s*```$", "", text)
-
-            results = json.loads(text)
-            if isinstance(results, list):
-                return results
-            console.print("[yellow]    LLM returned non-list, retrying...[/yellow]")
-        except json.JSONDecodeError as exc:
-            console.print(
-                f"[yellow]    JSON parse error (attempt {attempt + 1}/{max_retries}): "
-                f"{exc}[/yellow]"
-            )
+            if controller is not None:
+                resp = controller.call(client.messages.create, **params)
+            else:
+                resp = client.messages.create(**params)
         except Exception as exc:
             console.print(
                 f"[red]    API error (attempt {attempt + 1}/{max_retries}): {exc}[/red]"
             )
-        if attempt < max_retries - 1:
-            time.sleep(2 ** attempt)
+            # An overload has already paused every thread via the controller
+            if attempt < max_retries - 1 and (controller is None or not is_overload(exc)):
+                time.sleep(2 ** attempt)
+            continue
+        if usage is not None:
+            usage.record(resp.usage)
+        results, complete = _salvage_json_array(resp.content[0].text)
+        results = [r for r in results if isinstance(r, dict)]
+        if not complete and stats is not None:
+            stats.add(salvaged=len(results))
+        return results
 
-    return []  # all retries exhausted
+    return None  # all retries exhausted
+
+
+def _split_missing(items: list[tuple], got: set, failures: int) -> tuple[list[tuple[list, int]], dict]:
+    """
+    Follow-up prompts for the *items* of a prompt whose results lack some indices.
+
+    Returns ``([(items, failures), ...], counts)``: a prompt that made
+    progress re-queues just its missing entries; one that returned nothing
+    is retried once as-is, then bisected; a single entry that keeps
+    failing is dropped and reported as isolated.
+    """
+    missing = [it for it in items if it[0] not in got]
+    if not missing:
+        return [], {}
+    if len(missing) < len(items):
+        return [(missing, 0)], {"requeued": len(missing)}
+    if failures + 1 < BISECT_AFTER_FAILURES:
+        return [(items, failures + 1)], {"requeued": len(items)}
+    if len(items) > 1:
+        mid = len(items) // 2
+        return [(items[:mid], 0), (items[mid:], 0)], {"requeued": len(items), "bisections": 1}
+    return [], {"isolated": [items[0][0]]}
 
 
 def _classify_batch(
     batch: list[tuple[int, BenchmarkEntry, str]],
     client,
     model: str,
+    usage: Optional[UsageTracker] = None,
+    max_tokens: int = 4096,
+    stats: Optional[RetryStats] = None,
+    controller: Optional[ConcurrencyController] = None,
 ) -> list[dict]:
-    """Classify one batch of entries via Anthropic Claude."""
-    entries_with_context = [(idx, ctx) for idx, _entry, ctx in batch]
-    prompt = _build_prompt(entries_with_context)
-    return _call_anthropic(prompt, client, model)
+    """
+    Classify one batch of entries via Anthropic Claude.
+
+    Entries missing from the answer are re-sent on their own and failing
+    prompts are bisected (``_split_missing``) until every entry has a
+    result or is isolated.
+    """
+    results: list[dict] = []
+    queue: list[tuple[list, int]] = [(batch, 0)]
+    while queue:
+        items, failures = queue.pop()
+        wanted = {idx for idx, _entry, _ctx in items}
+        prompt = _build_prompt([(idx, ctx) for idx, _entry, ctx in items])
+        answer = _call_anthropic(
+            prompt, client, model, usage=usage, stats=stats, controller=controller,
+            max_tokens=min(max_tokens, output_token_budget(len(items))),
+        )
+        if answer is None:
+            continue   # API unavailable: splitting the prompt would not help
+        got: set = set()
+        for r in answer:
+            idx = r.get("index")
+            if idx in wanted and idx not in got:
+                got.add(idx)
+                results.append(r)
+        follow_up, counts = _split_missing(items, got, failures)
+        queue.extend(follow_up)
+        if counts and stats is not None:
+            stats.add(**counts)
+    return results
+
+
+# ── Stage 2: token-budget batch packing ─────────────────────────────────────
+
+CHARS_PER_TOKEN = 4               # Rough estimate for English prose
+INPUT_TOKEN_BUDGET = 6_000        # Entry payload per prompt (the cached prefix is extra)
+OUTPUT_TOKEN_BUDGET = 4_096       # Ceiling on max_tokens per prompt
+OUTPUT_TOKENS_PER_ENTRY = 90      # One JSON element with a one-sentence reasoning
+OUTPUT_TOKENS_OVERHEAD = 32       # Array brackets, stray whitespace
+BISECT_AFTER_FAILURES = 2         # Empty answers for the same prompt before it is split
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap input-token estimate of *text* (no tokenizer round-trip)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def output_token_budget(n_entries: int, ceiling: int = OUTPUT_TOKEN_BUDGET) -> int:
+    """``max_tokens`` for a prompt of *n_entries* -- enough for every element, capped at *ceiling*."""
+    return min(ceiling, OUTPUT_TOKENS_OVERHEAD + OUTPUT_TOKENS_PER_ENTRY * n_entries)
+
+
+@dataclass
+class PackedBatch:
+    """Entries of one prompt, with its estimated input tokens and ``max_tokens``."""
+    items: list[tuple] = field(default_factory=list)
+    input_tokens: int = 0
+    max_tokens: int = 0
+
+
+def pack_batches(
+    items: list[tuple],
+    max_entries: int,
+    input_budget: int = INPUT_TOKEN_BUDGET,
+    output_budget: int = OUTPUT_TOKEN_BUDGET,
+) -> list[PackedBatch]:
+    """
+    Pack ``(index, ..., context)`` tuples into prompts, in order.
+
+    A prompt is closed when the next entry would push its estimated input
+    over *input_budget*, its expected output over *output_budget*, or its
+    size past *max_entries*. An entry larger than the whole input budget
+    gets a prompt of its own rather than being dropped.
+    """
+    per_output = max(1, (output_budget - OUTPUT_TOKENS_OVERHEAD) // OUTPUT_TOKENS_PER_ENTRY)
+    limit = max(1, min(max_entries, per_output))
+    batches: list[PackedBatch] = []
+    current = PackedBatch()
+    for item in items:
+        cost = estimate_tokens(f"Entry {item[0]}:\n  {item[-1]}\n\n")
+        if current.items and (
+            current.input_tokens + cost > input_budget or len(current.items) >= limit
+        ):
+            batches.append(current)
+            current = PackedBatch()
+        current.items.append(item)
+        current.input_tokens += cost
+    if current.items:
+        batches.append(current)
+    for b in batches:
+        b.max_tokens = output_token_budget(len(b.items), output_budget)
+    return batches
+
+
+def packing_summary(batches: list[PackedBatch], input_budget: int = INPUT_TOKEN_BUDGET) -> str:
+    """One-line packing efficiency report: prompt count, entries per prompt, budget fill."""
+    if not batches:
+        return "no prompts"
+    n = sum(len(b.items) for b in batches)
+    total_in = sum(b.input_tokens for b in batches)
+    oversized = sum(1 for b in batches if b.input_tokens > input_budget)
+    return (
+        f"{n} entries -> {len(batches)} prompts "
+        f"(avg {n / len(batches):.1f} entries, ~{total_in // len(batches):,} input tokens = "
+        f"{total_in / (len(batches) * input_budget):.0%} of the {input_budget:,}-token budget, "
+        f"largest ~{max(b.input_tokens for b in batches):,}"
+        + (f", {oversized} oversized entries sent alone" if oversized else "")
+        + f"; {sum(b.max_tokens for b in batches):,} output tokens reserved)"
+    )
+
+
+# ── Stage 2 (batch mode): Anthropic Message Batches ─────────────────────────
+
+LLM_BATCH_STATE = "output/llm_classification_batches.json"
+MAX_REQUESTS_PER_BATCH = 10_000   # Well under the API's 100k / 256 MB limits
+BATCH_POLL_SECONDS = 60
+
+
+@dataclass
+class ClassificationBatch:
+    """One submitted Message Batch of classification prompts."""
+    batch_id: str = ""
+    status: str = "submitted"     # submitted | collected | stale
+    model: str = ""
+    fingerprint: str = ""         # classification_fingerprint() at submission
+    created_at: str = ""
+    # custom_id -> [[prompt entry index, cache key], ...]
+    requests: dict[str, list[list]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "model": self.model,
+            "fingerprint": self.fingerprint,
+            "created_at": self.created_at,
+            "requests": self.requests,
+        }
+
+    @staticmethod
+    def from_dict(d: dict) -> "ClassificationBatch":
+        return ClassificationBatch(**d)
+
+    def keys(self) -> set[str]:
+        return {key for pairs in self.requests.values() for _idx, key in pairs}
+
+
+def load_classification_batches(path: str = LLM_BATCH_STATE) -> list[ClassificationBatch]:
+    """Load saved batch states."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [ClassificationBatch.from_dict(d) for d in json.load(f)]
+
+
+def save_classification_batches(states: list[ClassificationBatch], path: str = LLM_BATCH_STATE):
+    """Save batch states to disk (atomically -- they are the only handle on submitted work)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump([s.to_dict() for s in states], f, indent=2)
+    os.replace(tmp, path)
+
+
+def _submit_classification_batches(
+    client,
+    prompts: list[PackedBatch],
+    model: str,
+    prompt_fingerprint: str,
+    states: list[ClassificationBatch],
+    state_path: str,
+) -> list[ClassificationBatch]:
+    """Submit packed prompts of (index, key, context) triples as Message Batches."""
+    system = _classification_system()
+    submitted: list[ClassificationBatch] = []
+    for start in range(0, len(prompts), MAX_REQUESTS_PER_BATCH):
+        chunk = prompts[start : start + MAX_REQUESTS_PER_BATCH]
+        api_requests = []
+        mapping: dict[str, list[list]] = {}
+        for n, packed in enumerate(chunk):
+            prompt_entries = packed.items
+            custom_id = f"cls_{start + n:06d}"
+            mapping[custom_id] = [[idx, key] for idx, key, _ctx in prompt_entries]
+            api_requests.append({
+                "custom_id": custom_id,
+                "params": {
+                    "model": model,
+                    "max_tokens": packed.max_tokens,
+                    "system": system,
+                    "messages": [{
+                        "role": "user",
+                        "content": _build_prompt([(idx, ctx) for idx, _key, ctx in prompt_entries]),
+                    }],
+                },
+            })
+        try:
+            batch = client.messages.batches.create(requests=api_requests)
+        except Exception as exc:
+            console.print(f"[red]  Batch submission failed: {exc}[/red]")
+            break
+        state = ClassificationBatch(
+            batch_id=batch.id,
+            model=model,
+            fingerprint=prompt_fingerprint,
+            created_at=str(getattr(batch, "created_at", "") or ""),
+            requests=mapping,
+        )
+        states.append(state)
+        save_classification_batches(states, state_path)
+        submitted.append(state)
+        console.print(
+            f"  Submitted batch [cyan]{batch.id}[/cyan]: {len(api_requests)} requests "
+            f"({sum(len(v) for v in mapping.values())} entries)"
+        )
+    return submitted
+
+
+def _collect_classification_batch(
+    client,
+    state: ClassificationBatch,
+    usage: Optional[UsageTracker] = None,
+    stats: Optional[RetryStats] = None,
+) -> tuple[dict[str, dict], int]:
+    """
+    Results of an ended batch as ``{cache key: result}``, plus the number of
+    failed requests. Complete elements of truncated or malformed answers
+    are kept.
+    """
+    by_key: dict[str, dict] = {}
+    failed = 0
+    for result in client.messages.batches.results(state.batch_id):
+        pairs = state.requests.get(result.custom_id, [])
+        if result.result.type != "succeeded":
+            failed += 1
+            continue
+        if usage is not None:
+            usage.record(getattr(result.result.message, "usage", None))
+        text = "".join(getattr(b, "text", "") for b in result.result.message.content)
+        parsed, complete = _salvage_json_array(text)
+        if not parsed:
+            failed += 1
+            continue
+        if not complete and stats is not None:
+            stats.add(salvaged=sum(1 for r in parsed if isinstance(r, dict)))
+        key_of = {idx: key for idx, key in pairs}
+        for r in parsed:
+            key = key_of.get(r.get("index")) if isinstance(r, dict) else None
+            if key:
+                by_key[key] = r
+    return by_key, failed
+
+
+def _classify_via_message_batches(
+    client,
+    indexed: list[tuple[int, BenchmarkEntry, str]],
+    keys: dict[int, str],
+    model: str,
+    prompt_fingerprint: str,
+    batch_size: int,
+    cache: Optional[ClassificationCache],
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    state_path: str = LLM_BATCH_STATE,
+    usage: Optional[UsageTracker] = None,
+    max_input_tokens: int = INPUT_TOKEN_BUDGET,
+    max_output_tokens: int = OUTPUT_TOKEN_BUDGET,
+    stats: Optional[RetryStats] = None,
+) -> dict[str, dict]:
+    """
+    Classify *indexed* entries through Message Batches; returns ``{cache key: result}``.
+
+    Entries already in a submitted, uncollected batch (same model and
+    prompt fingerprint) are not resubmitted -- a restarted run just resumes
+    polling. Results are written to *cache* as each batch is collected.
+    Entries missing from a collected batch go into a follow-up batch
+    (re-queued or bisected as in real-time mode, ``_split_missing``).
+    """
+    states = load_classification_batches(state_path)
+    for s in states:
+        if s.status == "submitted" and (s.model != model or s.fingerprint != prompt_fingerprint):
+            s.status = "stale"   # prompt or definitions changed since submission
+    open_batches = [s for s in states if s.status == "submitted"]
+    in_flight = set().union(*(s.keys() for s in open_batches)) if open_batches else set()
+
+    pending: list[tuple[int, str, str]] = []
+    queued: set[str] = set()
+    context_of = {keys[idx]: (idx, ctx) for idx, _entry, ctx in indexed}
+    for idx, _entry, ctx in indexed:
+        key = keys[idx]
+        if key not in in_flight and key not in queued:
+            queued.add(key)
+            pending.append((idx, key, ctx))
+    if open_batches:
+        console.print(
+            f"  Resuming {len(open_batches)} submitted batches "
+            f"({len(in_flight)} entries in flight)"
+        )
+    save_classification_batches(states, state_path)
+    if pending:
+        prompts = pack_batches(pending, batch_size, max_input_tokens, max_output_tokens)
+        console.print(f"  Packing: {packing_summary(prompts, max_input_tokens)}")
+        open_batches += _submit_classification_batches(
+            client, prompts, model, prompt_fingerprint, states, state_path,
+        )
+
+    results: dict[str, dict] = {}
+    errors: dict[str, int] = {}
+    failures: dict[frozenset, int] = {}
+    while open_batches:
+        still_open: list[ClassificationBatch] = []
+        for state in open_batches:
+            try:
+                batch = client.messages.batches.retrieve(state.batch_id)
+                if batch.processing_status != "ended":
+                    counts = batch.request_counts
+                    console.print(
+                        f"  [dim]{state.batch_id}: {batch.processing_status} "
+                        f"({counts.succeeded} done, {counts.processing} processing)[/dim]"
+                    )
+                    still_open.append(state)
+                    continue
+                collected, failed = _collect_classification_batch(client, state, usage, stats)
+            except Exception as exc:
+                errors[state.batch_id] = errors.get(state.batch_id, 0) + 1
+                console.print(f"[red]  Batch {state.batch_id} error: {exc}[/red]")
+                if errors[state.batch_id] < 3:
+                    still_open.append(state)
+                else:
+                    state.status = "stale"   # its entries are resubmitted next run
+                    save_classification_batches(states, state_path)
+                continue
+            if cache is not None:
+                cache.put_many(model, collected.items())
+            results.update(collected)
+            state.status = "collected"
+            save_classification_batches(states, state_path)
+            console.print(
+                f"  Collected batch [cyan]{state.batch_id}[/cyan]: {len(collected)} results"
+                + (f" ([red]{failed} failed requests[/red])" if failed else "")
+            )
+
+            # Missing entries of this run go into a follow-up batch
+            follow_up: list[PackedBatch] = []
+            for pairs in state.requests.values():
+                items = [
+                    (context_of[key][0], key, context_of[key][1])
+                    for _idx, key in pairs if key in context_of
+                ]
+                got = {idx for idx, key, _ctx in items if key in collected}
+                prompt_keys = frozenset(key for _idx, key, _ctx in items)
+                retry, counts = _split_missing(items, got, failures.get(prompt_keys, 0))
+                for retry_items, n_failed in retry:
+                    failures[frozenset(key for _idx, key, _ctx in retry_items)] = n_failed
+                    follow_up += pack_batches(
+                        retry_items, len(retry_items), max_input_tokens, max_output_tokens,
+                    )
+                if counts and stats is not None:
+                    stats.add(**counts)
+            if follow_up:
+                still_open += _submit_classification_batches(
+                    client, follow_up, model, prompt_fingerprint, states, state_path,
+                )
+        open_batches = still_open
+        if open_batches:
+            time.sleep(poll_seconds)
+    return results
 
 
 def _run_llm_classification(
     entries: list[BenchmarkEntry],
-    s2_details: list[dict] | None,
+    s2_details: DetailsStore | list[dict] | None,
     model: str,
     batch_size: int,
     max_workers: int,
+    cache: Optional[ClassificationCache] = None,
+    use_cached: bool = True,
+    mode: str = "realtime",
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    max_input_tokens: int = INPUT_TOKEN_BUDGET,
+    max_output_tokens: int = OUTPUT_TOKEN_BUDGET,
+    only: Optional[set[int]] = None,
 ) -> dict[int, dict]:
     """
     Run LLM classification in parallel batches with progress tracking.
 
+    Entries are packed into prompts of at most *batch_size* entries,
+    ~*max_input_tokens* of context and an expected answer within
+    *max_output_tokens* (``pack_batches``).
+
+    With a *cache*, entries whose (model, prompt, context) was classified
+    before are answered from it and only the rest are sent to the LLM.
+    *mode* is ``"realtime"`` (parallel ``messages.create`` calls, at most
+    *max_workers* in flight under the shared AIMD controller) or
+    ``"batch"`` (Message Batches, polled every *poll_seconds*). With
+    *only*, just those entry indices are classified.
     Returns {entry_index: classification_result_dict}.
     """
+    # ── Build S2 lookup ───────────────────────────────────────────────────
+    s2_lookup = _build_s2_lookup(s2_details) if s2_details is not None else {}
+    s2_hits = 0
+
+    # Build context for every entry
+    indexed: list[tuple[int, BenchmarkEntry, str]] = []
+    for i, entry in enumerate(entries):
+        if only is not None and i not in only:
+            continue
+        ctx = _get_entry_context(entry, s2_lookup)
+        if _find_s2_detail(entry, s2_lookup):
+            s2_hits += 1
+        indexed.append((i, entry, ctx))
+
+    if s2_lookup:
+        console.print(
+            f"  S2 enrichment: {s2_hits}/{len(indexed)} entries have TLDR/metadata "
+            f"(from {len(s2_details) if s2_details is not None else 0} paper details)"
+        )
+
+    # ── Cached results ────────────────────────────────────────────────────
+    all_results: dict[int, dict] = {}
+    prompt_fingerprint = cache.fingerprint if cache is not None else classification_fingerprint()
+    keys = {i: entry_key(model, prompt_fingerprint, ctx) for i, _entry, ctx in indexed}
+    if cache is not None:
+        if cache.invalidated:
+            console.print(
+                f"  [yellow]LLM cache: {cache.invalidated} results invalidated "
+                f"(prompt or framework/tool definitions changed)[/yellow]"
+            )
+        if use_cached:
+            all_results.update(cache.get_many(keys))
+            for i in all_results:
+                all_results[i]["index"] = i
+        indexed = [item for item in indexed if item[0] not in all_results]
+        console.print(
+            f"  LLM cache: {len(all_results)}/{len(keys)} entries cached"
+            + (f" ({len(all_results) / len(keys):.0%})" if keys else "")
+            + f", {len(indexed)} to classify"
+        )
+    if not indexed:
+        return all_results
+
     try:
         import anthropic  # noqa: F811
     except ImportError:
         console.print(
             "[red]  'anthropic' package not installed. Run: uv add anthropic[/red]"
         )
-        return {}
+        return all_results
 
     api_key = os.environ.get("ANTHROPIC_API_KEY", "")
     if not api_key:
@@ -428,42 +984,51 @@ def _run_llm_classification(
         console.print(
             "[dim]  Add ANTHROPIC_API_KEY to your .env for AI-powered classification.[/dim]"
         )
-        return {}
+        return all_results
 
     client = anthropic.Anthropic(api_key=api_key)
+    usage = UsageTracker(f"mapper:{mode}", model)
+    stats = RetryStats()
 
-    # ── Build S2 lookup ───────────────────────────────────────────────────
-    s2_lookup = _build_s2_lookup(s2_details) if s2_details else {}
-    s2_hits = 0
-
-    # Build context for every entry
-    indexed: list[tuple[int, BenchmarkEntry, str]] = []
-    for i, entry in enumerate(entries):
-        ctx = _get_entry_context(entry, s2_lookup)
-        if _find_s2_detail(entry, s2_lookup):
-            s2_hits += 1
-        indexed.append((i, entry, ctx))
-
-    if s2_lookup:
+    if mode == "batch":
         console.print(
-            f"  S2 enrichment: {s2_hits}/{len(entries)} entries have TLDR/metadata "
-            f"(from {len(s2_details or [])} paper details)"
+            f"  {len(indexed)} entries -> Message Batches "
+            f"(<= {batch_size} entries / {max_input_tokens:,} input tokens per prompt, model={model})"
         )
-
-    # ── Chunk into batches ────────────────────────────────────────────────
-    batches = [
-        indexed[i : i + batch_size]
-        for i in range(0, len(indexed), batch_size)
-    ]
+        by_key = _classify_via_message_batches(
+            client, indexed, keys, model, prompt_fingerprint, batch_size, cache, poll_seconds,
+            usage=usage, max_input_tokens=max_input_tokens, max_output_tokens=max_output_tokens,
+            stats=stats,
+        )
+        for i, _entry, _ctx in indexed:
+            r = by_key.get(keys[i])
+            if r is not None:
+                all_results[i] = {**r, "index": i}
+        console.print(f"  LLM classified {len(all_results)}/{len(keys)} entries")
+        if cache is not None:
+            console.print(f"  LLM cache: {cache.summary()}")
+        if stats:
+            console.print(f"  LLM retries: {stats.summary()}")
+        if usage.requests:
+            console.print(f"  LLM usage: {usage.summary()}")
+        usage.save()
+        return all_results
+
+    # ── Pack into batches by token budget ─────────────────────────────────
+    batches = pack_batches(indexed, batch_size, max_input_tokens, max_output_tokens)
     n_batches = len(batches)
 
+    # 429 / 529 must reach the controller rather than the SDK's own retries
+    client = client.with_options(max_retries=0)
+    controller = get_controller("anthropic", maximum=max_workers)
     console.print(
-        f"  {len(entries)} entries -> {n_batches} batches "
-        f"(size={batch_size}, workers={max_workers}, model={model})"
+        f"  {len(indexed)} entries -> {n_batches} batches "
+        f"(<= {batch_size} entries / {max_input_tokens:,} input tokens, "
+        f"adaptive concurrency {int(controller.limit)}..{max_workers}, model={model})"
     )
+    console.print(f"  Packing: {packing_summary(batches, max_input_tokens)}")
 
     # ── Parallel classification with progress bar ─────────────────────────
-    all_results: dict[int, dict] = {}
     failed = 0
 
     with Progress(
@@ -479,7 +1044,10 @@ def _run_llm_classification(
 
         with ThreadPoolExecutor(max_workers=max_workers) as pool:
             futures = {
-                pool.submit(_classify_batch, batch, client, model): bi
+                pool.submit(
+                    _classify_batch, batch.items, client, model, usage, batch.max_tokens, stats,
+                    controller,
+                ): bi
                 for bi, batch in enumerate(batches)
             }
 
@@ -487,10 +1055,15 @@ def _run_llm_classification(
                 bi = futures[future]
                 try:
                     batch_results = future.result()
+                    new: list[tuple[str, dict]] = []
                     for r in batch_results:
                         idx = r.get("index")
                         if idx is not None:
                             all_results[idx] = r
+                            if idx in keys:
+                                new.append((keys[idx], r))
+                    if cache is not None:
+                        cache.put_many(model, new)
                 except Exception as exc:
                     console.print(f"[red]  Batch {bi} failed: {exc}[/red]")
                     failed += 1
@@ -498,22 +1071,147 @@ def _run_llm_classification(
                 progress.advance(task_id)
 
     console.print(
-        f"  LLM classified {len(all_results)}/{len(entries)} entries"
+        f"  LLM classified {len(all_results)}/{len(keys)} entries"
         + (f" ([red]{failed} batch failures[/red])" if failed else "")
     )
+    if cache is not None:
+        console.print(f"  LLM cache: {cache.summary()}")
+    if stats:
+        console.print(f"  LLM retries: {stats.summary()}")
+    console.print(f"  LLM concurrency: {controller.summary()}")
+    console.print(f"  LLM usage: {usage.summary()}")
+    reserved = sum(b.max_tokens for b in batches)
+    if usage.requests and reserved:
+        console.print(
+            f"  Output budget: {usage.tokens['output_tokens']:,} of {reserved:,} "
+            f"reserved tokens used ({usage.tokens['output_tokens'] / reserved:.0%})"
+        )
+    usage.save()
 
     return all_results
 
 
+# ── Cascade ─────────────────────────────────────────────────────────────────
+
+def _cascade_decisions(
+    entries: list[BenchmarkEntry],
+    heuristic,
+    s2_details: DetailsStore | list[dict] | None,
+    hand_curated: set[int],
+    gates_path: Optional[str],
+) -> dict[int, str]:
+    """``{entry_index: skip decision}`` for entries the cascade gates keep away from the LLM."""
+    if not gates_path:
+        return {}
+    from cascade import CascadeGates, entry_strata
+
+    gates = CascadeGates.load(gates_path)
+    if gates is None:
+        console.print(
+            f"  [yellow]Cascade: no gates at {gates_path} -- run 'uv run cascade.py' "
+            f"after a full LLM run. Classifying every entry.[/yellow]"
+        )
+        return {}
+    s2_lookup = _build_s2_lookup(s2_details) if s2_details is not None else None
+    strata = entry_strata(entries, heuristic, s2_lookup)
+    skipped = {
+        i: d for i, d in ((i, gates.decision(s)) for i, s in enumerate(strata))
+        if d != "llm" and i not in hand_curated
+    }
+    negatives = sum(1 for d in skipped.values() if d == "skip-negative")
+    console.print(
+        f"  Cascade: {len(skipped)}/{len(entries)} entries decided by stage 1, skipping the LLM "
+        f"({negatives} not-a-benchmark, {len(skipped) - negatives} heuristic mapping kept; "
+        f"gates from {gates.labelled_entries} labelled entries, target {gates.target:.0%})"
+    )
+    return skipped
+
+
+def _prefilter_decisions(
+    entries: list[BenchmarkEntry],
+    exclude: set[int],
+    model_path: Optional[str],
+) -> dict[int, str]:
+    """``{entry_index: "skip-negative"}`` for entries the pre-classifier calls clearly not a benchmark."""
+    if not model_path:
+        return {}
+    from preclassifier import BENCHMARK_HEAD, Preclassifier, entry_text, prefilter_threshold
+
+    model = Preclassifier.load(model_path)
+    if model is None:
+        console.print(
+            f"  [yellow]Pre-filter: no model at {model_path} -- run 'uv run preclassifier.py' "
+            f"after a full LLM run.[/yellow]"
+        )
+        return {}
+    threshold = prefilter_threshold(model)
+    if threshold <= 0:
+        console.print(
+            "  [yellow]Pre-filter: off -- the model's holdout did not show a safe "
+            "P(benchmark) threshold (see 'uv run preclassifier.py').[/yellow]"
+        )
+        return {}
+    candidates = [i for i in range(len(entries)) if i not in exclude]
+    t0 = time.perf_counter()
+    prob = model.predict(entry_text(entries[i]) for i in candidates)[:, model.column(BENCHMARK_HEAD)]
+    elapsed = time.perf_counter() - t0
+    skipped = {i: "skip-negative" for i, p in zip(candidates, prob) if p < threshold}
+    console.print(
+        f"  Pre-filter: {len(skipped)}/{len(candidates)} entries below P(benchmark) "
+        f"{threshold:g}, skipping the LLM "
+        f"({elapsed / max(len(candidates), 1) * 1e6:.0f} µs/entry)"
+    )
+    return skipped
+
+
+def _report_skip_agreement(
+    label: str,
+    entries: list[BenchmarkEntry],
+    skipped: dict[int, str],
+    heuristic_fw: list[list[str]],
+    s2_details: DetailsStore | list[dict] | None,
+    model: str,
+    cache: ClassificationCache,
+):
+    """Compare entries *label* kept from the LLM with any cached full-LLM answers for them."""
+    from cascade import Label, agrees
+
+    s2_lookup = _build_s2_lookup(s2_details) if s2_details is not None else {}
+    keys = {i: cache.key(model, _get_entry_context(entries[i], s2_lookup)) for i in skipped}
+    cached = cache.get_many(keys, count=False)
+    if not cached:
+        return
+    agree = sum(
+        agrees(
+            skipped[i],
+            Label(r.get("is_benchmark", True), [f for f in (r.get("framework_ids") or []) if f in FRAMEWORK]),
+            heuristic_fw[i],
+        )
+        for i, r in cached.items()
+    )
+    console.print(
+        f"  {label} agreement with cached LLM answers: {agree}/{len(cached)} "
+        f"skipped entries ({agree / len(cached):.1%})"
+    )
+
+
 # ── Main pipeline ────────────────────────────────────────────────────────────
 
 def map_all(
     entries: list[BenchmarkEntry],
-    s2_details: list[dict] | None = None,
+    s2_details: DetailsStore | list[dict] | None = None,
     use_llm: bool = True,
     model: str = "claude-haiku-4-5-20251001",
-    batch_size: int = 20,
-    max_workers: int = 5,
+    batch_size: int = 40,
+    max_workers: int = 16,
+    max_input_tokens: int = INPUT_TOKEN_BUDGET,
+    max_output_tokens: int = OUTPUT_TOKEN_BUDGET,
+    heuristic_scores_path: Optional[str] = "output/heuristic_scores.npz",
+    llm_cache_path: Optional[str] = LLM_CACHE_DB,
+    refresh_llm_cache: bool = False,
+    llm_mode: str = "realtime",
+    cascade_gates_path: Optional[str] = None,
+    preclassifier_path: Optional[str] = None,
 ) -> list[BenchmarkEntry]:
     """
     Full two-stage mapping pipeline.
@@ -526,7 +1224,28 @@ def map_all(
 
     Hand-curated entries (those with pre-set framework_ids/tool_types from
     known_benchmarks.py) are preserved — both stages only augment them.
+
+    Stage-1 scores for the whole corpus are kept as a matrix
+    (heuristic_scores.py) and saved to *heuristic_scores_path* (None to
+    skip) for threshold sweeps and precision checks.
+
+    LLM results are cached in *llm_cache_path* (llm_cache.py; None to
+    disable), so only new or changed entries are sent to the LLM. With
+    *refresh_llm_cache*, every entry is re-classified and the cache
+    rewritten. *llm_mode* ``"batch"`` classifies through the Message
+    Batches API instead of parallel real-time calls. Prompts hold up to
+    *batch_size* entries within *max_input_tokens* of context and
+    *max_output_tokens* of expected answer.
+
+    With *cascade_gates_path* (cascade.py), entries in strata the gates
+    decide with confidence keep their stage-1 mapping, are tagged
+    ``cascade:<decision>`` and skip the LLM; only the rest are classified.
+    With *preclassifier_path* (preclassifier.py), entries the learned
+    model calls clearly not a benchmark are skipped the same way
+    (``preclassifier:skip-negative``).
     """
+    from heuristic_scores import HeuristicScores
+
     # Track which entries were hand-curated before we touch anything
     hand_curated: set[int] = {
         i for i, e in enumerate(entries) if e.framework_ids or e.tool_types
@@ -539,16 +1258,16 @@ def map_all(
     # ── Stage 1: Heuristic scoring ───────────────────────────────────────
     console.print("\n[bold]Stage 1:[/bold] Heuristic keyword scoring ...")
 
-    # Threshold: require a multi-word phrase match (2.0) or 2+ single words
-    MIN_SCORE = 2.0
     heuristic_mapped = 0
 
-    for i, entry in enumerate(entries):
-        fw_scores = score_framework(entry)
-        tool_scores = score_tools(entry)
+    # One scan per entry, then vectorised scoring of every category
+    heuristic = HeuristicScores.build(entries)
+    mapped_fw = heuristic.mapped("framework", MIN_SCORE)
+    mapped_tools = heuristic.mapped("tool", MIN_SCORE)
 
-        new_fw = [fid for fid, s in fw_scores.items() if s >= MIN_SCORE]
-        new_tools = [tid for tid, s in tool_scores.items() if s >= MIN_SCORE]
+    for i, entry in enumerate(entries):
+        new_fw = mapped_fw[i]
+        new_tools = mapped_tools[i]
 
         if i in hand_curated:
             # Augment hand-curated entries — never remove their mappings
@@ -566,14 +1285,46 @@ def map_all(
     console.print(
         f"  Heuristic: {heuristic_mapped}/{len(entries)} entries -> >=1 category"
     )
+    if heuristic_scores_path:
+        heuristic.save(heuristic_scores_path)
+        console.print(f"  Score matrix saved to [dim]{heuristic_scores_path}[/dim]")
 
     # ── Stage 2: LLM classification ──────────────────────────────────────
     if use_llm:
         console.print("\n[bold]Stage 2:[/bold] LLM classification (Anthropic Claude) ...")
 
-        llm_results = _run_llm_classification(
-            entries, s2_details, model, batch_size, max_workers,
+        skipped = _cascade_decisions(entries, heuristic, s2_details, hand_curated, cascade_gates_path)
+        prefiltered = _prefilter_decisions(entries, hand_curated | set(skipped), preclassifier_path)
+        kept_from_llm = {**skipped, **prefiltered}
+        cache = (
+            ClassificationCache(classification_fingerprint(), llm_cache_path)
+            if llm_cache_path else None
         )
+        try:
+            llm_results = _run_llm_classification(
+                entries, s2_details, model, batch_size, max_workers,
+                cache=cache, use_cached=not refresh_llm_cache, mode=llm_mode,
+                max_input_tokens=max_input_tokens, max_output_tokens=max_output_tokens,
+                only=(
+                    {i for i in range(len(entries)) if i not in kept_from_llm}
+                    if kept_from_llm else None
+                ),
+            )
+            if cache is not None:
+                for label, decisions in (("Cascade", skipped), ("Pre-filter", prefiltered)):
+                    if decisions:
+                        _report_skip_agreement(label, entries, decisions, mapped_fw, s2_details, model, cache)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        for prefix, decisions in (("cascade", skipped), ("preclassifier", prefiltered)):
+            for i, decision in decisions.items():
+                tag = f"{prefix}:{decision}"
+                if tag not in entries[i].tags:
+                    entries[i].tags.append(tag)
+                if decision == "skip-negative" and "not-a-benchmark" not in entries[i].tags:
+                    entries[i].tags.append("not-a-benchmark")
 
         benchmarks_found = 0
         for i, entry in enumerate(entries):
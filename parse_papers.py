@@ -11,6 +11,8 @@ Features:
   - Progress bar with ETA (rich)
   - Resume support: skips already-parsed files
   - Incremental JSONL writing (append mode)
+  - Reads the download manifest as snapshot + journal (manifest_journal.py),
+    so papers downloaded by a still-running or crashed download are included
 
 Usage:
     uv run parse_papers.py                   # Parse all (default 8 workers)
@@ -41,6 +43,8 @@ from rich.progress import (
     SpinnerColumn,
 )
 
+from manifest_journal import read_manifest
+
 # ── Config ────────────────────────────────────────────────────────────────────
 
 PAPERS_DIR = Path("output/papers")
@@ -134,15 +138,12 @@ def parse_single_pdf(pdf_path: str) -> dict:
 # ── Manifest helpers ──────────────────────────────────────────────────────────
 
 def load_manifest() -> dict[str, dict]:
-    """Load the download manifest to get paper metadata."""
-    if MANIFEST_PATH.exists():
-        try:
-            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return {item["filename"]: item for item in data if item.get("status") == "downloaded"}
-        except (json.JSONDecodeError, KeyError, OSError):
-            pass
-    return {}
+    """Downloaded papers from the manifest (snapshot + journal), keyed by filename."""
+    return {
+        item["filename"]: item
+        for item in read_manifest(MANIFEST_PATH).values()
+        if item.get("status") == "downloaded" and item.get("filename")
+    }
 
 
 # ── Output writers ────────────────────────────────────────────────────────────
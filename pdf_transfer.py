@@ -0,0 +1,328 @@
+"""
+What the two PDF download engines share: the thread engine in
+``download_papers`` and the asyncio engine in ``async_download``.
+
+Everything here is engine-agnostic -- no HTTP client, no event loop:
+
+  - ``PaperDownload``: one paper's download state (also the manifest record)
+  - ``.part`` files and their ``.part.json`` resume state (``ResumeState``,
+    ``_resume_point``), written chunk by chunk through ``_PartWriter``
+    (PDF magic and size checks)
+  - ``plan_response``: what to do with a response -- stream it into the
+    ``.part`` file, restart from byte zero, retry, or stop -- given its
+    status and headers and the bytes already on disk
+  - ``_open_part``: the ``_PartWriter`` for a body being streamed
+  - ``_on_error``: the same decision for a transport error or ``_Abort``
+  - ``_finish`` / ``_give_up``: the rename into place, or what to keep
+
+Each engine keeps only its I/O: opening the request, iterating the body
+into a ``_PartWriter``, and sleeping between retries.
+
+Usage:
+    from pdf_transfer import plan_response, STREAM
+    plan = plan_response(url, r.status_code, r.headers, offset, state)
+"""
+
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Mapping, Optional
+
+import httpx
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+MAX_RETRIES = 3
+TIMEOUT = 60  # seconds per request
+MAX_PDF_MB = 100  # Per-file size cap
+CHUNK_SIZE = 64 * 1024
+PDF_MAGIC = b"%PDF-"
+USER_AGENT = "edu-benchmark-mapper/0.1 (research tool; bulk PDF download)"
+
+
+# ── Data structures ───────────────────────────────────────────────────────────
+
+@dataclass
+class PaperDownload:
+    """Tracks a single paper's download state."""
+    paper_id: str
+    title: str
+    pdf_url: str
+    source: str  # "openAccessPdf" | "arxiv"
+    filename: str
+    status: str = "pending"  # "pending" | "downloaded" | "failed" | "skipped"
+    error: str = ""
+    size_bytes: int = 0
+    resumed_bytes: int = 0  # Bytes kept from earlier partial downloads
+
+
+class _Abort(Exception):
+    """A response that will never yield a usable PDF (no point retrying)."""
+
+
+@dataclass
+class ResumeState:
+    """
+    What the server said about a partial download, saved next to its
+    ``.part`` file so a later attempt -- or a later run -- can resume it.
+    """
+    url: str
+    content_length: int = 0
+    etag: str = ""
+    last_modified: str = ""
+    accept_ranges: bool = False
+
+    @classmethod
+    def from_headers(cls, url: str, headers: Mapping[str, str]) -> "ResumeState":
+        length = headers.get("content-length", "")
+        return cls(
+            url=url,
+            content_length=int(length) if length.isdigit() else 0,
+            etag=headers.get("etag", ""),
+            last_modified=headers.get("last-modified", ""),
+            accept_ranges="bytes" in headers.get("accept-ranges", "").lower(),
+        )
+
+    @property
+    def resumable(self) -> bool:
+        return self.accept_ranges and self.content_length > 0
+
+    @property
+    def validator(self) -> str:
+        """``If-Range`` value: a strong ETag, else Last-Modified."""
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    def save(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f)
+
+    @staticmethod
+    def load(path: Path) -> Optional["ResumeState"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return ResumeState(**json.load(f))
+        except (OSError, json.JSONDecodeError, TypeError):
+            return None
+
+
+# ── Partial files ─────────────────────────────────────────────────────────────
+
+def part_path(dest: Path) -> Path:
+    """Temporary path a download is streamed into before the rename."""
+    return dest.with_name(dest.name + ".part")
+
+
+def resume_state_path(part: Path) -> Path:
+    return part.with_name(part.name + ".json")
+
+
+def _discard_partial(part: Path):
+    part.unlink(missing_ok=True)
+    resume_state_path(part).unlink(missing_ok=True)
+
+
+def _resume_point(part: Path, url: str) -> tuple[int, Optional[ResumeState]]:
+    """
+    ``(bytes already on disk, saved state)`` for a resumable ``.part`` of
+    *url*; anything that cannot be resumed is discarded and gives ``(0, None)``.
+    """
+    state = ResumeState.load(resume_state_path(part)) if part.exists() else None
+    size = part.stat().st_size if part.exists() else 0
+    if state and state.url == url and state.resumable and 0 < size <= state.content_length:
+        with open(part, "rb") as f:
+            if f.read(len(PDF_MAGIC)) == PDF_MAGIC[:min(size, len(PDF_MAGIC))]:
+                return size, state
+    _discard_partial(part)
+    return 0, None
+
+
+def _content_range(headers: Mapping[str, str]) -> tuple[int, int]:
+    """``(first byte, total size)`` of a 206 response's ``Content-Range`` (-1 if unknown)."""
+    m = re.match(r"bytes (\d+)-\d+/(\d+|\*)", headers.get("content-range", ""))
+    if not m:
+        return -1, -1
+    return int(m.group(1)), int(m.group(2)) if m.group(2) != "*" else -1
+
+
+def _range_headers(offset: int, state: Optional[ResumeState]) -> dict[str, str]:
+    """Request headers, asking only for the bytes after *offset* when resuming."""
+    headers = {"User-Agent": USER_AGENT}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if state.validator:
+            headers["If-Range"] = state.validator
+    return headers
+
+
+class _PartWriter:
+    """
+    Writes a response body to a ``.part`` file chunk by chunk -- appending
+    after *offset* bytes already there -- for both download engines.
+
+    Raises ``_Abort`` as soon as the body is known to be unusable: a
+    ``Content-Length`` over *max_bytes*, a body that grows past it, or
+    first bytes that are not ``%PDF-`` (HTML error / login pages).
+    An interrupted stream leaves what it got in the file.
+    """
+
+    def __init__(self, headers: Mapping[str, str], part: Path, max_bytes: int, offset: int = 0):
+        declared = headers.get("content-length")
+        self.expected = offset + int(declared) if declared and declared.isdigit() else None
+        if self.expected is not None and self.expected > max_bytes:
+            raise _Abort(
+                f"Too large ({self.expected / 1024**2:.1f} MB > {max_bytes / 1024**2:g} MB cap)"
+            )
+        self.content_type = headers.get("content-type", "")
+        self.max_bytes = max_bytes
+        self.written = offset
+        self.head = PDF_MAGIC if offset else b""   # a resumed part was checked by _resume_point
+        self._f = open(part, "ab" if offset else "wb")
+
+    def write(self, chunk: bytes):
+        if len(self.head) < len(PDF_MAGIC):
+            self.head += chunk[:len(PDF_MAGIC) - len(self.head)]
+            if len(self.head) >= len(PDF_MAGIC) and self.head != PDF_MAGIC:
+                raise _Abort(f"Not a PDF (content-type: {self.content_type})")
+        self.written += len(chunk)
+        if self.written > self.max_bytes:
+            raise _Abort(f"Too large (> {self.max_bytes / 1024**2:g} MB cap)")
+        self._f.write(chunk)
+
+    def finish(self) -> int:
+        """Flush to disk, check the body is a complete PDF and return the file's size."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        if self.head != PDF_MAGIC:
+            raise _Abort(f"Not a PDF ({self.written} bytes)")
+        if self.expected is not None and self.written != self.expected:
+            raise httpx.ReadError(f"Truncated: {self.written} of {self.expected} bytes")
+        return self.written
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self) -> "_PartWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ── Decisions ─────────────────────────────────────────────────────────────────
+
+# Plan actions
+STREAM = "stream"     # write the body into the .part file after plan.offset bytes
+RESTART = "restart"   # drop the .part file, try again from byte zero
+RETRY = "retry"       # try again, keeping any .part file
+STOP = "stop"         # give up on this paper
+
+
+@dataclass
+class Plan:
+    """What to do with one response (see ``plan_response``)."""
+    action: str
+    offset: int = 0   # STREAM: bytes already in the .part file
+    fresh: Optional[ResumeState] = None   # STREAM from byte zero: state to save for a resume
+    error: str = ""   # anything but STREAM: why, for the manifest
+
+
+def plan_response(
+    url: str,
+    status: int,
+    headers: Mapping[str, str],
+    offset: int,
+    state: Optional[ResumeState],
+) -> Plan:
+    """
+    Decide what to do with a response to a request for *url* that asked for
+    the bytes after *offset* (``_range_headers``).
+
+    A 206 resumes the ``.part`` file when its ``Content-Range`` lines up
+    with the saved *state*, else the download restarts. A 200 is the full
+    body -- first attempt, no range support, or the file changed -- and
+    replaces the ``.part`` file.
+    """
+    if status == 206 and offset:
+        start, total = _content_range(headers)
+        if start != offset or total != state.content_length:
+            return Plan(RESTART, error="Range mismatch; restarting")
+        return Plan(STREAM, offset=offset)
+
+    if status == 200:
+        return Plan(STREAM, fresh=ResumeState.from_headers(url, headers))
+
+    if status == 416:
+        return Plan(RESTART, error="Range not satisfiable; restarting")
+    if status == 429:
+        # Shared per-host limiter pauses on Retry-After / back-off
+        return Plan(RETRY, error="Rate-limited (HTTP 429)")
+    if status in (403, 451):
+        return Plan(STOP, error=f"Access denied (HTTP {status})")
+    return Plan(RETRY, error=f"HTTP {status}")
+
+
+def _open_part(plan: Plan, headers: Mapping[str, str], part: Path, max_bytes: int) -> _PartWriter:
+    """A ``_PartWriter`` for a STREAM *plan*, saving (or clearing) the resume state of a fresh body."""
+    if not plan.offset:
+        if plan.fresh and plan.fresh.resumable:
+            plan.fresh.save(resume_state_path(part))
+        else:
+            resume_state_path(part).unlink(missing_ok=True)
+    return _PartWriter(headers, part, max_bytes, plan.offset)
+
+
+def _keep_trying(plan: Plan, paper: PaperDownload, part: Path) -> bool:
+    """Apply a non-STREAM *plan* to *paper*; False when it is not worth another attempt."""
+    paper.error = plan.error
+    if plan.action == RESTART:
+        _discard_partial(part)
+    return plan.action != STOP
+
+
+def _on_error(e: Exception, paper: PaperDownload, part: Path) -> Optional[float]:
+    """Record a failed attempt; seconds to wait before the next one, or None to stop."""
+    if isinstance(e, _Abort):
+        paper.error = str(e)
+        _discard_partial(part)
+        return None
+    if isinstance(e, httpx.TimeoutException):
+        paper.error = "Timeout"
+        return 2
+    paper.error = str(e)[:200]
+    return 1
+
+
+# ── Outcomes ──────────────────────────────────────────────────────────────────
+
+def _finish(paper: PaperDownload, dest: Path, size: int, resumed: int = 0) -> PaperDownload:
+    """Rename a complete ``.part`` into place at *dest* and mark *paper* downloaded."""
+    part = part_path(dest)
+    os.replace(part, dest)
+    resume_state_path(part).unlink(missing_ok=True)
+    paper.status = "downloaded"
+    paper.size_bytes = size
+    paper.resumed_bytes += resumed
+    paper.error = ""
+    return paper
+
+
+def _give_up(paper: PaperDownload, part: Path) -> PaperDownload:
+    """Mark *paper* failed, keeping only partial data a later run can resume."""
+    paper.status = "failed"
+    state = ResumeState.load(resume_state_path(part))
+    if not (state and state.resumable and part.exists()):
+        _discard_partial(part)
+    return paper
+
+
+def _already_downloaded(paper: PaperDownload, dest: Path) -> bool:
+    if dest.exists() and dest.stat().st_size > 1000:
+        paper.status = "downloaded"
+        paper.size_bytes = dest.stat().st_size
+        return True
+    return False
@@ -0,0 +1,523 @@
+"""
+Local learned pre-classifier trained on the LLM labels already on disk.
+
+``output/education_benchmark_mapping.json`` (LLM ``framework_ids`` /
+``tool_types`` / not-a-benchmark flags) and ``output/paper_scores.json``
+(``relevance_score`` plus reclassified categories) hold thousands of LLM
+labels. This module fits a NumPy-only model on them:
+
+  - TF-IDF features: lower-cased word unigrams + bigrams (document
+    frequency >= 2, capped at 50k terms), sublinear TF, L2-normalised rows,
+    kept as CSR index arrays;
+  - one linear head per target, trained jointly with full-batch Adam:
+    logistic heads for ``benchmark`` (not-a-benchmark vs the rest), every
+    framework ID (``fw:<id>``) and tool type (``tool:<id>``), and a
+    squared-loss ``relevance`` regressor (1-10). Each head only learns
+    from examples that carry its label.
+
+Training takes seconds and scoring is one sparse-dense product, so the
+model runs in front of the LLM:
+
+  - ``main.py --prefilter``: entries with P(benchmark) below the model's
+    pre-filter threshold skip the LLM (tagged ``preclassifier:skip-negative``
+    / ``not-a-benchmark``). The threshold is the highest one at which at
+    least 98% of the holdout entries below it were not-a-benchmark; with
+    no holdout that can calibrate one, the pre-filter is off and skips
+    nothing;
+  - ``rank_papers.py --prior``: pending papers are scored best-first by
+    predicted relevance; ``--min-prior N`` records papers predicted below
+    N as ``prefiltered`` instead of sending them to the LLM.
+
+The CLI trains on a split, reports holdout accuracy and speed, refits on
+all labels and saves ``output/preclassifier.npz``.
+
+Usage:
+    uv run preclassifier.py                  # Train, report holdout accuracy + speed, save
+    uv run preclassifier.py --holdout 0.3    # Larger holdout split
+    uv run preclassifier.py --epochs 300     # More optimiser steps
+
+    from preclassifier import Preclassifier, entry_text
+    model = Preclassifier.load()
+    model.predict([entry_text(e) for e in entries])   # (n_entries, n_heads)
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+
+from cascade import is_stage2_tag, load_labelled_run
+from config import FRAMEWORK, TOOL_TYPES
+from scraper import BenchmarkEntry
+
+PRECLASSIFIER_PATH = "output/preclassifier.npz"
+REPORT_JSON = "output/education_benchmark_mapping.json"
+PAPER_SCORES_JSON = "output/paper_scores.json"
+PAPERS_JSONL = "output/all_papers.jsonl"
+
+MAX_FEATURES = 50_000
+MIN_DF = 2
+MAX_TEXT_CHARS = 3000       # Paper text used for features (the title always is)
+EPOCHS = 120
+LEARNING_RATE = 0.3
+L2 = 1e-4
+DEFAULT_THRESHOLD = 0.5     # Probability at which a framework / tool head fires
+PREFILTER_TARGET = 0.98     # Holdout share of skipped entries that must be not-a-benchmark
+PREFILTER_GRID = (0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3)
+PREFILTER_MIN_SUPPORT = 20
+
+BENCHMARK_HEAD = "benchmark"
+RELEVANCE_HEAD = "relevance"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# ── Examples ────────────────────────────────────────────────────────────────
+
+@dataclass
+class Example:
+    """One labelled text; ``None`` / missing labels leave the matching heads untrained."""
+    text: str
+    is_benchmark: Optional[bool] = None
+    framework_ids: Optional[list[str]] = None
+    tool_types: Optional[list[str]] = None
+    relevance: Optional[float] = None
+
+
+def entry_text(entry: BenchmarkEntry) -> str:
+    """Feature text of a scraped entry (stage-2 tags are ignored)."""
+    tags = [t for t in entry.tags if not is_stage2_tag(t)]
+    return " ".join([entry.name, entry.description, *tags])
+
+
+def paper_text(title: str, text: str) -> str:
+    """Feature text of a parsed paper."""
+    return f"{title} {text[:MAX_TEXT_CHARS]}"
+
+
+def load_mapping_examples(path: str = REPORT_JSON) -> list[Example]:
+    """The LLM-classified entries of a mapping report."""
+    entries, labels = load_labelled_run(path)
+    return [
+        Example(entry_text(e), l.is_benchmark, l.framework_ids, l.tool_types)
+        for e, l in zip(entries, labels)
+    ]
+
+
+def load_score_examples(
+    scores_path: str = PAPER_SCORES_JSON,
+    papers_path: str = PAPERS_JSONL,
+) -> list[Example]:
+    """Scored papers of ``paper_scores.json``, with their parsed text when available."""
+    if not os.path.exists(scores_path):
+        return []
+    with open(scores_path, "r", encoding="utf-8") as f:
+        scores = {
+            s["paper_id"]: s for s in json.load(f)
+            if s.get("paper_id") and s.get("status") == "scored"
+        }
+    texts: dict[str, str] = {}
+    if scores and os.path.exists(papers_path):
+        with open(papers_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                paper = json.loads(line)
+                if paper.get("paper_id") in scores:
+                    texts[paper["paper_id"]] = paper.get("text", "")
+    return [
+        Example(
+            paper_text(s.get("title", ""), texts.get(pid, "")),
+            framework_ids=list(s.get("framework_ids") or []),
+            tool_types=list(s.get("tool_types") or []),
+            relevance=float(s["relevance_score"]),
+        )
+        for pid, s in scores.items()
+    ]
+
+
+def default_heads() -> list[str]:
+    return (
+        [BENCHMARK_HEAD]
+        + [f"fw:{f}" for f in FRAMEWORK]
+        + [f"tool:{t}" for t in TOOL_TYPES]
+        + [RELEVANCE_HEAD]
+    )
+
+
+def _targets(examples: list[Example], heads: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """``(Y, M)``: targets and 0/1 label masks, both ``(n_examples, n_heads)``."""
+    col = {h: j for j, h in enumerate(heads)}
+    fw_cols = [j for h, j in col.items() if h.startswith("fw:")]
+    tool_cols = [j for h, j in col.items() if h.startswith("tool:")]
+    y = np.zeros((len(examples), len(heads)), dtype=np.float32)
+    m = np.zeros_like(y)
+    for i, ex in enumerate(examples):
+        if ex.is_benchmark is not None:
+            y[i, col[BENCHMARK_HEAD]] = float(ex.is_benchmark)
+            m[i, col[BENCHMARK_HEAD]] = 1
+        if ex.framework_ids is not None:
+            m[i, fw_cols] = 1
+            for f in ex.framework_ids:
+                if f"fw:{f}" in col:
+                    y[i, col[f"fw:{f}"]] = 1
+        if ex.tool_types is not None:
+            m[i, tool_cols] = 1
+            for t in ex.tool_types:
+                if f"tool:{t}" in col:
+                    y[i, col[f"tool:{t}"]] = 1
+        if ex.relevance is not None:
+            y[i, col[RELEVANCE_HEAD]] = (ex.relevance - 1) / 9
+            m[i, col[RELEVANCE_HEAD]] = 1
+    return y, m
+
+
+# ── Sparse TF-IDF ───────────────────────────────────────────────────────────
+
+def _terms(text: str) -> list[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@dataclass
+class Csr:
+    """Row-compressed sparse matrix as three NumPy arrays."""
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    n_cols: int
+    _col_order: Optional[tuple] = field(default=None, repr=False)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def dot(self, w: np.ndarray) -> np.ndarray:
+        """``X @ w`` for a dense ``(n_cols, k)`` *w*."""
+        out = np.zeros((self.n_rows, w.shape[1]), dtype=np.float32)
+        starts = self.indptr[:-1]
+        nonempty = self.indptr[1:] > starts
+        if nonempty.any():
+            out[nonempty] = np.add.reduceat(self.data[:, None] * w[self.indices], starts[nonempty], axis=0)
+        return out
+
+    def tdot(self, g: np.ndarray) -> np.ndarray:
+        """``X.T @ g`` for a dense ``(n_rows, k)`` *g* (column order cached on first use)."""
+        if self._col_order is None:
+            order = np.argsort(self.indices, kind="stable")
+            rows = np.repeat(np.arange(self.n_rows), np.diff(self.indptr))[order]
+            cols = self.indices[order]
+            starts = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1]]) if len(cols) else np.zeros(0, int)
+            self._col_order = (order, rows, cols[starts], starts)
+        order, rows, cols, starts = self._col_order
+        out = np.zeros((self.n_cols, g.shape[1]), dtype=np.float32)
+        if len(starts):
+            out[cols] = np.add.reduceat(self.data[order, None] * g[rows], starts, axis=0)
+        return out
+
+
+def fit_vocabulary(texts: Iterable[str], max_features: int = MAX_FEATURES, min_df: int = MIN_DF) -> tuple[dict[str, int], np.ndarray]:
+    """``(term -> column, idf)`` of the *max_features* most frequent terms with df >= *min_df*."""
+    df: dict[str, int] = {}
+    n = 0
+    for text in texts:
+        n += 1
+        for t in set(_terms(text)):
+            df[t] = df.get(t, 0) + 1
+    kept = sorted((t for t, c in df.items() if c >= min_df), key=lambda t: (-df[t], t))[:max_features]
+    vocab = {t: j for j, t in enumerate(kept)}
+    idf = np.asarray([np.log((1 + n) / (1 + df[t])) + 1 for t in kept], dtype=np.float32)
+    return vocab, idf
+
+
+def transform(texts: Iterable[str], vocab: dict[str, int], idf: np.ndarray) -> Csr:
+    """L2-normalised sublinear TF-IDF rows of *texts*."""
+    indptr = [0]
+    indices: list[np.ndarray] = []
+    data: list[np.ndarray] = []
+    for text in texts:
+        counts: dict[int, int] = {}
+        for t in _terms(text):
+            j = vocab.get(t)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + 1
+        cols = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        vals = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * idf[cols]
+        norm = np.sqrt((vals * vals).sum())
+        indices.append(cols)
+        data.append(vals / norm if norm else vals)
+        indptr.append(indptr[-1] + len(cols))
+    return Csr(
+        np.asarray(indptr, dtype=np.int64),
+        np.concatenate(indices) if indices else np.zeros(0, np.int32),
+        np.concatenate(data) if data else np.zeros(0, np.float32),
+        len(idf),
+    )
+
+
+# ── Model ───────────────────────────────────────────────────────────────────
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+@dataclass
+class Preclassifier:
+    """TF-IDF vocabulary plus one linear head per target."""
+    terms: list[str]
+    idf: np.ndarray
+    heads: list[str]
+    weights: np.ndarray          # (n_terms, n_heads)
+    bias: np.ndarray             # (n_heads,)
+    meta: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._vocab = {t: j for j, t in enumerate(self.terms)}
+        self._regression = np.asarray([h == RELEVANCE_HEAD for h in self.heads])
+
+    @classmethod
+    def train(
+        cls,
+        examples: list[Example],
+        heads: Optional[list[str]] = None,
+        epochs: int = EPOCHS,
+        learning_rate: float = LEARNING_RATE,
+        l2: float = L2,
+    ) -> "Preclassifier":
+        heads = heads or default_heads()
+        t0 = time.perf_counter()
+        vocab, idf = fit_vocabulary(ex.text for ex in examples)
+        terms = sorted(vocab, key=vocab.get)
+        x = transform((ex.text for ex in examples), vocab, idf)
+        y, m = _targets(examples, heads)
+        model = cls(terms, idf, heads, np.zeros((len(terms), len(heads)), np.float32), np.zeros(len(heads), np.float32))
+        # Start every head at its base rate
+        support = m.sum(axis=0)
+        base = np.where(support > 0, (y * m).sum(axis=0) / np.maximum(support, 1), 0.5)
+        model.bias = np.where(model._regression, base, np.log(np.clip(base, 1e-3, 1 - 1e-3) / np.clip(1 - base, 1e-3, 1))).astype(np.float32)
+
+        # Full-batch Adam on the masked mean loss of each head
+        scale = m / np.maximum(support, 1)
+        state = [np.zeros_like(model.weights), np.zeros_like(model.weights), np.zeros_like(model.bias), np.zeros_like(model.bias)]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            z = x.dot(model.weights) + model.bias
+            pred = np.where(model._regression, z, _sigmoid(z))
+            g = (pred - y) * scale
+            grads = (x.tdot(g) + l2 * model.weights, g.sum(axis=0))
+            for k, (param, grad) in enumerate(zip((model.weights, model.bias), grads)):
+                mom, var = state[2 * k], state[2 * k + 1]
+                mom *= beta1
+                mom += (1 - beta1) * grad
+                var *= beta2
+                var += (1 - beta2) * grad * grad
+                param -= learning_rate * (mom / (1 - beta1 ** step)) / (np.sqrt(var / (1 - beta2 ** step)) + eps)
+        model.meta = {
+            "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "examples": len(examples),
+            "support": {h: int(s) for h, s in zip(heads, support)},
+            "train_seconds": round(time.perf_counter() - t0, 2),
+            "epochs": epochs,
+        }
+        return model
+
+    # ── Scoring ──────────────────────────────────────────────────────────
+
+    def features(self, texts: Iterable[str]) -> Csr:
+        return transform(texts, self._vocab, self.idf)
+
+    def predict(self, texts: Iterable[str]) -> np.ndarray:
+        """``(n, n_heads)``: probabilities, and the 1-10 relevance in its column."""
+        z = self.features(texts).dot(self.weights) + self.bias
+        out = _sigmoid(z)
+        out[:, self._regression] = np.clip(z[:, self._regression] * 9 + 1, 1, 10)
+        return out
+
+    def column(self, head: str) -> int:
+        return self.heads.index(head)
+
+    def labels(self, scores: np.ndarray, prefix: str, threshold: float = DEFAULT_THRESHOLD) -> list[list[str]]:
+        """Per row of *scores*, the ``fw:`` / ``tool:`` categories at or above *threshold*."""
+        cols = [(j, h[len(prefix):]) for j, h in enumerate(self.heads) if h.startswith(prefix)]
+        return [[name for j, name in cols if row[j] >= threshold] for row in scores]
+
+    # ── Persistence ──────────────────────────────────────────────────────
+
+    def save(self, path: str = PRECLASSIFIER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=np.asarray(self.terms, dtype=str),
+                idf=self.idf,
+                heads=np.asarray(self.heads, dtype=str),
+                weights=self.weights,
+                bias=self.bias,
+                meta=np.asarray(json.dumps(self.meta)),
+            )
+
+    @classmethod
+    def load(cls, path: str = PRECLASSIFIER_PATH) -> Optional["Preclassifier"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                terms=[str(t) for t in data["terms"]],
+                idf=data["idf"],
+                heads=[str(h) for h in data["heads"]],
+                weights=data["weights"],
+                bias=data["bias"],
+                meta=json.loads(str(data["meta"])),
+            )
+
+
+# ── Evaluation ──────────────────────────────────────────────────────────────
+
+def _micro_prf(pred: np.ndarray, y: np.ndarray) -> tuple[float, float, float]:
+    tp = float((pred & y).sum())
+    p = tp / pred.sum() if pred.sum() else 0.0
+    r = tp / y.sum() if y.sum() else 0.0
+    return p, r, (2 * p * r / (p + r) if p + r else 0.0)
+
+
+def calibrate_prefilter(prob: np.ndarray, is_benchmark: np.ndarray) -> float:
+    """
+    Highest grid threshold whose skipped entries are >= PREFILTER_TARGET
+    not-a-benchmark; 0.0 (pre-filter off) if none has the support to show it.
+    """
+    best = 0.0
+    for t in PREFILTER_GRID:
+        skip = prob < t
+        if skip.sum() >= PREFILTER_MIN_SUPPORT and (~is_benchmark[skip]).mean() >= PREFILTER_TARGET:
+            best = t
+    return best
+
+
+def prefilter_threshold(model: "Preclassifier") -> float:
+    """The P(benchmark) below which ``main.py --prefilter`` skips the LLM (0.0: not calibrated, off)."""
+    return model.meta.get("holdout", {}).get("benchmark", {}).get("prefilter_max_prob", 0.0)
+
+
+def evaluate(model: Preclassifier, examples: list[Example]) -> dict:
+    """Holdout metrics of *model* on labelled *examples*, plus scoring speed."""
+    t0 = time.perf_counter()
+    scores = model.predict(ex.text for ex in examples)
+    elapsed = time.perf_counter() - t0
+    y, m = _targets(examples, model.heads)
+    metrics: dict = {"examples": len(examples), "us_per_entry": round(elapsed / max(len(examples), 1) * 1e6, 1)}
+
+    b = model.column(BENCHMARK_HEAD)
+    rows = m[:, b] > 0
+    if rows.any():
+        prob, truth = scores[rows, b], y[rows, b] > 0.5
+        threshold = calibrate_prefilter(prob, truth)
+        skip = prob < threshold
+        metrics["benchmark"] = {
+            "n": int(rows.sum()),
+            "accuracy": float(((prob >= 0.5) == truth).mean()),
+            "prefilter_max_prob": threshold,
+            "prefilter_skipped": float(skip.mean()),
+            "prefilter_agreement": float((~truth[skip]).mean()) if skip.any() else None,
+        }
+    for prefix in ("fw:", "tool:"):
+        cols = [j for j, h in enumerate(model.heads) if h.startswith(prefix)]
+        rows = m[:, cols[0]] > 0 if cols else np.zeros(len(examples), bool)
+        if rows.any():
+            pred = scores[np.ix_(rows, cols)] >= DEFAULT_THRESHOLD
+            truth = y[np.ix_(rows, cols)] > 0.5
+            p, r, f1 = _micro_prf(pred, truth)
+            metrics[prefix.rstrip(":")] = {
+                "n": int(rows.sum()), "precision": p, "recall": r, "f1": f1,
+                "exact_match": float((pred == truth).all(axis=1).mean()),
+            }
+    r = model.column(RELEVANCE_HEAD)
+    rows = m[:, r] > 0
+    if rows.any():
+        pred, truth = scores[rows, r], y[rows, r] * 9 + 1
+        metrics["relevance"] = {
+            "n": int(rows.sum()),
+            "mae": float(np.abs(pred - truth).mean()),
+            "pearson": float(np.corrcoef(pred, truth)[0, 1]) if rows.sum() > 1 and truth.std() > 0 else None,
+        }
+    return metrics
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+
+def cli():
+    from rich.console import Console
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Train the local pre-classifier on existing LLM labels.")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Share of labelled examples held out for the accuracy report (default: 0.2).")
+    parser.add_argument("--epochs", type=int, default=EPOCHS, help=f"Adam steps (default: {EPOCHS}).")
+    parser.add_argument("--path", default=PRECLASSIFIER_PATH, help=f"Model file (default: {PRECLASSIFIER_PATH}).")
+    args = parser.parse_args()
+    console = Console()
+
+    mapping = load_mapping_examples()
+    papers = load_score_examples()
+    examples = mapping + papers
+    console.print(f"{len(mapping)} LLM-classified entries + {len(papers)} scored papers")
+    if len(examples) < 10:
+        console.print("[red]Not enough LLM labels to train on -- run main.py / rank_papers.py first.[/red]")
+        return
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(examples))
+    n_test = int(len(examples) * args.holdout)
+    test = [examples[i] for i in order[:n_test]]
+    train = [examples[i] for i in order[n_test:]]
+
+    model = Preclassifier.train(train, epochs=args.epochs)
+    console.print(
+        f"Trained on {len(train)} examples, {len(model.terms):,} terms, {len(model.heads)} heads "
+        f"in {model.meta['train_seconds']:.1f}s"
+    )
+    metrics = evaluate(model, test) if test else {}
+    if metrics:
+        table = Table(title=f"Holdout ({len(test)} examples)")
+        table.add_column("Head")
+        table.add_column("n", justify="right")
+        table.add_column("Metrics")
+        if "benchmark" in metrics:
+            b = metrics["benchmark"]
+            agreement = b["prefilter_agreement"]
+            if b["prefilter_max_prob"] > 0:
+                prefilter = (f"pre-filter (P < {b['prefilter_max_prob']:g}) skips {b['prefilter_skipped']:.0%}"
+                             + (f", {agreement:.1%} of them not-a-benchmark" if agreement is not None else ""))
+            else:
+                prefilter = (f"[yellow]pre-filter off: no threshold skips >= {PREFILTER_MIN_SUPPORT} "
+                             f"entries with >= {PREFILTER_TARGET:.0%} not-a-benchmark[/yellow]")
+            table.add_row("benchmark", str(b["n"]), f"accuracy {b['accuracy']:.1%}; {prefilter}")
+        for name in ("fw", "tool"):
+            if name in metrics:
+                g = metrics[name]
+                table.add_row(name, str(g["n"]),
+                              f"micro P {g['precision']:.0%} / R {g['recall']:.0%} / F1 {g['f1']:.2f}, "
+                              f"exact match {g['exact_match']:.0%}")
+        if "relevance" in metrics:
+            rel = metrics["relevance"]
+            table.add_row("relevance", str(rel["n"]),
+                          f"MAE {rel['mae']:.2f}"
+                          + (f", Pearson r {rel['pearson']:.2f}" if rel["pearson"] is not None else ""))
+        console.print(table)
+        console.print(f"Scoring speed: {metrics['us_per_entry']:.0f} µs/entry (features + all heads)")
+
+    # Refit on every label for the saved model
+    final = Preclassifier.train(examples, epochs=args.epochs)
+    final.meta["holdout"] = metrics
+    final.save(args.path)
+    console.print(f"Refit on all {len(examples)} examples in {final.meta['train_seconds']:.1f}s -> {args.path}")
+
+
+if __name__ == "__main__":
+    cli()
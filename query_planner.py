@@ -0,0 +1,355 @@
+"""
+Per-query yield statistics and a search planner that prunes low-yield queries.
+
+Many of the ~100 ``config.HF_SEARCH_QUERIES`` overlap heavily: after the
+first few, a query often returns a thousand S2 papers of which a handful
+are new. ``QueryYield`` remembers, per query:
+
+  - how many results each provider returned and how many were *new*
+    (not found by an earlier query in the run), smoothed over runs;
+  - which canonical IDs (identity.py) the query was first to discover, so
+    later stages can be credited back to it;
+  - the LLM benchmark rate of those entries (``mapper.map_all``);
+  - the relevance scores of those papers in ``output/paper_scores.json``
+    (``rank_papers.py``).
+
+``plan_queries`` turns that into an expected marginal yield -- new
+benchmarks per run -- and orders the queries by it. Queries below a
+threshold are capped to a fraction of the usual result limits (or
+skipped); unexplored queries always run first, and skipped queries are
+revisited every ``REVISIT_AFTER_RUNS`` runs so they can recover.
+
+Usage:
+    uv run main.py --plan-queries                     # Order + cap low-yield queries
+    uv run main.py --plan-queries --low-yield skip --min-query-yield 1.0
+    uv run query_planner.py                           # Show per-query yield and the plan
+    uv run query_planner.py --refresh                 # Re-credit the latest report + paper scores
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from identity import canonical_id
+
+if TYPE_CHECKING:
+    from scraper import BenchmarkEntry
+
+YIELD_PATH = "output/query_yield.json"
+REPORT_JSON = "output/education_benchmark_mapping.json"
+PAPER_SCORES_JSON = "output/paper_scores.json"
+
+EMA_WEIGHT = 0.5            # Weight of the latest run in the smoothed "new per run"
+PRIOR_WEIGHT = 5.0          # Pseudo-count pulling sparse rates towards the global rate
+HIGH_RELEVANCE = 7          # paper_scores relevance_score counted as "relevant"
+DEFAULT_MIN_YIELD = 0.5     # Expected new benchmarks per run below which a query is pruned
+DEFAULT_CAP_FRACTION = 0.2  # Share of max results a capped query still fetches
+REVISIT_AFTER_RUNS = 5      # A skipped query runs again after this many skipped runs
+
+
+# ── Statistics ───────────────────────────────────────────────────────────────
+
+@dataclass
+class QueryStats:
+    """Yield of one search query."""
+    runs: int = 0
+    last_run: str = ""
+    found: dict[str, int] = field(default_factory=dict)   # provider -> results (last run)
+    new: dict[str, int] = field(default_factory=dict)     # provider -> new entries (last run)
+    new_ema: float = 0.0          # Smoothed new entries per full-size run
+    new_total: int = 0            # New entries credited over all runs
+    classified: int = 0           # Credited entries the LLM classified
+    benchmarks: int = 0           # ... of which it kept as benchmarks
+    scored: int = 0               # Credited papers with a relevance score
+    relevance_sum: float = 0.0
+    relevant: int = 0             # ... scoring >= HIGH_RELEVANCE
+    skipped_runs: int = 0         # Consecutive runs the planner skipped it
+
+    @property
+    def benchmark_rate(self) -> Optional[float]:
+        return self.benchmarks / self.classified if self.classified else None
+
+    @property
+    def mean_relevance(self) -> Optional[float]:
+        return self.relevance_sum / self.scored if self.scored else None
+
+
+@dataclass
+class PlannedQuery:
+    """One query in a search plan."""
+    query: str
+    action: str                   # "explore" | "run" | "revisit" | "cap" | "skip"
+    expected: Optional[float]     # Expected new benchmarks per run (None = unexplored)
+    scale: float = 1.0            # Fraction of the usual max results to fetch
+
+
+class QueryYield:
+    """
+    Per-query yield statistics, persisted to ``output/query_yield.json``.
+
+    The search engines call ``record_unit`` after each (query, provider)
+    search and ``finish_run`` at the end; ``record_classification`` and
+    ``record_scores`` credit later pipeline stages back to the query that
+    first discovered each entry.
+    """
+
+    def __init__(self, path: str = YIELD_PATH):
+        self.path = path
+        self.queries: dict[str, QueryStats] = {}
+        self.owners: dict[str, str] = {}     # canonical ID -> discovering query
+        self._run: dict[str, dict[str, tuple[int, int]]] = {}
+
+    @classmethod
+    def load(cls, path: str = YIELD_PATH) -> "QueryYield":
+        y = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                y.queries = {q: QueryStats(**s) for q, s in (data.get("queries") or {}).items()}
+                y.owners = dict(data.get("owners") or {})
+            except (json.JSONDecodeError, OSError, TypeError) as e:
+                print(f"  Warning: could not read query yield stats {path}: {e}")
+        return y
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "queries": {q: s.__dict__ for q, s in sorted(self.queries.items())},
+            "owners": self.owners,
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def stats(self, query: str) -> QueryStats:
+        return self.queries.setdefault(query, QueryStats())
+
+    # ── Discovery ────────────────────────────────────────────────────────
+
+    def record_unit(self, query: str, provider: str, found: int, new_entries: list["BenchmarkEntry"]):
+        """Record one finished (query, provider) search and credit its new entries."""
+        if not query:
+            return  # daily papers are not a query
+        self._run.setdefault(query, {})[provider] = (found, len(new_entries))
+        for e in new_entries:
+            key = canonical_id(e.source_url)
+            if key:
+                self.owners.setdefault(key, query)
+
+    def finish_run(self, scales: Optional[dict[str, float]] = None):
+        """Fold this run's unit counts into the per-query statistics."""
+        today = date.today().isoformat()
+        for query, units in self._run.items():
+            s = self.stats(query)
+            found = {p: n for p, (n, _) in units.items()}
+            new = {p: n for p, (_, n) in units.items()}
+            # A capped run fetched only a fraction of the results; scale its
+            # count up so the smoothed yield stays comparable
+            total_new = sum(new.values())
+            full_size = total_new / max((scales or {}).get(query, 1.0), 1e-6)
+            s.new_ema = full_size if s.runs == 0 else (1 - EMA_WEIGHT) * s.new_ema + EMA_WEIGHT * full_size
+            s.found, s.new = found, new
+            s.new_total += total_new
+            s.runs += 1
+            s.last_run = today
+            s.skipped_runs = 0
+        self._run = {}
+
+    def note_skipped(self, queries: Iterable[str]):
+        for q in queries:
+            self.stats(q).skipped_runs += 1
+
+    # ── Downstream credit ────────────────────────────────────────────────
+
+    def record_classification(self, entries: Iterable["BenchmarkEntry"]):
+        """
+        Recount each query's LLM benchmark rate from mapped entries.
+
+        An entry counts as classified if ``mapper.map_all`` tagged it with
+        LLM reasoning or ``not-a-benchmark``.
+        """
+        for s in self.queries.values():
+            s.classified = s.benchmarks = 0
+        for e in entries:
+            query = self.owners.get(canonical_id(e.source_url))
+            if query is None:
+                continue
+            rejected = "not-a-benchmark" in e.tags
+            if not rejected and not any(t.startswith("llm:") for t in e.tags):
+                continue
+            s = self.stats(query)
+            s.classified += 1
+            if not rejected:
+                s.benchmarks += 1
+
+    def record_scores(self, scores: Iterable[dict], s2_lookup=None):
+        """
+        Recount each query's relevance from ``paper_scores.json`` records.
+
+        Scores are keyed by S2 paperId; *s2_lookup* (a DetailsStore or dict
+        by paperId) maps them to arXiv / DOI identities, which is how most
+        papers were discovered.
+        """
+        for s in self.queries.values():
+            s.scored, s.relevance_sum, s.relevant = 0, 0.0, 0
+        for rec in scores:
+            pid = rec.get("paper_id", "")
+            if not pid or rec.get("status") != "scored":
+                continue
+            keys = [f"s2:{pid.lower()}"]
+            detail = s2_lookup.get(pid) if s2_lookup is not None else None
+            ext = (detail or {}).get("externalIds") or {}
+            if ext.get("ArXiv"):
+                keys.append(canonical_id(f"https://arxiv.org/abs/{ext['ArXiv']}"))
+            if ext.get("DOI"):
+                keys.append(f"doi:{ext['DOI'].lower()}")
+            query = next((self.owners[k] for k in keys if k in self.owners), None)
+            if query is None:
+                continue
+            s = self.stats(query)
+            score = float(rec.get("relevance_score") or 0)
+            s.scored += 1
+            s.relevance_sum += score
+            if score >= HIGH_RELEVANCE:
+                s.relevant += 1
+
+    # ── Planning ─────────────────────────────────────────────────────────
+
+    def _global_rates(self) -> tuple[float, Optional[float]]:
+        classified = sum(s.classified for s in self.queries.values())
+        benchmarks = sum(s.benchmarks for s in self.queries.values())
+        scored = sum(s.scored for s in self.queries.values())
+        relevance = sum(s.relevance_sum for s in self.queries.values())
+        bench_rate = benchmarks / classified if classified else 1.0
+        return bench_rate, (relevance / scored if scored else None)
+
+    def expected_yield(self, query: str) -> Optional[float]:
+        """Expected new benchmarks per run, or None for an unexplored query."""
+        s = self.queries.get(query)
+        if not s or not s.runs:
+            return None
+        g_rate, g_rel = self._global_rates()
+        # Sparse per-query rates are shrunk towards the global ones
+        rate = (s.benchmarks + PRIOR_WEIGHT * g_rate) / (s.classified + PRIOR_WEIGHT)
+        rel_factor = 1.0
+        if g_rel:
+            rel_factor = (s.relevance_sum + PRIOR_WEIGHT * g_rel) / (s.scored + PRIOR_WEIGHT) / g_rel
+        return s.new_ema * rate * rel_factor
+
+
+def plan_queries(
+    queries: list[str],
+    yields: QueryYield,
+    min_yield: float = DEFAULT_MIN_YIELD,
+    low_yield: str = "cap",
+    cap_fraction: float = DEFAULT_CAP_FRACTION,
+) -> list[PlannedQuery]:
+    """
+    Order *queries* by expected marginal yield and prune the low-yield tail.
+
+    Unexplored queries come first (full limits), then the rest by expected
+    yield. Queries below *min_yield* are capped to *cap_fraction* of the
+    result limits (``low_yield="cap"``) or left out (``"skip"``, returned
+    with ``action="skip"``), unless they have been skipped for
+    ``REVISIT_AFTER_RUNS`` runs.
+    """
+    if low_yield not in ("cap", "skip"):
+        raise ValueError(f"Unknown low-yield action: {low_yield!r}")
+    planned: list[PlannedQuery] = []
+    for q in dict.fromkeys(queries):
+        expected = yields.expected_yield(q)
+        if expected is None:
+            planned.append(PlannedQuery(q, "explore", None))
+        elif expected >= min_yield:
+            planned.append(PlannedQuery(q, "run", expected))
+        elif low_yield == "cap":
+            planned.append(PlannedQuery(q, "cap", expected, cap_fraction))
+        elif yields.stats(q).skipped_runs >= REVISIT_AFTER_RUNS:
+            planned.append(PlannedQuery(q, "revisit", expected))
+        else:
+            planned.append(PlannedQuery(q, "skip", expected, 0.0))
+    planned.sort(key=lambda p: (p.expected is not None, -(p.expected or 0.0)))
+    return planned
+
+
+def load_report_entries(path: str = REPORT_JSON) -> list["BenchmarkEntry"]:
+    """Mapped entries from the latest JSON report ([] if there is none)."""
+    if not os.path.exists(path):
+        return []
+    from scraper import BenchmarkEntry
+    with open(path, "r", encoding="utf-8") as f:
+        return [BenchmarkEntry(**r) for r in json.load(f)]
+
+
+def refresh_scores(yields: QueryYield, path: str = PAPER_SCORES_JSON):
+    """Credit the relevance scores in ``paper_scores.json`` to their queries."""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            scores = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return
+    if not isinstance(scores, list) or not scores:
+        return
+    from details_store import open_details_store
+    store = open_details_store()
+    try:
+        yields.record_scores(scores, store)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def print_plan(planned: list[PlannedQuery], yields: QueryYield):
+    """Print the plan as a table, best queries first."""
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=f"Search plan ({len(planned)} queries)")
+    for col in ("#", "Query", "Action", "Expected", "New/run", "Bench rate", "Relevance", "Runs"):
+        table.add_column(col, justify="left" if col in ("Query", "Action") else "right")
+    for i, p in enumerate(planned, 1):
+        s = yields.queries.get(p.query) or QueryStats()
+        table.add_row(
+            str(i),
+            p.query,
+            p.action if p.action != "cap" else f"cap {p.scale:.0%}",
+            "-" if p.expected is None else f"{p.expected:.1f}",
+            f"{s.new_ema:.0f}" if s.runs else "-",
+            "-" if s.benchmark_rate is None else f"{s.benchmark_rate:.0%}",
+            "-" if s.mean_relevance is None else f"{s.mean_relevance:.1f}",
+            str(s.runs),
+        )
+    Console().print(table)
+
+
+def cli():
+    from config import HF_SEARCH_QUERIES
+
+    parser = argparse.ArgumentParser(description="Show per-query search yield and the query plan.")
+    parser.add_argument("--refresh", action="store_true",
+                        help=f"Re-credit {REPORT_JSON} and {PAPER_SCORES_JSON} to queries and save.")
+    parser.add_argument("--min-query-yield", type=float, default=DEFAULT_MIN_YIELD,
+                        help=f"Expected new benchmarks per run below which a query is pruned (default: {DEFAULT_MIN_YIELD}).")
+    parser.add_argument("--low-yield", choices=["cap", "skip"], default="cap",
+                        help="What to do with low-yield queries (default: cap).")
+    args = parser.parse_args()
+
+    yields = QueryYield.load()
+    if args.refresh:
+        yields.record_classification(load_report_entries())
+        refresh_scores(yields)
+        yields.save()
+        print(f"Saved query yield stats to {yields.path}")
+    planned = plan_queries(HF_SEARCH_QUERIES, yields, args.min_query_yield, args.low_yield)
+    print_plan(planned, yields)
+
+
+if __name__ == "__main__":
+    cli()
@@ -5,18 +5,26 @@ Reads full text from JSONL, sends each paper (truncated) to the LLM, and
 produces a relevance score (1-10) plus reclassified framework/tool mappings.
 
 Features:
-  - Parallel LLM calls (configurable concurrency)
+  - Parallel LLM calls, concurrency adapted to rate limits (AIMD, capped by --workers)
   - Progress bar with ETA (rich)
   - Resume support: skips already-scored papers
   - Incremental save every N completions
-  - Cross-references papers_manifest.json for metadata
+  - Static prompt prefix (taxonomy + rubric) in a cached system block;
+    token usage incl. cache reads/writes appended to output/llm_usage.jsonl
+  - Cross-references the download manifest (snapshot + journal,
+    manifest_journal.py) for titles missing from the parsed text
+  - Optional learned prior (preclassifier.py): score pending papers
+    best-first by predicted relevance, and skip those predicted below
+    --min-prior (recorded with status "prefiltered")
 
 Usage:
     uv run rank_papers.py                        # Score all papers
-    uv run rank_papers.py --workers 5            # Fewer concurrent calls
+    uv run rank_papers.py --workers 5            # Cap concurrent calls (adaptive below the cap)
     uv run rank_papers.py --limit 100            # Only first 100 pending
     uv run rank_papers.py --model claude-haiku-4-5-20251001  # Use a different model
     uv run rank_papers.py --dry-run              # Show what would be scored
+    uv run rank_papers.py --prior                # Score papers in order of predicted relevance
+    uv run rank_papers.py --min-prior 3          # ... and leave papers predicted below 3 to the prior
 """
 
 import argparse
@@ -40,7 +48,9 @@ from rich.progress import (
     SpinnerColumn,
 )
 
+from anthropic_utils import ConcurrencyController, UsageTracker, cached_system, get_controller
 from config import FRAMEWORK, TOOL_TYPES
+from manifest_journal import read_manifest
 
 load_dotenv()
 
@@ -97,43 +107,51 @@ _SYSTEM_PROMPT = (
 )
 
 
+# Taxonomy, rubric and response format are identical for every paper, so
+# they sit in the cached system prefix and only the paper goes in the user turn
+_INSTRUCTIONS = (
+    f"## Education Framework Categories\n{_FRAMEWORK_DESC}\n\n"
+    f"## Education Tool Types\n{_TOOL_DESC}\n\n"
+    "## Scoring Rubric\n"
+    "Rate relevance_score from 1 to 10:\n"
+    "  10 = Purpose-built K-12 education AI benchmark or evaluation suite\n"
+    "   9 = Directly evaluates AI tools in K-12 classroom settings\n"
+    "   8 = Strong K-12 education focus, measures learning outcomes with AI\n"
+    "   7 = Clear education focus, relevant evaluation methodology\n"
+    "   6 = Partially relevant -- education adjacent or covers some K-12 aspects\n"
+    "   5 = General AI benchmark that includes education-relevant tasks\n"
+    "   4 = Tangentially related -- mostly about other domains but touches education\n"
+    "   3 = Weak relevance -- general NLP/AI with possible education applications\n"
+    "   2 = Barely relevant -- no direct education connection\n"
+    "   1 = Not relevant to K-12 education at all\n\n"
+    "## Instructions\n"
+    "1. Read the paper text in the user message carefully.\n"
+    "2. Assign framework_ids (only those DIRECTLY relevant).\n"
+    "3. Assign tool_types (only those DIRECTLY relevant).\n"
+    "4. Write a concise 1-2 sentence summary of what this paper does/measures.\n"
+    "5. Score relevance 1-10 using the rubric above.\n\n"
+    "## Required Response Format\n"
+    "Return a single JSON object:\n"
+    '{"relevance_score": <int 1-10>, '
+    '"framework_ids": [<str>, ...], '
+    '"tool_types": [<str>, ...], '
+    '"summary": "<1-2 sentences>", '
+    '"reasoning": "<one sentence explaining the score>"}'
+)
+
+_SYSTEM_BLOCKS = cached_system(_SYSTEM_PROMPT, _INSTRUCTIONS)
+
+
 def _build_user_prompt(title: str, text: str) -> str:
-    """Build the user prompt for scoring a single paper."""
+    """Build the user prompt for scoring a single paper (the per-paper part only)."""
     truncated = text[:MAX_TEXT_CHARS]
     if len(text) > MAX_TEXT_CHARS:
         truncated += "\n\n[... text truncated ...]"
 
     return (
-        f"## Education Framework Categories\n{_FRAMEWORK_DESC}\n\n"
-        f"## Education Tool Types\n{_TOOL_DESC}\n\n"
         f"## Paper to Assess\n\n"
         f"Title: {title}\n\n"
-        f"Text:\n{truncated}\n\n"
-        "## Scoring Rubric\n"
-        "Rate relevance_score from 1 to 10:\n"
-        "  10 = Purpose-built K-12 education AI benchmark or evaluation suite\n"
-        "   9 = Directly evaluates AI tools in K-12 classroom settings\n"
-        "   8 = Strong K-12 education focus, measures learning outcomes with AI\n"
-        "   7 = Clear education focus, relevant evaluation methodology\n"
-        "   6 = Partially relevant -- education adjacent or covers some K-12 aspects\n"
-        "   5 = General AI benchmark that includes education-relevant tasks\n"
-        "   4 = Tangentially related -- mostly about other domains but touches education\n"
-        "   3 = Weak relevance -- general NLP/AI with possible education applications\n"
-        "   2 = Barely relevant -- no direct education connection\n"
-        "   1 = Not relevant to K-12 education at all\n\n"
-        "## Instructions\n"
-        "1. Read the paper text carefully.\n"
-        "2. Assign framework_ids (only those DIRECTLY relevant).\n"
-        "3. Assign tool_types (only those DIRECTLY relevant).\n"
-        "4. Write a concise 1-2 sentence summary of what this paper does/measures.\n"
-        "5. Score relevance 1-10 using the rubric above.\n\n"
-        "## Required Response Format\n"
-        "Return a single JSON object:\n"
-        '{"relevance_score": <int 1-10>, '
-        '"framework_ids": [<str>, ...], '
-        '"tool_types": [<str>, ...], '
-        '"summary": "<1-2 sentences>", '
-        '"reasoning": "<one sentence explaining the score>"}'
+        f"Text:\n{truncated}"
     )
 
 
@@ -144,18 +162,26 @@ def _call_llm(
     model: str,
     title: str,
     text: str,
+    usage: UsageTracker | None = None,
+    controller: ConcurrencyController | None = None,
 ) -> dict | None:
     """Call the LLM for a single paper. Returns parsed dict or None on failure."""
     prompt = _build_user_prompt(title, text)
 
     for attempt in range(MAX_RETRIES):
         try:
-            resp = client.messages.create(
+            params = dict(
                 model=model,
                 max_tokens=512,
-                system=_SYSTEM_PROMPT,
+                system=_SYSTEM_BLOCKS,
                 messages=[{"role": "user", "content": prompt}],
             )
+            if controller is not None:
+                resp = controller.call(client.messages.create, **params)
+            else:
+                resp = client.messages.create(**params)
+            if usage is not None:
+                usage.record(resp.usage)
             raw = resp.content[0].text.strip()
 
             # Strip markdown fences if present
@@ -180,6 +206,8 @@ def _call_llm(
         except json.JSONDecodeError:
             pass
         except anthropic.RateLimitError:
+            if controller is not None:
+                continue  # the controller has already paused every thread
             wait = min(2 ** (attempt + 2), 60)
             time.sleep(wait)
         except anthropic.APIError as exc:
@@ -201,13 +229,15 @@ def _score_paper(
     paper: dict,
     client: anthropic.Anthropic,
     model: str,
+    usage: UsageTracker | None = None,
+    controller: ConcurrencyController | None = None,
 ) -> dict:
     """Score a single paper. Returns a result dict for the manifest."""
     paper_id = paper["paper_id"]
     title = paper["title"]
     text = paper["text"]
 
-    result = _call_llm(client, model, title, text)
+    result = _call_llm(client, model, title, text, usage, controller)
 
     if result:
         return {
@@ -270,31 +300,59 @@ def save_scores(scores: dict[str, dict]):
 # ── Main pipeline ─────────────────────────────────────────────────────────────
 
 def run_ranking(
-    max_workers: int = 10,
+    max_workers: int = 32,
     limit: int | None = None,
     model: str = DEFAULT_MODEL,
     dry_run: bool = False,
+    prior: bool = False,
+    min_prior: float | None = None,
 ):
-    """Run the full ranking pipeline."""
+    """
+    Run the full ranking pipeline.
+
+    With *prior*, pending papers are ordered by the relevance predicted
+    by the local pre-classifier (preclassifier.py); with *min_prior*,
+    papers predicted below it are stored as ``prefiltered`` with the
+    predicted score and categories instead of going to the LLM.
+    Prefiltered papers are pending again in runs without *min_prior*.
+    """
     console.print("[bold]Loading data...[/bold]")
     papers = load_papers()
     existing_scores = load_existing_scores()
+    manifest = read_manifest(MANIFEST_PATH)
+    for p in papers:
+        entry = manifest.get(p["paper_id"])
+        if entry and not p.get("title"):
+            p["title"] = entry.get("title", "")
 
     # Filter to only papers that need scoring
-    pending = [p for p in papers if p["paper_id"] not in existing_scores]
+    done = {
+        pid for pid, s in existing_scores.items()
+        if min_prior is not None or s.get("status") != "prefiltered"
+    }
+    pending = [p for p in papers if p["paper_id"] not in done]
     already_done = len(papers) - len(pending)
 
     # Also skip papers with very little text
     pending = [p for p in pending if p.get("char_count", 0) >= 100]
 
+    prefiltered: list[dict] = []
+    if (prior or min_prior is not None) and pending:
+        pending, prefiltered = _apply_prior(pending, min_prior)
+
     if limit:
         pending = pending[:limit]
 
     console.print(f"\n[bold]Ranking plan:[/bold]")
     console.print(f"  Total papers:       [cyan]{len(papers)}[/cyan]")
+    console.print(
+        f"  In manifest:        [dim]{sum(1 for p in papers if p['paper_id'] in manifest)}[/dim]"
+    )
     console.print(f"  Already scored:     [green]{already_done}[/green]")
+    if prefiltered:
+        console.print(f"  Prefiltered:        [dim]{len(prefiltered)}[/dim] (predicted < {min_prior:g})")
     console.print(f"  To score:           [yellow]{len(pending)}[/yellow]")
-    console.print(f"  Workers:            [yellow]{max_workers}[/yellow]")
+    console.print(f"  Max concurrency:    [yellow]{max_workers}[/yellow] (adaptive)")
     console.print(f"  Model:              [cyan]{model}[/cyan]")
     console.print(f"  Text truncation:    [dim]{MAX_TEXT_CHARS:,} chars[/dim]")
     console.print(f"  Output:             [dim]{SCORES_PATH}[/dim]\n")
@@ -307,6 +365,10 @@ def run_ranking(
             console.print(f"  ... and {len(pending) - 10} more")
         return
 
+    if prefiltered:
+        existing_scores.update({r["paper_id"]: r for r in prefiltered})
+        save_scores(existing_scores)
+
     if not pending:
         console.print("[green]All papers already scored![/green]")
         _print_summary(existing_scores)
@@ -317,7 +379,10 @@ def run_ranking(
         console.print("[red]ANTHROPIC_API_KEY not set. Add it to .env[/red]")
         return
 
-    client = anthropic.Anthropic(api_key=api_key)
+    # max_retries=0: 429 / 529 go to the shared concurrency controller
+    client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+    controller = get_controller("anthropic", maximum=max_workers)
+    usage = UsageTracker("rank_papers", model)
     scores = dict(existing_scores)  # mutable copy
     scored = 0
     failed = 0
@@ -336,7 +401,7 @@ def run_ranking(
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = {
-                executor.submit(_score_paper, paper, client, model): paper
+                executor.submit(_score_paper, paper, client, model, usage, controller): paper
                 for paper in pending
             }
 
@@ -367,10 +432,59 @@ def run_ranking(
     console.print(f"  Scored:  [green]{scored}[/green]")
     console.print(f"  Failed:  [red]{failed}[/red]")
     console.print(f"  Total:   [cyan]{len(scores)}[/cyan] in {SCORES_PATH}")
+    console.print(f"  Usage:   {usage.summary()}")
+    console.print(f"  Concurrency: {controller.summary()}")
+    usage.save()
 
     _print_summary(scores)
 
 
+def _apply_prior(pending: list[dict], min_prior: float | None) -> tuple[list[dict], list[dict]]:
+    """
+    Order *pending* by predicted relevance (best first) and split off the
+    papers predicted below *min_prior* as ``prefiltered`` score records.
+    """
+    from preclassifier import PRECLASSIFIER_PATH, RELEVANCE_HEAD, Preclassifier, paper_text
+
+    prior = Preclassifier.load()
+    if prior is None:
+        console.print(
+            f"[yellow]No pre-classifier at {PRECLASSIFIER_PATH} -- run 'uv run preclassifier.py'. "
+            f"Scoring in file order.[/yellow]"
+        )
+        return pending, []
+    t0 = time.perf_counter()
+    predicted = prior.predict(paper_text(p["title"], p["text"]) for p in pending)
+    elapsed = time.perf_counter() - t0
+    relevance = predicted[:, prior.column(RELEVANCE_HEAD)]
+    frameworks = prior.labels(predicted, "fw:")
+    tools = prior.labels(predicted, "tool:")
+    console.print(
+        f"Prior: predicted relevance for {len(pending)} papers in {elapsed:.2f}s "
+        f"({elapsed / len(pending) * 1e6:.0f} µs/paper)"
+    )
+
+    order = sorted(range(len(pending)), key=lambda i: -relevance[i])
+    kept: list[dict] = []
+    prefiltered: list[dict] = []
+    for i in order:
+        paper = pending[i]
+        if min_prior is None or relevance[i] >= min_prior:
+            kept.append(paper)
+            continue
+        prefiltered.append({
+            "paper_id": paper["paper_id"],
+            "title": paper["title"],
+            "relevance_score": int(round(float(relevance[i]))),
+            "framework_ids": frameworks[i],
+            "tool_types": tools[i],
+            "summary": "",
+            "reasoning": f"Pre-classifier prior {relevance[i]:.1f} < {min_prior:g}",
+            "status": "prefiltered",
+        })
+    return kept, prefiltered
+
+
 def _print_summary(scores: dict[str, dict]):
     """Print a distribution summary of relevance scores."""
     score_vals = [s["relevance_score"] for s in scores.values() if s.get("status") == "scored"]
@@ -399,8 +513,9 @@ def main():
     parser.add_argument(
         "--workers", "-w",
         type=int,
-        default=10,
-        help="Number of parallel LLM workers (default: 10).",
+        default=32,
+        help="Upper bound on concurrent LLM calls; the actual concurrency adapts "
+             "to rate limits (AIMD, default max: 32).",
     )
     parser.add_argument(
         "--limit", "-n",
@@ -419,6 +534,19 @@ def main():
         action="store_true",
         help="Show what would be scored without making LLM calls.",
     )
+    parser.add_argument(
+        "--prior",
+        action="store_true",
+        help="Score pending papers in order of the relevance predicted by the local "
+             "pre-classifier (output/preclassifier.npz).",
+    )
+    parser.add_argument(
+        "--min-prior",
+        type=float,
+        default=None,
+        help="With the prior, record papers predicted below this relevance as "
+             "'prefiltered' instead of scoring them with the LLM.",
+    )
     args = parser.parse_args()
 
     run_ranking(
@@ -426,6 +554,8 @@ def main():
         limit=args.limit,
         model=args.model,
         dry_run=args.dry_run,
+        prior=args.prior,
+        min_prior=args.min_prior,
     )
 
 
@@ -0,0 +1,413 @@
+"""
+Per-provider token-bucket rate limiting for every outbound HTTP call.
+
+One bucket per provider (S2 keyed / unkeyed, HuggingFace, arXiv, plus one
+bucket per other host), shared by every thread and asyncio task in the
+process:
+
+  - ``acquire()`` / ``await acquire_async()`` reserve a token under a
+    short ``threading.Lock`` and sleep *outside* it, so threads and event
+    loops can share a bucket without blocking each other.
+  - ``observe(response, elapsed)`` adapts the bucket from the response:
+      * ``Retry-After`` (seconds or HTTP date) pauses the bucket;
+      * ``X-RateLimit-Remaining`` / ``X-RateLimit-Reset`` (and the IETF
+        ``RateLimit-Remaining`` / ``RateLimit-Reset`` variants, or the
+        combined ``RateLimit: r=..;t=..`` form HF sends) set the rate to
+        what the server says is left in the current window;
+      * a bare 429 halves the rate and pauses with exponential back-off;
+      * successes recover the rate additively towards its configured value.
+  - Counters split throttled time (waiting for tokens / back-off) from
+    useful time (in successful requests).
+
+Usage:
+    from ratelimit import limited_request, limited_stream
+    r = limited_request(client, "GET", url, params=...)
+    with limited_stream(client, "GET", pdf_url) as r:
+        for chunk in r.iter_bytes(): ...
+    async with limited_stream_async(async_client, "GET", pdf_url) as r:
+        async for chunk in r.aiter_bytes(): ...
+
+    limiter = limiter_for_url(url)
+    limiter.acquire(); ...; limiter.observe(r, elapsed)
+"""
+
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Iterator, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+
+# ── Provider configuration ───────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class RateSpec:
+    """Steady-state rate (requests/s) and burst size for a bucket."""
+    rate: float
+    burst: float
+
+
+PROVIDER_RATES: dict[str, RateSpec] = {
+    "s2_keyed": RateSpec(rate=1.0, burst=1),   # 1 req/s per API key
+    "s2": RateSpec(rate=0.3, burst=1),         # shared public pool (~100 req / 5 min)
+    "hf": RateSpec(rate=3.0, burst=10),        # ~1000 req / 5 min anonymous
+    "arxiv": RateSpec(rate=1.0, burst=4),      # "4 req/s bursts, then sleep"
+    "default": RateSpec(rate=2.0, burst=4),    # any other host (PDF mirrors, ...)
+}
+
+HOST_PROVIDERS: dict[str, str] = {
+    "api.semanticscholar.org": "s2",
+    "huggingface.co": "hf",
+    "arxiv.org": "arxiv",
+    "export.arxiv.org": "arxiv",
+}
+
+# URL-prefix overrides checked before the host table -- lets a local fake
+# server (http_replay.py) stand in for several providers on one host
+URL_PREFIX_PROVIDERS: dict[str, str] = {}
+
+MIN_RATE_FRACTION = 0.05      # never adapt below 5% of the configured rate
+MAX_BACKOFF_SECONDS = 60.0
+
+
+# ── Token bucket ─────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Thread- and asyncio-safe token bucket with header-driven adaptation."""
+
+    def __init__(self, name: str, spec: RateSpec):
+        self.name = name
+        self.spec = spec
+        self._lock = threading.Lock()
+        self._rate = spec.rate
+        self._tokens = spec.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_429 = 0
+
+        # Counters
+        self.requests = 0
+        self.throttled_responses = 0
+        self.throttled_seconds = 0.0   # waiting for tokens / back-off
+        self.useful_seconds = 0.0      # inside successful requests
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    # ── Reservation ──────────────────────────────────────────────────────
+
+    def _reserve(self) -> float:
+        """Take one token (possibly going negative) and return the wait in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.spec.burst,
+                self._tokens + (now - self._updated) * self._rate,
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            wait = max(wait, self._paused_until - now)
+            self.requests += 1
+            if wait > 0:
+                self.throttled_seconds += wait
+            return wait
+
+    def try_acquire(self) -> float:
+        """
+        Take a token only if one is available now; returns 0.0 if taken,
+        else the seconds until one will be (nothing is reserved).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.spec.burst,
+                self._tokens + (now - self._updated) * self._rate,
+            )
+            self._updated = now
+            wait = max(
+                (1 - self._tokens) / self._rate if self._tokens < 1 else 0.0,
+                self._paused_until - now,
+            )
+            if wait > 0:
+                return wait
+            self._tokens -= 1
+            self.requests += 1
+            return 0.0
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    # ── Feedback from responses ──────────────────────────────────────────
+
+    def observe(self, response: Optional[httpx.Response], elapsed: float = 0.0):
+        """Adapt the bucket from a response's status and rate-limit headers."""
+        if response is None:
+            return
+        headers = response.headers
+        now = time.monotonic()
+
+        with self._lock:
+            retry_after = _parse_retry_after(headers.get("retry-after"))
+            remaining = _header_float(headers, "x-ratelimit-remaining", "ratelimit-remaining")
+            reset = _parse_reset(
+                headers.get("x-ratelimit-reset") or headers.get("ratelimit-reset")
+            )
+            if remaining is None and reset is None:
+                remaining, reset = _parse_structured_ratelimit(headers.get("ratelimit"))
+
+            if response.status_code == 429:
+                self.throttled_responses += 1
+                self._consecutive_429 += 1
+                self.throttled_seconds += elapsed
+                if retry_after is None:
+                    retry_after = min(2.0 ** self._consecutive_429, MAX_BACKOFF_SECONDS)
+                self._rate = max(self._rate / 2, self.spec.rate * MIN_RATE_FRACTION)
+            else:
+                self._consecutive_429 = 0
+                if response.status_code < 400:
+                    self.useful_seconds += elapsed
+                # Additive recovery towards the configured rate
+                self._rate = min(self.spec.rate, self._rate + self.spec.rate * 0.1)
+
+            if remaining is not None and reset is not None and reset > 0:
+                if remaining <= 0:
+                    retry_after = max(retry_after or 0.0, reset)
+                else:
+                    window_rate = remaining / reset
+                    self._rate = max(
+                        self.spec.rate * MIN_RATE_FRACTION,
+                        min(self.spec.rate, window_rate),
+                    )
+
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+                self._tokens = min(self._tokens, 0.0)
+
+    def stats(self) -> dict:
+        """Snapshot of the bucket's counters."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled_responses": self.throttled_responses,
+                "throttled_seconds": round(self.throttled_seconds, 2),
+                "useful_seconds": round(self.useful_seconds, 2),
+                "current_rate": round(self._rate, 3),
+                "configured_rate": self.spec.rate,
+            }
+
+
+# ── Header parsing ───────────────────────────────────────────────────────────
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """``Retry-After`` is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Rate-limit reset: seconds until reset, or a Unix epoch timestamp."""
+    if not value:
+        return None
+    try:
+        reset = float(value.strip())
+    except ValueError:
+        return None
+    # Large values are absolute epoch seconds rather than a delta
+    if reset > 1_000_000_000:
+        reset -= time.time()
+    return max(0.0, reset)
+
+
+def _parse_structured_ratelimit(value: Optional[str]) -> tuple[Optional[float], Optional[float]]:
+    """Parse the combined ``RateLimit: "api";r=<remaining>;t=<reset>`` header."""
+    if not value:
+        return None, None
+    remaining = reset = None
+    for part in value.split(";"):
+        key, _, val = part.strip().partition("=")
+        try:
+            if key == "r":
+                remaining = float(val)
+            elif key == "t":
+                reset = float(val)
+        except ValueError:
+            continue
+    return remaining, reset
+
+
+def _header_float(headers: httpx.Headers, *names: str) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value.strip())
+            except ValueError:
+                return None
+    return None
+
+
+# ── Registry ─────────────────────────────────────────────────────────────────
+
+_buckets: dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def provider_for_url(url: str) -> str:
+    """Map a URL to its bucket key (provider name, or the host for unknown hosts)."""
+    host = (urlparse(url).hostname or "").lower()
+    provider = next(
+        (p for prefix, p in URL_PREFIX_PROVIDERS.items() if url.startswith(prefix)),
+        None,
+    ) or HOST_PROVIDERS.get(host)
+    if provider is None and host.endswith(".arxiv.org"):
+        provider = "arxiv"
+    if provider == "s2" and os.environ.get("S2_API_KEY"):
+        provider = "s2_keyed"
+    return provider or host or "default"
+
+
+def register_url_provider(prefix: str, provider: str):
+    """Route every URL starting with *prefix* to *provider*'s bucket."""
+    URL_PREFIX_PROVIDERS[prefix] = provider
+
+
+def reset_limiters():
+    """Drop all buckets (and their counters); the next request recreates them."""
+    with _registry_lock:
+        _buckets.clear()
+
+
+def get_limiter(key: str) -> TokenBucket:
+    """Return the shared bucket for *key*, creating it on first use."""
+    with _registry_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            spec = PROVIDER_RATES.get(key, PROVIDER_RATES["default"])
+            bucket = TokenBucket(key, spec)
+            _buckets[key] = bucket
+        return bucket
+
+
+def limiter_for_url(url: str) -> TokenBucket:
+    """Shared bucket for the provider serving *url*."""
+    return get_limiter(provider_for_url(url))
+
+
+def limiter_stats() -> dict[str, dict]:
+    """Counters for every bucket used so far in this process."""
+    with _registry_lock:
+        buckets = list(_buckets.values())
+    return {b.name: b.stats() for b in buckets}
+
+
+def print_limiter_stats():
+    """Print throttled vs useful time per provider."""
+    stats = limiter_stats()
+    if not stats:
+        return
+    print("\nRate limiter:")
+    for name, s in stats.items():
+        print(
+            f"  {name:<24} {s['requests']:6d} req  "
+            f"useful {s['useful_seconds']:8.1f}s  throttled {s['throttled_seconds']:8.1f}s  "
+            f"429s {s['throttled_responses']:4d}  rate {s['current_rate']}/{s['configured_rate']} req/s"
+        )
+
+
+# ── Request helpers ──────────────────────────────────────────────────────────
+
+def limited_request(
+    client: httpx.Client,
+    method: str,
+    url: str,
+    **kwargs,
+) -> httpx.Response:
+    """``client.request`` paced by the shared bucket for *url*'s provider."""
+    limiter = limiter_for_url(url)
+    limiter.acquire()
+    start = time.monotonic()
+    r = client.request(method, url, **kwargs)
+    limiter.observe(r, time.monotonic() - start)
+    return r
+
+
+@contextlib.contextmanager
+def limited_stream(
+    client: httpx.Client,
+    method: str,
+    url: str,
+    prepaid: bool = False,
+    **kwargs,
+) -> Iterator[httpx.Response]:
+    """
+    ``client.stream`` paced like ``limited_request``. The bucket observes
+    the response as soon as its headers arrive; the body is read by the
+    caller. *prepaid*: the token was already taken (``try_acquire``).
+    """
+    limiter = limiter_for_url(url)
+    if not prepaid:
+        limiter.acquire()
+    start = time.monotonic()
+    with client.stream(method, url, **kwargs) as r:
+        limiter.observe(r, time.monotonic() - start)
+        yield r
+
+
+async def limited_request_async(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    **kwargs,
+) -> httpx.Response:
+    """Async twin of ``limited_request``."""
+    limiter = limiter_for_url(url)
+    await limiter.acquire_async()
+    start = time.monotonic()
+    r = await client.request(method, url, **kwargs)
+    limiter.observe(r, time.monotonic() - start)
+    return r
+
+
+@contextlib.asynccontextmanager
+async def limited_stream_async(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    prepaid: bool = False,
+    **kwargs,
+) -> AsyncIterator[httpx.Response]:
+    """Async twin of ``limited_stream``."""
+    limiter = limiter_for_url(url)
+    if not prepaid:
+        await limiter.acquire_async()
+    start = time.monotonic()
+    async with client.stream(method, url, **kwargs) as r:
+        limiter.observe(r, time.monotonic() - start)
+        yield r
@@ -26,6 +26,7 @@ Common flags:
     uv run research_categories.py --status           # Check status of pending batches
     uv run research_categories.py --collect          # Collect completed batch results
     uv run research_categories.py --realtime         # Use standard API (no batch discount)
+    uv run research_categories.py --realtime -w 4    # Cap concurrent realtime requests (adaptive below)
     uv run research_categories.py --write-reports    # Generate narrative reports from JSONs
     uv run research_categories.py --write-reports --tool-types  # Reports for tool types
     uv run research_categories.py --collect-reports  # Collect narrative report results
@@ -36,6 +37,7 @@ import json
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dataclasses import dataclass, field
 
@@ -45,6 +47,7 @@ from rich.console import Console
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRemainingColumn
 
+from anthropic_utils import UsageTracker, cached_system, controlled_create, get_controller
 from config import FRAMEWORK, TOOL_TYPES, CONCERNS
 from extract_sections import load_and_extract_all, ExtractedPaper, PROFILES
 
@@ -60,6 +63,7 @@ REPORT_MODEL = "claude-opus-4-6"               # Report writing (narrative quali
 MAX_TOKENS_PER_BATCH_REQUEST = 180_000   # Leave room for prompt + response in 200K context
 MAX_OUTPUT_TOKENS = 8192                  # Max response tokens per request
 MAX_PAPERS_PER_REQUEST = 60              # Safety cap
+MAX_REALTIME_WORKERS = 8                 # Cap on concurrent --realtime requests (adaptive below it)
 
 console = Console()
 
@@ -84,6 +88,119 @@ def _build_system_prompt() -> str:
     )
 
 
+# The response schemas are the same for every group, so they live in the
+# cached system prefix; the user turn only carries the group and its papers
+_ANALYSIS_FORMAT = (
+    "## Response Format\n\n"
+    "Produce a JSON object with:\n\n"
+    '{\n'
+    '  "category_id": "<str>",\n'
+    '  "category_name": "<str>",\n'
+    '  "paper_count": <int>,\n'
+    '  "executive_summary": "<2-3 paragraph overview of the state of the art>",\n'
+    '  "key_themes": [\n'
+    '    {\n'
+    '      "theme": "<theme name>",\n'
+    '      "description": "<1-2 sentences>",\n'
+    '      "paper_count": <int>,\n'
+    '      "representative_papers": ["<paper title>", ...]\n'
+    '    }\n'
+    '  ],\n'
+    '  "what_is_measured": [\n'
+    '    "<specific thing being measured/evaluated>"\n'
+    '  ],\n'
+    '  "what_is_not_measured": [\n'
+    '    "<identified gap - what SHOULD be measured but is not>"\n'
+    '  ],\n'
+    '  "cognitive_offloading_coverage": {  // ONLY include this if papers in this category\n'
+    '    "papers_addressing_it": <int>,  // actually discuss cognitive offloading, over-reliance,\n'
+    '    "summary": "<str>",             // or learning science concerns. Omit for categories\n'
+    '    "specific_findings": ["..."]    // where it is not relevant.\n'
+    '  },\n'
+    '  "methodological_trends": [\n'
+    '    "<common methodology or approach>"\n'
+    '  ],\n'
+    '  "notable_benchmarks": [\n'
+    '    {\n'
+    '      "name": "<benchmark/dataset name>",\n'
+    '      "paper_title": "<source paper>",\n'
+    '      "what_it_measures": "<brief description>",\n'
+    '      "strength": "<why it is notable>"\n'
+    '    }\n'
+    '  ],\n'
+    '  "recommendations": [\n'
+    '    "<actionable recommendation for the field>"\n'
+    '  ],\n'
+    '  "top_papers": [\n'
+    '    {\n'
+    '      "title": "<paper title>",\n'
+    '      "why_important": "<1 sentence>"\n'
+    '    }\n'
+    '  ]\n'
+    '}'
+)
+
+_CONCERN_FORMAT = (
+    "## Response Format\n\n"
+    "Produce a JSON object with:\n\n"
+    '{\n'
+    '  "concern_id": "<str>",\n'
+    '  "concern_name": "<str>",\n'
+    '  "paper_count": <int>,\n'
+    '  "papers_directly_addressing": <int>,\n'
+    '  "executive_summary": "<2-3 paragraph overview of what research says about this risk>",\n'
+    '  "key_findings": [\n'
+    '    {\n'
+    '      "finding": "<clear statement of finding>",\n'
+    '      "evidence_type": "<empirical|theoretical|review|opinion>",\n'
+    '      "paper_count": <int>,\n'
+    '      "representative_papers": ["<paper title>", ...]\n'
+    '    }\n'
+    '  ],\n'
+    '  "evidence_for_risk": [\n'
+    '    "<specific evidence that this risk is real and significant>"\n'
+    '  ],\n'
+    '  "evidence_against_or_mitigating": [\n'
+    '    "<evidence that the risk is overstated, or effective mitigations exist>"\n'
+    '  ],\n'
+    '  "what_is_measured": [\n'
+    '    "<specific metrics or measures used to study this concern>"\n'
+    '  ],\n'
+    '  "what_is_not_measured": [\n'
+    '    "<gaps — what SHOULD be studied about this concern but is not>"\n'
+    '  ],\n'
+    '  "context_factors": [\n'
+    '    "<factors that influence whether the risk manifests — age, subject, tool type, etc.>"\n'
+    '  ],\n'
+    '  "notable_studies": [\n'
+    '    {\n'
+    '      "title": "<paper title>",\n'
+    '      "design": "<brief method description>",\n'
+    '      "key_result": "<main finding relevant to this concern>",\n'
+    '      "sample": "<who was studied — age, context, N>"\n'
+    '    }\n'
+    '  ],\n'
+    '  "implications_for_lmics": "<how this concern specifically manifests in low- and middle-income country contexts>",\n'
+    '  "recommendations": [\n'
+    '    "<actionable recommendation for mitigating this risk>"\n'
+    '  ],\n'
+    '  "top_papers": [\n'
+    '    {\n'
+    '      "title": "<paper title>",\n'
+    '      "why_important": "<1 sentence>"\n'
+    '    }\n'
+    '  ]\n'
+    '}'
+)
+
+
+def _analysis_system(mode: str = "framework") -> list[dict]:
+    """Cached system blocks (analyst role + response schema) for a synthesis request."""
+    if mode == "concern":
+        return cached_system(_build_concern_system_prompt(), _CONCERN_FORMAT)
+    return cached_system(_build_system_prompt(), _ANALYSIS_FORMAT)
+
+
 def _build_user_prompt(
     category_id: str,
     category_info: dict,
@@ -107,52 +224,8 @@ def _build_user_prompt(
         f"{combined}\n\n"
         f"## Analysis Instructions\n\n"
         f"Synthesize ALL {len(papers)} papers above into a structured SoTA analysis for "
-        f"category '{category_id} - {category_info['name']}'. Produce a JSON object with:\n\n"
-        '{\n'
-        '  "category_id": "<str>",\n'
-        '  "category_name": "<str>",\n'
-        '  "paper_count": <int>,\n'
-        '  "executive_summary": "<2-3 paragraph overview of the state of the art>",\n'
-        '  "key_themes": [\n'
-        '    {\n'
-        '      "theme": "<theme name>",\n'
-        '      "description": "<1-2 sentences>",\n'
-        '      "paper_count": <int>,\n'
-        '      "representative_papers": ["<paper title>", ...]\n'
-        '    }\n'
-        '  ],\n'
-        '  "what_is_measured": [\n'
-        '    "<specific thing being measured/evaluated>"\n'
-        '  ],\n'
-        '  "what_is_not_measured": [\n'
-        '    "<identified gap - what SHOULD be measured but is not>"\n'
-        '  ],\n'
-        '  "cognitive_offloading_coverage": {  // ONLY include this if papers in this category\n'
-        '    "papers_addressing_it": <int>,  // actually discuss cognitive offloading, over-reliance,\n'
-        '    "summary": "<str>",             // or learning science concerns. Omit for categories\n'
-        '    "specific_findings": ["..."]    // where it is not relevant.\n'
-        '  },\n'
-        '  "methodological_trends": [\n'
-        '    "<common methodology or approach>"\n'
-        '  ],\n'
-        '  "notable_benchmarks": [\n'
-        '    {\n'
-        '      "name": "<benchmark/dataset name>",\n'
-        '      "paper_title": "<source paper>",\n'
-        '      "what_it_measures": "<brief description>",\n'
-        '      "strength": "<why it is notable>"\n'
-        '    }\n'
-        '  ],\n'
-        '  "recommendations": [\n'
-        '    "<actionable recommendation for the field>"\n'
-        '  ],\n'
-        '  "top_papers": [\n'
-        '    {\n'
-        '      "title": "<paper title>",\n'
-        '      "why_important": "<1 sentence>"\n'
-        '    }\n'
-        '  ]\n'
-        '}'
+        f"category '{category_id} - {category_info['name']}', as the JSON object described "
+        f"in the system prompt."
     )
 
 
@@ -197,56 +270,8 @@ def _build_concern_user_prompt(
         f"These {len(papers)} papers were found by keyword-matching for terms "
         f"related to '{concern_info['name']}'. Some may address the concern "
         f"directly; others may mention it tangentially. Synthesise what the "
-        f"literature tells us about this concern.\n\n"
-        f"Produce a JSON object with:\n\n"
-        '{\n'
-        '  "concern_id": "<str>",\n'
-        '  "concern_name": "<str>",\n'
-        '  "paper_count": <int>,\n'
-        '  "papers_directly_addressing": <int>,\n'
-        '  "executive_summary": "<2-3 paragraph overview of what research says about this risk>",\n'
-        '  "key_findings": [\n'
-        '    {\n'
-        '      "finding": "<clear statement of finding>",\n'
-        '      "evidence_type": "<empirical|theoretical|review|opinion>",\n'
-        '      "paper_count": <int>,\n'
-        '      "representative_papers": ["<paper title>", ...]\n'
-        '    }\n'
-        '  ],\n'
-        '  "evidence_for_risk": [\n'
-        '    "<specific evidence that this risk is real and significant>"\n'
-        '  ],\n'
-        '  "evidence_against_or_mitigating": [\n'
-        '    "<evidence that the risk is overstated, or effective mitigations exist>"\n'
-        '  ],\n'
-        '  "what_is_measured": [\n'
-        '    "<specific metrics or measures used to study this concern>"\n'
-        '  ],\n'
-        '  "what_is_not_measured": [\n'
-        '    "<gaps — what SHOULD be studied about this concern but is not>"\n'
-        '  ],\n'
-        '  "context_factors": [\n'
-        '    "<factors that influence whether the risk manifests — age, subject, tool type, etc.>"\n'
-        '  ],\n'
-        '  "notable_studies": [\n'
-        '    {\n'
-        '      "title": "<paper title>",\n'
-        '      "design": "<brief method description>",\n'
-        '      "key_result": "<main finding relevant to this concern>",\n'
-        '      "sample": "<who was studied — age, context, N>"\n'
-        '    }\n'
-        '  ],\n'
-        '  "implications_for_lmics": "<how this concern specifically manifests in low- and middle-income country contexts>",\n'
-        '  "recommendations": [\n'
-        '    "<actionable recommendation for mitigating this risk>"\n'
-        '  ],\n'
-        '  "top_papers": [\n'
-        '    {\n'
-        '      "title": "<paper title>",\n'
-        '      "why_important": "<1 sentence>"\n'
-        '    }\n'
-        '  ]\n'
-        '}'
+        f"literature tells us about this concern, as the JSON object described "
+        f"in the system prompt."
     )
 
 
@@ -288,13 +313,12 @@ class BatchRequest:
     def to_api_request(self) -> dict:
         """Convert to the Anthropic batch API request format."""
         group_info = _resolve_group_info(self.category_id, self.mode)
+        system = _analysis_system(self.mode)
         if self.mode == "concern":
-            system = _build_concern_system_prompt()
             user_content = _build_concern_user_prompt(
                 self.category_id, group_info, self.papers
             )
         else:
-            system = _build_system_prompt()
             user_content = _build_user_prompt(
                 self.category_id, group_info, self.papers
             )
@@ -835,13 +859,11 @@ def _merge_sub_batch_analyses(data: dict | list) -> dict:
     return merged
 
 
-def _build_report_prompt(analysis: dict, style_guide: str) -> str:
-    """Build the prompt to convert a JSON analysis into a narrative report."""
-    analysis_json = json.dumps(analysis, indent=2, ensure_ascii=False)
-
+def _build_report_instructions(style_guide: str) -> str:
+    """Report-writing brief (task, style guide, structure); the same for every group."""
     return (
         "## Task\n\n"
-        "Convert the following structured JSON research analysis into a polished, "
+        "Convert the structured JSON research analysis in the user message into a polished, "
         "narrative research report. This report is part of a series covering how "
         "AI and LLMs are being benchmarked in K-12 education (ages 5-18) across "
         "low- and middle-income countries (LMICs) and globally.\n\n"
@@ -915,17 +937,22 @@ def _build_report_prompt(analysis: dict, style_guide: str) -> str:
         "- Include specific numbers, percentages, and paper counts\n"
         "- The total report should be approximately 1500-2500 words\n"
         "- Write in Markdown format\n"
-        "- Do NOT wrap the output in code fences\n\n"
-        "## Source Analysis Data\n\n"
-        f"{analysis_json}"
+        "- Do NOT wrap the output in code fences"
     )
 
 
+def _build_report_prompt(analysis: dict) -> str:
+    """Build the per-group user prompt: the JSON analysis to turn into a report."""
+    analysis_json = json.dumps(analysis, indent=2, ensure_ascii=False)
+    return f"## Source Analysis Data\n\n{analysis_json}"
+
+
 def write_reports(
     target_category: str | None = None,
     dry_run: bool = False,
     realtime: bool = False,
     mode: str = "framework",
+    max_workers: int = MAX_REALTIME_WORKERS,
 ):
     """
     Generate narrative reports from collected analysis JSONs.
@@ -953,7 +980,9 @@ def write_reports(
         console.print(f"[yellow]No {file_prefix} analysis JSON files found. Run --collect first.[/yellow]")
         return
 
-    # Build requests
+    # Build requests (the brief and style guide are a cached prefix shared by all groups)
+    system = cached_system(REPORT_SYSTEM_PROMPT, _build_report_instructions(style_guide))
+    system_chars = sum(len(b["text"]) for b in system)
     report_requests: list[dict] = []
     for json_path in json_files:
         group_id = json_path.stem.replace(f"{file_prefix}_", "").replace("_analysis", "")
@@ -969,13 +998,14 @@ def write_reports(
         if not merged:
             continue
 
-        prompt = _build_report_prompt(merged, style_guide)
-        token_est = len(prompt) // 4
+        prompt = _build_report_prompt(merged)
+        token_est = (system_chars + len(prompt)) // 4
 
         report_requests.append({
             "cat_id": group_id,
             "cat_name": merged.get("category_name", group_id),
             "paper_count": merged.get("paper_count", 0),
+            "system": system,
             "prompt": prompt,
             "tokens": token_est,
             "file_prefix": file_prefix,
@@ -1009,19 +1039,33 @@ def write_reports(
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
     if realtime:
-        _write_reports_realtime(report_requests)
+        _write_reports_realtime(report_requests, max_workers=max_workers)
     else:
         _write_reports_batch(report_requests, mode=mode)
 
 
-def _write_reports_realtime(report_requests: list[dict]):
-    """Write reports using the standard Messages API (immediate results)."""
+def _write_reports_realtime(report_requests: list[dict], max_workers: int = MAX_REALTIME_WORKERS):
+    """Write reports using the standard Messages API (immediate results, parallel)."""
     api_key = os.environ.get("ANTHROPIC_API_KEY", "")
     if not api_key:
         console.print("[red]ANTHROPIC_API_KEY not set.[/red]")
         return
 
-    client = anthropic.Anthropic(api_key=api_key)
+    # max_retries=0: 429 / 529 go to the shared concurrency controller
+    client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+    controller = get_controller("anthropic", maximum=max_workers)
+    usage = UsageTracker("research:reports", REPORT_MODEL)
+
+    def _write(req: dict):
+        resp = controlled_create(
+            client, controller,
+            model=REPORT_MODEL,
+            max_tokens=MAX_OUTPUT_TOKENS,
+            system=req["system"],
+            messages=[{"role": "user", "content": req["prompt"]}],
+        )
+        usage.record(resp.usage)
+        return resp.content[0].text.strip()
 
     with Progress(
         SpinnerColumn(),
@@ -1033,34 +1077,32 @@ def _write_reports_realtime(report_requests: list[dict]):
     ) as progress:
         task = progress.add_task("Writing reports", total=len(report_requests))
 
-        for req in report_requests:
-            progress.update(task, description=f"Writing {req['cat_id']} - {req['cat_name']}")
-
-            try:
-                resp = client.messages.create(
-                    model=REPORT_MODEL,
-                    max_tokens=MAX_OUTPUT_TOKENS,
-                    system=REPORT_SYSTEM_PROMPT,
-                    messages=[{"role": "user", "content": req["prompt"]}],
-                )
-
-                report_text = resp.content[0].text.strip()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_write, req): req for req in report_requests}
+            for future in as_completed(futures):
+                req = futures[future]
+                progress.update(task, description=f"Wrote {req['cat_id']} - {req['cat_name']}")
+                try:
+                    report_text = future.result()
 
-                # Save as Markdown
-                fp = req.get("file_prefix", "category")
-                md_path = REPORTS_DIR / f"{fp}_{req['cat_id']}_report.md"
-                with open(md_path, "w", encoding="utf-8") as f:
-                    f.write(report_text)
+                    # Save as Markdown
+                    fp = req.get("file_prefix", "category")
+                    md_path = REPORTS_DIR / f"{fp}_{req['cat_id']}_report.md"
+                    with open(md_path, "w", encoding="utf-8") as f:
+                        f.write(report_text)
 
-                console.print(f"  [green]OK[/green] {req['cat_id']} -> {md_path.name} "
-                              f"({len(report_text):,} chars)")
+                    console.print(f"  [green]OK[/green] {req['cat_id']} -> {md_path.name} "
+                                  f"({len(report_text):,} chars)")
 
-            except Exception as exc:
-                console.print(f"  [red]Error[/red] {req['cat_id']}: {exc}")
+                except Exception as exc:
+                    console.print(f"  [red]Error[/red] {req['cat_id']}: {exc}")
 
-            progress.advance(task)
+                progress.advance(task)
 
     console.print(f"\n[bold green]Done! Reports in {REPORTS_DIR}/[/bold green]")
+    console.print(f"  Usage: {usage.summary()}")
+    console.print(f"  Concurrency: {controller.summary()}")
+    usage.save()
 
 
 def _write_reports_batch(report_requests: list[dict], mode: str = "framework"):
@@ -1084,7 +1126,7 @@ def _write_reports_batch(report_requests: list[dict], mode: str = "framework"):
             "params": {
                 "model": REPORT_MODEL,
                 "max_tokens": MAX_OUTPUT_TOKENS,
-                "system": REPORT_SYSTEM_PROMPT,
+                "system": req["system"],
                 "messages": [{"role": "user", "content": req["prompt"]}],
             },
         })
@@ -1131,6 +1173,7 @@ def collect_reports():
 
     client = anthropic.Anthropic(api_key=api_key)
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    usage = UsageTracker("research:collect-reports", REPORT_MODEL)
     collected = 0
 
     for state in states:
@@ -1167,6 +1210,7 @@ def collect_reports():
 
             if result.result.type == "succeeded":
                 msg = result.result.message
+                usage.record(getattr(msg, "usage", None))
                 report_text = ""
                 for block in msg.content:
                     if hasattr(block, "text"):
@@ -1199,6 +1243,8 @@ def collect_reports():
     save_batch_states(states)
     if collected:
         console.print(f"\n[bold green]Collected {collected} report batch(es) -> {REPORTS_DIR}/[/bold green]")
+        console.print(f"  Usage: {usage.summary()}")
+        usage.save()
     else:
         console.print("[yellow]No report batches ready to collect.[/yellow]")
 
@@ -1408,6 +1454,7 @@ def collect_results():
 
     client = anthropic.Anthropic(api_key=api_key)
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    usage = UsageTracker("research:collect", MODEL)
 
     collected_count = 0
     for state in states:
@@ -1443,6 +1490,7 @@ def collect_results():
             if result.result.type == "succeeded":
                 # Extract text response
                 msg = result.result.message
+                usage.record(getattr(msg, "usage", None))
                 raw_text = ""
                 for block in msg.content:
                     if hasattr(block, "text"):
@@ -1504,6 +1552,9 @@ def collect_results():
 
     save_batch_states(states)
     console.print(f"\n[bold]Collected {collected_count} batches.[/bold]")
+    if usage.requests:
+        console.print(f"  Usage: {usage.summary()}")
+        usage.save()
 
 
 # ── Realtime mode (standard API, no batch discount) ──────────────────────────
@@ -1511,10 +1562,13 @@ def collect_results():
 def run_realtime(
     batch_requests: list[BatchRequest],
     dry_run: bool = False,
+    max_workers: int = MAX_REALTIME_WORKERS,
 ):
     """
     Process requests using the standard Messages API (no batch discount,
     but results are immediate). Useful for testing or urgent analysis.
+    Requests run in parallel, at most *max_workers* in flight under the
+    shared AIMD concurrency controller.
     """
     if not batch_requests:
         console.print("[yellow]No requests to process.[/yellow]")
@@ -1532,8 +1586,23 @@ def run_realtime(
         console.print("[red]ANTHROPIC_API_KEY not set.[/red]")
         return
 
-    client = anthropic.Anthropic(api_key=api_key)
+    # max_retries=0: 429 / 529 go to the shared concurrency controller
+    client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+    controller = get_controller("anthropic", maximum=max_workers)
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    usage = UsageTracker("research:realtime", MODEL)
+
+    def _analyse(req: BatchRequest) -> str:
+        params = req.to_api_request()["params"]
+        resp = controlled_create(
+            client, controller,
+            model=params["model"],
+            max_tokens=params["max_tokens"],
+            system=params["system"],
+            messages=params["messages"],
+        )
+        usage.record(resp.usage)
+        return resp.content[0].text.strip()
 
     with Progress(
         SpinnerColumn(),
@@ -1545,45 +1614,41 @@ def run_realtime(
     ) as progress:
         task = progress.add_task("Processing categories", total=len(batch_requests))
 
-        for req in batch_requests:
-            progress.update(task, description=f"Processing {req.custom_id}")
-
-            api_req = req.to_api_request()
-            params = api_req["params"]
-
-            try:
-                resp = client.messages.create(
-                    model=params["model"],
-                    max_tokens=params["max_tokens"],
-                    system=params["system"],
-                    messages=params["messages"],
-                )
-
-                raw = resp.content[0].text.strip()
-                if raw.startswith("```"):
-                    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-                    raw = re.sub(r"\s*```$", "", raw)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_analyse, req): req for req in batch_requests}
+            for future in as_completed(futures):
+                req = futures[future]
+                progress.update(task, description=f"Processed {req.custom_id}")
+                raw = ""
+                try:
+                    raw = future.result()
+                    if raw.startswith("```"):
+                        raw = re.sub(r"^```(?:json)?\s*", "", raw)
+                        raw = re.sub(r"\s*```$", "", raw)
 
-                result = json.loads(raw)
+                    result = json.loads(raw)
 
-                # Save result (JSON + Markdown)
-                fp = "concern" if req.mode == "concern" else ("tool_type" if req.mode == "tool_type" else "category")
-                json_path, md_path = save_analysis(req.category_id, result, OUTPUT_DIR, file_prefix=fp)
-                console.print(f"  [green]OK[/green] {req.custom_id} -> {json_path.name}, {md_path.name}")
+                    # Save result (JSON + Markdown)
+                    fp = "concern" if req.mode == "concern" else ("tool_type" if req.mode == "tool_type" else "category")
+                    json_path, md_path = save_analysis(req.category_id, result, OUTPUT_DIR, file_prefix=fp)
+                    console.print(f"  [green]OK[/green] {req.custom_id} -> {json_path.name}, {md_path.name}")
 
-            except json.JSONDecodeError:
-                console.print(f"  [yellow]JSON parse error[/yellow] for {req.custom_id}")
-                # Save raw text for debugging
-                err_path = OUTPUT_DIR / f"error_{req.custom_id}.txt"
-                with open(err_path, "w", encoding="utf-8") as f:
-                    f.write(raw)
+                except json.JSONDecodeError:
+                    console.print(f"  [yellow]JSON parse error[/yellow] for {req.custom_id}")
+                    # Save raw text for debugging
+                    err_path = OUTPUT_DIR / f"error_{req.custom_id}.txt"
+                    with open(err_path, "w", encoding="utf-8") as f:
+                        f.write(raw)
 
-            except Exception as exc:
-                console.print(f"  [red]Error[/red] {req.custom_id}: {exc}")
+                except Exception as exc:
+                    console.print(f"  [red]Error[/red] {req.custom_id}: {exc}")
 
-            progress.advance(task)
+                progress.advance(task)
 
     console.print(f"\n[bold green]Done! Results in {OUTPUT_DIR}/[/bold green]")
+    console.print(f"  Usage: {usage.summary()}")
+    console.print(f"  Concurrency: {controller.summary()}")
+    usage.save()
 
 
 # ── CLI ───────────────────────────────────────────────────────────────────────
@@ -1636,6 +1701,13 @@ def main():
         action="store_true",
         help="Use standard API instead of batch API (immediate results, full price).",
     )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=MAX_REALTIME_WORKERS,
+        help=f"Upper bound on concurrent --realtime requests; the actual concurrency adapts "
+             f"to rate limits (AIMD, default max: {MAX_REALTIME_WORKERS}).",
+    )
     parser.add_argument(
         "--regenerate-md",
         action="store_true",
@@ -1682,6 +1754,7 @@ def main():
             dry_run=args.dry_run,
             realtime=args.realtime,
             mode=mode,
+            max_workers=args.workers,
         )
         return
 
@@ -1733,7 +1806,7 @@ def main():
         return
 
     if args.realtime:
-        run_realtime(batch_requests, dry_run=args.dry_run)
+        run_realtime(batch_requests, dry_run=args.dry_run, max_workers=args.workers)
     else:
         submit_batches(batch_requests, dry_run=args.dry_run)
 
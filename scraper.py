@@ -4,18 +4,31 @@ Search for education-related benchmarks across multiple sources:
   1. HuggingFace REST API  (datasets + daily papers)
   2. Semantic Scholar API  (comprehensive academic paper search, 200M+ papers)
      - Bulk search  (GET /paper/search/bulk) -- up to 1000 results per request
-     - Batch detail (POST /paper/batch)      -- full metadata for every hit
+     - Batch detail (POST /paper/batch)      -- full metadata for every hit,
+       fetched by a background ``DetailFetcher`` while searches continue
 
 Both APIs return structured JSON and support pagination.
 """
 
 import json
 import os
+import queue
 import re
+import threading
 import time
 import httpx
 from dataclasses import dataclass, field, asdict
-from typing import Optional
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+from details_store import DETAILS_DB, DetailsStore
+from http_cache import get_response_cache, print_cache_stats
+from identity import IdentityIndex, s2_batch_id
+from ratelimit import limited_request, print_limiter_stats
+
+if TYPE_CHECKING:
+    from discovery_log import DiscoveryLog
+    from query_planner import QueryYield
 
 
 @dataclass
@@ -35,6 +48,19 @@ class BenchmarkEntry:
         return asdict(self)
 
 
+@dataclass
+class PageCursor:
+    """Where a paginated search stands: pages done, next cursor, results so far."""
+    page: int = 0
+    cursor: Any = None     # S2 continuation token / HF offset; None = finished
+    fetched: int = 0
+    exhausted: bool = False   # the walk ended on its own (not cut short by max_results)
+
+
+# Called after every page with (page_entries, cursor_after_page)
+PageCallback = Callable[[list[BenchmarkEntry], PageCursor], None]
+
+
 BASE = "https://huggingface.co"
 API_BASE = "https://huggingface.co/api"
 HEADERS = {
@@ -49,19 +75,34 @@ def _api_get_json(
     client: httpx.Client,
     params: dict | None = None,
 ) -> Optional[list | dict]:
-    """GET a JSON API endpoint with retry + back-off."""
+    """
+    GET a JSON API endpoint, paced by the shared per-provider rate limiter.
+
+    Served from the on-disk response cache (http_cache.py) when it is
+    enabled; stale entries are revalidated with ETag / Last-Modified.
+    """
+    cache = get_response_cache()
+    lookup = cache.lookup("GET", url, params) if cache else None
+    if lookup and lookup.fresh:
+        return lookup.data
+    headers = {**HEADERS, **(lookup.validators() if lookup else {})}
+
     for attempt in range(3):
         try:
-            r = client.get(
-                url, headers=HEADERS, params=params,
+            r = limited_request(
+                client, "GET", url, headers=headers, params=params,
                 follow_redirects=True, timeout=30,
             )
+            if r.status_code == 304 and lookup and lookup.entry:
+                return cache.revalidated(lookup)
             if r.status_code == 200:
-                return r.json()
+                data = r.json()
+                if lookup:
+                    cache.store(lookup, r, data)
+                return data
             if r.status_code == 429:
-                wait = 2 ** (attempt + 1)
-                print(f"  Rate-limited, waiting {wait}s ...")
-                time.sleep(wait)
+                # The limiter has already paused the bucket (Retry-After / back-off)
+                print(f"  Rate-limited (attempt {attempt + 1}/3), backing off ...")
                 continue
             print(f"  HTTP {r.status_code} for {url}")
             return None
@@ -76,16 +117,14 @@ def _get_html(url: str, client: httpx.Client, params: dict | None = None) -> Opt
     html_headers = {**HEADERS, "Accept": "text/html,application/xhtml+xml"}
     for attempt in range(3):
         try:
-            r = client.get(
-                url, headers=html_headers, params=params,
+            r = limited_request(
+                client, "GET", url, headers=html_headers, params=params,
                 follow_redirects=True, timeout=30,
             )
             if r.status_code == 200:
                 return r.text
             if r.status_code == 429:
-                wait = 2 ** (attempt + 1)
-                print(f"  Rate-limited, waiting {wait}s ...")
-                time.sleep(wait)
+                print(f"  Rate-limited (attempt {attempt + 1}/3), backing off ...")
                 continue
             print(f"  HTTP {r.status_code} for {url}")
             return None
@@ -97,97 +136,151 @@ def _get_html(url: str, client: httpx.Client, params: dict | None = None) -> Opt
 
 # ── Dataset search (REST API, paginated) ─────────────────────────────────────
 
+def _parse_hf_dataset(ds: dict, query: str) -> Optional[BenchmarkEntry]:
+    """Convert one ``GET /api/datasets`` item into a BenchmarkEntry."""
+    ds_id = ds.get("id", "")
+    if not ds_id:
+        return None
+
+    # ── Extract description ──────────────────────────────────────────────
+    description = ""
+    card_data = ds.get("cardData") or {}
+    if isinstance(card_data, dict):
+        description = (
+            card_data.get("dataset_summary", "")
+            or card_data.get("description", "")
+        )
+    if not description:
+        description = ds.get("description", "")
+
+    # Strip any HTML tags that snuck in
+    if description and "<" in description:
+        description = re.sub(r"<[^>]+>", " ", description)
+        description = re.sub(r"\s+", " ", description).strip()
+
+    # ── Extract useful tags ──────────────────────────────────────────────
+    tags_raw = ds.get("tags") or []
+    tags_clean = [
+        t.split(":")[-1]
+        for t in tags_raw
+        if ":" in t
+        and t.split(":")[0] in (
+            "task_categories", "task_ids", "language",
+            "size_categories", "license",
+        )
+    ]
+
+    last_modified = ds.get("lastModified", "")
+    date_str = last_modified[:10] if last_modified else ""
+
+    return BenchmarkEntry(
+        name=ds_id,
+        source_url=f"{BASE}/datasets/{ds_id}",
+        source_type="dataset",
+        description=(description or "")[:500],
+        date=date_str,
+        tags=[query] + tags_clean,
+    )
+
+
+def _hf_dataset_params(query: str, limit: int, offset: int, since: str = "") -> dict:
+    """Query params for one ``GET /api/datasets`` page (newest-first when *since* is set)."""
+    return {
+        "search": query,
+        "sort": "lastModified" if since else "likes",
+        "direction": "-1",
+        "limit": limit,
+        "offset": offset,
+        "full": "true",      # include cardData with descriptions
+    }
+
+
+def _keep_since(entries: list[BenchmarkEntry], since: str) -> tuple[list[BenchmarkEntry], bool]:
+    """
+    Filter a newest-first page to entries dated on/after *since*.
+
+    Returns (kept, reached_older) -- once an older entry shows up, later
+    pages can only be older still, so pagination can stop.
+    """
+    if not since:
+        return entries, False
+    kept = [e for e in entries if e.date >= since]
+    return kept, len(kept) < len(entries)
+
+
 def search_datasets(
     query: str,
     client: httpx.Client,
     max_results: int = 200,
-    delay: float = 0.5,
+    since: str = "",
+    resume_from: Optional[PageCursor] = None,
+    on_page: Optional[PageCallback] = None,
 ) -> list[BenchmarkEntry]:
     """
     Search HuggingFace datasets via ``GET /api/datasets``.
 
     Paginates through results using ``limit`` / ``offset`` until either
     *max_results* are collected or no more results are returned.
+
+    With *since* (``YYYY-MM-DD``), results are sorted by ``lastModified``
+    and pagination stops at the first dataset older than *since*.
+    *resume_from* continues from a saved offset; *on_page* is called after
+    every page (see ``PageCursor``).
     """
     PAGE_SIZE = 100  # HF API maximum
     results: list[BenchmarkEntry] = []
-    offset = 0
+    offset = resume_from.cursor if resume_from else 0
+    page_no = resume_from.page if resume_from else 0
 
     while offset < max_results:
         batch_limit = min(PAGE_SIZE, max_results - offset)
         data = _api_get_json(
             f"{API_BASE}/datasets",
             client,
-            params={
-                "search": query,
-                "sort": "likes",
-                "direction": "-1",
-                "limit": batch_limit,
-                "offset": offset,
-                "full": "true",      # include cardData with descriptions
-            },
+            params=_hf_dataset_params(query, batch_limit, offset, since),
         )
 
-        if not data or not isinstance(data, list):
+        if not isinstance(data, list):   # an empty list is the end of the results
             break
 
-        for ds in data:
-            ds_id = ds.get("id", "")
-            if not ds_id:
-                continue
-
-            # ── Extract description ──────────────────────────────────────
-            description = ""
-            card_data = ds.get("cardData") or {}
-            if isinstance(card_data, dict):
-                description = (
-                    card_data.get("dataset_summary", "")
-                    or card_data.get("description", "")
-                )
-            if not description:
-                description = ds.get("description", "")
-
-            # Strip any HTML tags that snuck in
-            if description and "<" in description:
-                description = re.sub(r"<[^>]+>", " ", description)
-                description = re.sub(r"\s+", " ", description).strip()
-
-            # ── Extract useful tags ──────────────────────────────────────
-            tags_raw = ds.get("tags") or []
-            tags_clean = [
-                t.split(":")[-1]
-                for t in tags_raw
-                if ":" in t
-                and t.split(":")[0] in (
-                    "task_categories", "task_ids", "language",
-                    "size_categories", "license",
-                )
-            ]
-
-            last_modified = ds.get("lastModified", "")
-            date_str = last_modified[:10] if last_modified else ""
-
-            results.append(BenchmarkEntry(
-                name=ds_id,
-                source_url=f"{BASE}/datasets/{ds_id}",
-                source_type="dataset",
-                description=(description or "")[:500],
-                date=date_str,
-                tags=[query] + tags_clean,
-            ))
+        page = [e for e in (_parse_hf_dataset(ds, query) for ds in data) if e]
+        page, reached_older = _keep_since(page, since)
+        results.extend(page)
+        page_no += 1
 
         # If the API returned fewer items than we asked for → last page
-        if len(data) < batch_limit:
-            break
-
+        last = len(data) < batch_limit or reached_older
         offset += len(data)
-        time.sleep(delay)  # be polite between pages
+        if on_page:
+            on_page(page, PageCursor(page_no, None if last else offset, offset, exhausted=last))
+        if last:
+            break
 
     return results
 
 
 # ── Paper search (REST API + HTML fallback) ──────────────────────────────────
 
+def _parse_hf_paper(paper: dict, tags: list[str]) -> Optional[BenchmarkEntry]:
+    """Convert one HF paper object (daily papers / paper search) into a BenchmarkEntry."""
+    paper_id = paper.get("id", "")
+    title = paper.get("title", "")
+    summary = paper.get("summary", "")
+    published = paper.get("publishedAt", "")
+    if not paper_id or not title:
+        return None
+
+    date_str = published[:10] if published else ""
+    return BenchmarkEntry(
+        name=title,
+        source_url=f"{BASE}/papers/{paper_id}",
+        source_type="paper",
+        description=summary[:500],
+        date=date_str,
+        tags=list(tags),
+    )
+
+
 def fetch_daily_papers(client: httpx.Client) -> list[BenchmarkEntry]:
     """Fetch trending / daily papers from ``GET /api/daily_papers`` (JSON)."""
     data = _api_get_json(f"{API_BASE}/daily_papers", client)
@@ -196,23 +289,9 @@ def fetch_daily_papers(client: httpx.Client) -> list[BenchmarkEntry]:
 
     results: list[BenchmarkEntry] = []
     for item in data:
-        paper = item.get("paper") or {}
-        paper_id = paper.get("id", "")
-        title = paper.get("title", "")
-        summary = paper.get("summary", "")
-        published = paper.get("publishedAt", "")
-        if not paper_id or not title:
-            continue
-
-        date_str = published[:10] if published else ""
-        results.append(BenchmarkEntry(
-            name=title,
-            source_url=f"{BASE}/papers/{paper_id}",
-            source_type="paper",
-            description=summary[:500],
-            date=date_str,
-            tags=["daily_papers"],
-        ))
+        entry = _parse_hf_paper(item.get("paper") or {}, ["daily_papers"])
+        if entry:
+            results.append(entry)
 
     return results
 
@@ -238,35 +317,56 @@ def search_papers(
         results: list[BenchmarkEntry] = []
         for item in data:
             paper = item if "id" in item else item.get("paper", {})
-            paper_id = paper.get("id", "")
-            title = paper.get("title", "")
-            summary = paper.get("summary", "")
-            published = paper.get("publishedAt", "")
-            if not paper_id or not title:
-                continue
-            date_str = published[:10] if published else ""
-            results.append(BenchmarkEntry(
-                name=title,
-                source_url=f"{BASE}/papers/{paper_id}",
-                source_type="paper",
-                description=summary[:500],
-                date=date_str,
-                tags=[query],
-            ))
+            entry = _parse_hf_paper(paper, [query])
+            if entry:
+                results.append(entry)
         return results
 
     # ── Attempt 2: paginated HTML full-text search ───────────────────────
     return _search_papers_html(query, client, max_results)
 
 
+def _parse_papers_html(html: str, query: str) -> list[BenchmarkEntry]:
+    """Parse one page of ``/search/full-text?type=paper`` results."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    results: list[BenchmarkEntry] = []
+
+    for article in soup.select("article, div.paper-card, [class*='paper']"):
+        link_el = article.select_one("a[href*='/papers/']")
+        if not link_el:
+            continue
+
+        href = link_el.get("href", "")
+        title = link_el.get_text(strip=True)
+        if not title or not href:
+            continue
+
+        desc_el = article.select_one("p, .description, [class*='desc']")
+        desc = desc_el.get_text(strip=True) if desc_el else ""
+        date_el = article.select_one("time, [class*='date']")
+        date = date_el.get_text(strip=True) if date_el else ""
+
+        full_url = href if href.startswith("http") else f"{BASE}{href}"
+        results.append(BenchmarkEntry(
+            name=title,
+            source_url=full_url,
+            source_type="paper",
+            description=desc[:500],
+            date=date,
+            tags=[query],
+        ))
+
+    return results
+
+
 def _search_papers_html(
     query: str,
     client: httpx.Client,
     max_results: int = 100,
 ) -> list[BenchmarkEntry]:
     """Fallback: scrape ``/search/full-text?type=paper`` with pagination."""
-    from bs4 import BeautifulSoup
-
     results: list[BenchmarkEntry] = []
     page = 0
 
@@ -279,40 +379,10 @@ def _search_papers_html(
         if not html:
             break
 
-        soup = BeautifulSoup(html, "html.parser")
-        found_any = False
-
-        for article in soup.select("article, div.paper-card, [class*='paper']"):
-            link_el = article.select_one("a[href*='/papers/']")
-            if not link_el:
-                continue
-
-            href = link_el.get("href", "")
-            title = link_el.get_text(strip=True)
-            if not title or not href:
-                continue
-
-            found_any = True
-            desc_el = article.select_one("p, .description, [class*='desc']")
-            desc = desc_el.get_text(strip=True) if desc_el else ""
-            date_el = article.select_one("time, [class*='date']")
-            date = date_el.get_text(strip=True) if date_el else ""
-
-            full_url = href if href.startswith("http") else f"{BASE}{href}"
-            results.append(BenchmarkEntry(
-                name=title,
-                source_url=full_url,
-                source_type="paper",
-                description=desc[:500],
-                date=date,
-                tags=[query],
-            ))
-
-            if len(results) >= max_results:
-                break
-
-        if not found_any:
+        page_results = _parse_papers_html(html, query)
+        if not page_results:
             break
+        results.extend(page_results[: max_results - len(results)])
         page += 1
 
     return results
@@ -358,16 +428,34 @@ def _s2_request(
     delay: float = 1.0,
     **kwargs,
 ) -> Optional[dict]:
-    """Make a Semantic Scholar API request with retry + back-off."""
+    """
+    Make a Semantic Scholar API request, paced by the shared S2 rate limiter.
+
+    *delay* is only the pause after a network error; 429 back-off comes
+    from the limiter (which honours ``Retry-After``). Responses go through
+    the on-disk response cache when it is enabled.
+    """
+    cache = get_response_cache()
+    lookup = (
+        cache.lookup(method, url, kwargs.get("params"), kwargs.get("json"))
+        if cache else None
+    )
+    if lookup and lookup.fresh:
+        return lookup.data
+    headers = {**headers, **(lookup.validators() if lookup else {})}
+
     for attempt in range(4):
         try:
-            r = client.request(method, url, headers=headers, timeout=60, **kwargs)
+            r = limited_request(client, method, url, headers=headers, timeout=60, **kwargs)
+            if r.status_code == 304 and lookup and lookup.entry:
+                return cache.revalidated(lookup)
             if r.status_code == 200:
-                return r.json()
+                data = r.json()
+                if lookup:
+                    cache.store(lookup, r, data)
+                return data
             if r.status_code == 429:
-                wait = min(2 ** (attempt + 1), 30)
-                print(f"    S2 rate-limited, waiting {wait}s ...")
-                time.sleep(wait)
+                print(f"    S2 rate-limited (attempt {attempt + 1}/4), backing off ...")
                 continue
             print(f"    S2 HTTP {r.status_code} for {url}")
             return None
@@ -377,33 +465,87 @@ def _s2_request(
     return None
 
 
+def _parse_s2_paper(paper: dict, query: str) -> Optional[BenchmarkEntry]:
+    """Convert one S2 bulk-search hit into a BenchmarkEntry."""
+    paper_id = paper.get("paperId", "")
+    title = paper.get("title", "")
+    if not paper_id or not title:
+        return None
+
+    abstract = paper.get("abstract") or ""
+    year = paper.get("year")
+    pub_date = paper.get("publicationDate") or ""
+    citation_count = paper.get("citationCount") or 0
+    fields = paper.get("fieldsOfStudy") or []
+
+    # Best URL: prefer arXiv, fall back to S2
+    ext_ids = paper.get("externalIds") or {}
+    arxiv_id = ext_ids.get("ArXiv", "")
+    if arxiv_id:
+        source_url = f"https://arxiv.org/abs/{arxiv_id}"
+    else:
+        source_url = paper.get("url") or f"https://www.semanticscholar.org/paper/{paper_id}"
+
+    date_str = pub_date[:10] if pub_date else (str(year) if year else "")
+
+    extra_tags = [f.lower().replace(" ", "-") for f in fields]
+    if citation_count >= 100:
+        extra_tags.append("highly-cited")
+
+    return BenchmarkEntry(
+        name=title,
+        source_url=source_url,
+        source_type="paper",
+        description=abstract[:500],
+        date=date_str,
+        tags=[query] + extra_tags,
+    )
+
+
+def _s2_bulk_params(query: str, token: Optional[str] = None, since: str = "") -> dict:
+    """Query params for one ``GET /paper/search/bulk`` page (date-bounded when *since* is set)."""
+    params: dict = {
+        "query": query,
+        "fields": S2_BULK_FIELDS,
+        "sort": "citationCount:desc",
+    }
+    if since:
+        params["publicationDateOrYear"] = f"{since}:"
+    if token:
+        params["token"] = token
+    return params
+
+
 def search_semantic_scholar(
     query: str,
     client: httpx.Client,
     max_results: int = 1000,
     delay: float = 1.0,
+    since: str = "",
+    resume_from: Optional[PageCursor] = None,
+    on_page: Optional[PageCallback] = None,
 ) -> list[BenchmarkEntry]:
     """
     Search Semantic Scholar using the **bulk search** endpoint.
 
     Uses ``GET /paper/search/bulk`` which returns up to 1,000 results per
     request and uses token-based pagination for subsequent pages.
+    With *since* (``YYYY-MM-DD``) only papers published on/after that date
+    are requested (``publicationDateOrYear=<since>:``).
+    *resume_from* continues from a saved continuation token; *on_page* is
+    called after every page (see ``PageCursor``).
 
-    Returns BenchmarkEntry objects with source_type="paper".
+    Returns BenchmarkEntry objects with source_type="paper" (only those
+    fetched by this call when resuming).
     """
     results: list[BenchmarkEntry] = []
     s2_headers = _s2_headers()
-    continuation_token: Optional[str] = None
-    page = 0
+    continuation_token: Optional[str] = resume_from.cursor if resume_from else None
+    page = resume_from.page if resume_from else 0
+    already = resume_from.fetched if resume_from else 0
 
-    while len(results) < max_results:
-        params: dict = {
-            "query": query,
-            "fields": S2_BULK_FIELDS,
-            "sort": "citationCount:desc",
-        }
-        if continuation_token:
-            params["token"] = continuation_token
+    while already + len(results) < max_results:
+        params = _s2_bulk_params(query, continuation_token, since)
 
         data = _s2_request(
             client, "GET", f"{S2_API_BASE}/paper/search/bulk",
@@ -417,54 +559,58 @@ def search_semantic_scholar(
             break
 
         page += 1
+        page_entries: list[BenchmarkEntry] = []
+        truncated = False
         for paper in papers:
-            if len(results) >= max_results:
+            if already + len(results) + len(page_entries) >= max_results:
+                truncated = True
                 break
-            paper_id = paper.get("paperId", "")
-            title = paper.get("title", "")
-            if not paper_id or not title:
-                continue
-
-            abstract = paper.get("abstract") or ""
-            year = paper.get("year")
-            pub_date = paper.get("publicationDate") or ""
-            citation_count = paper.get("citationCount") or 0
-            fields = paper.get("fieldsOfStudy") or []
-
-            # Best URL: prefer arXiv, fall back to S2
-            ext_ids = paper.get("externalIds") or {}
-            arxiv_id = ext_ids.get("ArXiv", "")
-            if arxiv_id:
-                source_url = f"https://arxiv.org/abs/{arxiv_id}"
-            else:
-                source_url = paper.get("url") or f"https://www.semanticscholar.org/paper/{paper_id}"
-
-            date_str = pub_date[:10] if pub_date else (str(year) if year else "")
-
-            extra_tags = [f.lower().replace(" ", "-") for f in fields]
-            if citation_count >= 100:
-                extra_tags.append("highly-cited")
-
-            results.append(BenchmarkEntry(
-                name=title,
-                source_url=source_url,
-                source_type="paper",
-                description=abstract[:500],
-                date=date_str,
-                tags=[query] + extra_tags,
-            ))
+            entry = _parse_s2_paper(paper, query)
+            if entry:
+                page_entries.append(entry)
+        results.extend(page_entries)
 
         # Token-based pagination: if a token is returned, there are more pages
         continuation_token = data.get("token")
+        if on_page:
+            done = not continuation_token or already + len(results) >= max_results
+            on_page(page_entries, PageCursor(
+                page, None if done else continuation_token, already + len(results),
+                exhausted=not continuation_token and not truncated,
+            ))
         if not continuation_token:
             break
 
-        print(f"    page {page}: {len(results)} papers so far (total in S2: {data.get('total', '?')})")
-        time.sleep(delay)
+        print(f"    page {page}: {already + len(results)} papers so far (total in S2: {data.get('total', '?')})")
 
     return results
 
 
+DETAIL_BATCH_SIZE = 500   # S2 /paper/batch maximum
+
+
+def _fetch_detail_batch(
+    client: httpx.Client,
+    batch: list[str],
+    delay: float = 1.0,
+) -> Optional[list[dict]]:
+    """One ``POST /paper/batch`` call; returns the found papers or None on failure."""
+    s2_headers = {**_s2_headers(), "Content-Type": "application/json"}
+    data = _s2_request(
+        client,
+        "POST",
+        f"{S2_API_BASE}/paper/batch",
+        headers=s2_headers,
+        delay=delay,
+        params={"fields": S2_DETAIL_FIELDS},
+        json={"ids": batch},
+    )
+    if data and isinstance(data, list):
+        # Filter out None entries (papers not found)
+        return [p for p in data if p is not None]
+    return None
+
+
 def fetch_paper_details(
     paper_ids: list[str],
     client: httpx.Client,
@@ -475,63 +621,170 @@ def fetch_paper_details(
     Fetch full details for papers using ``POST /paper/batch``.
 
     Sends batches of up to 500 paper IDs per request.
-    Saves incrementally after each batch if *save_path* is provided.
-    Returns the raw S2 JSON dicts with all detail fields.
+    If *save_path* is given, it is a ``details_store.DetailsStore`` path:
+    IDs already in the store (paperId or ``ArXiv:`` form) are skipped and
+    each batch is appended to it as it arrives.
+    Returns the raw S2 JSON dicts fetched by this call.
     """
-    BATCH_SIZE = 500
-    s2_headers = {**_s2_headers(), "Content-Type": "application/json"}
-    all_details: list[dict] = []
+    fetched: list[dict] = []
 
-    # Resume from existing file if present
-    if save_path and os.path.exists(save_path):
-        try:
-            with open(save_path, "r", encoding="utf-8") as f:
-                existing = json.load(f)
-            if isinstance(existing, list) and existing:
-                all_details = existing
-                # Figure out how many IDs we already have and skip them
-                existing_ids = {p.get("paperId") for p in existing if p}
-                remaining_ids = [pid for pid in paper_ids if pid not in existing_ids]
-                if len(remaining_ids) < len(paper_ids):
-                    skipped = len(paper_ids) - len(remaining_ids)
-                    print(f"  Resuming: {skipped} papers already fetched, {len(remaining_ids)} remaining")
-                    paper_ids = remaining_ids
-        except (json.JSONDecodeError, OSError):
-            pass  # start fresh if file is corrupt
-
-    if save_path:
-        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
-
-    total_batches = (len(paper_ids) + BATCH_SIZE - 1) // BATCH_SIZE if paper_ids else 0
-
-    for start in range(0, len(paper_ids), BATCH_SIZE):
-        batch = paper_ids[start : start + BATCH_SIZE]
-        batch_num = start // BATCH_SIZE + 1
+    store = DetailsStore(save_path) if save_path else None
+    if store is not None:
+        remaining_ids = store.missing(paper_ids)
+        if len(remaining_ids) < len(paper_ids):
+            skipped = len(paper_ids) - len(remaining_ids)
+            print(f"  Resuming: {skipped} papers already fetched, {len(remaining_ids)} remaining")
+            paper_ids = remaining_ids
+
+    total_batches = (len(paper_ids) + DETAIL_BATCH_SIZE - 1) // DETAIL_BATCH_SIZE if paper_ids else 0
+
+    for start in range(0, len(paper_ids), DETAIL_BATCH_SIZE):
+        batch = paper_ids[start : start + DETAIL_BATCH_SIZE]
+        batch_num = start // DETAIL_BATCH_SIZE + 1
         print(f"  Fetching paper details batch {batch_num}/{total_batches} ({len(batch)} papers) ...")
 
-        data = _s2_request(
-            client,
-            "POST",
-            f"{S2_API_BASE}/paper/batch",
-            headers=s2_headers,
-            delay=delay,
-            params={"fields": S2_DETAIL_FIELDS},
-            json={"ids": batch},
-        )
-        if data and isinstance(data, list):
-            # Filter out None entries (papers not found)
-            all_details.extend([p for p in data if p is not None])
+        batch_details = _fetch_detail_batch(client, batch, delay)
+        if batch_details is not None:
+            fetched.extend(batch_details)
+            # Append just this batch to the store
+            if store is not None:
+                store.add_many(batch_details)
         else:
             print(f"    Warning: batch {batch_num} returned no data")
 
-        # Save incrementally after each batch
-        if save_path:
-            with open(save_path, "w", encoding="utf-8") as f:
-                json.dump(all_details, f, indent=2, ensure_ascii=False)
+    if store is not None:
+        store.close()
+    return fetched
 
-        time.sleep(delay)
 
-    return all_details
+class DetailFetcher:
+    """
+    Background ``POST /paper/batch`` consumer that overlaps with searching.
+
+    The search loop hands it every newly discovered entry via ``add()``;
+    as soon as ``DETAIL_BATCH_SIZE`` new S2 IDs have accumulated, a batch
+    goes onto a bounded queue that a worker thread drains into the details
+    store. The queue bound applies back-pressure to the search, and the
+    worker's requests draw from the same S2 token bucket as the searches,
+    so the shared rate budget is never exceeded. ``close()`` flushes the
+    final partial batch and waits for the worker. If the worker dies,
+    the next ``add()`` or ``close()`` raises instead of blocking forever
+    on the full queue.
+
+    Usage:
+        fetcher = DetailFetcher(DETAILS_DB).start()
+        fetcher.add(new_entries)        # from the search loop
+        fetcher.close()
+    """
+
+    def __init__(
+        self,
+        save_path: str = DETAILS_DB,
+        delay: float = 1.0,
+        batch_size: int = DETAIL_BATCH_SIZE,
+        max_pending_batches: int = 2,
+    ):
+        self.save_path = save_path
+        self.delay = delay
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending_batches)
+        self._pending: list[str] = []
+        self._submitted: set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None   # what stopped the worker, if anything
+
+        # Counters
+        self.batches = 0
+        self.fetched = 0
+        self.skipped = 0       # already in the store
+        self.failed_batches = 0
+        self.busy_seconds = 0.0
+
+    def start(self) -> "DetailFetcher":
+        self._thread = threading.Thread(target=self._worker, name="s2-details", daemon=True)
+        self._thread.start()
+        return self
+
+    def add(self, entries: Iterable[BenchmarkEntry]):
+        """Queue the S2 IDs of new paper entries; blocks while the queue is full (and the worker runs)."""
+        ready: list[list[str]] = []
+        with self._lock:
+            for pid in collect_s2_paper_ids(list(entries)):
+                if pid not in self._submitted:
+                    self._submitted.add(pid)
+                    self._pending.append(pid)
+            while len(self._pending) >= self.batch_size:
+                ready.append(self._pending[: self.batch_size])
+                self._pending = self._pending[self.batch_size :]
+        for batch in ready:
+            self._put(batch)
+
+    def _put(self, item: Optional[list[str]]):
+        """``put`` that gives up, re-raising the worker's error, once the worker is gone."""
+        while True:
+            self._raise_if_dead()
+            try:
+                self._queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def _raise_if_dead(self):
+        if self.error is not None:
+            raise RuntimeError(f"S2 detail worker failed: {self.error}") from self.error
+        if self._thread is not None and not self._thread.is_alive():
+            raise RuntimeError("S2 detail worker is not running")
+
+    def close(self) -> int:
+        """Submit the last partial batch, wait for the worker; returns papers fetched."""
+        with self._lock:
+            tail, self._pending = self._pending, []
+        if tail:
+            self._put(tail)
+        self._put(None)
+        if self._thread:
+            self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"S2 detail worker failed: {self.error}") from self.error
+        return self.fetched
+
+    def _worker(self):
+        store = DetailsStore(self.save_path)
+        try:
+            with httpx.Client() as client:
+                while True:
+                    batch = self._queue.get()
+                    if batch is None:
+                        break
+                    missing = store.missing(batch)
+                    self.skipped += len(batch) - len(missing)
+                    if not missing:
+                        continue
+                    self.batches += 1
+                    t0 = time.monotonic()
+                    details = _fetch_detail_batch(client, missing, self.delay)
+                    self.busy_seconds += time.monotonic() - t0
+                    if details is None:
+                        self.failed_batches += 1
+                        print(f"  [details] Warning: batch of {len(missing)} returned no data")
+                        continue
+                    store.add_many(details)
+                    self.fetched += len(details)
+                    print(f"  [details] batch {self.batches}: +{len(details)} papers "
+                          f"({self.fetched} fetched so far)")
+        except Exception as e:  # surfaced to the search loop by add() / close()
+            self.error = e
+        finally:
+            store.close()
+
+    def summary(self) -> str:
+        return (
+            f"{self.fetched} papers in {self.batches} batches "
+            f"({self.skipped} already stored"
+            + (f", {self.failed_batches} failed batches" if self.failed_batches else "")
+            + f"; {self.busy_seconds:.1f}s in requests) -> {self.save_path}"
+        )
 
 
 def save_paper_details(details: list[dict], output_path: str):
@@ -542,8 +795,112 @@ def save_paper_details(details: list[dict], output_path: str):
     print(f"  Saved {len(details)} paper details -> {output_path}")
 
 
+# ── Incremental discovery watermarks ─────────────────────────────────────────
+
+WATERMARKS_PATH = "output/search_watermarks.json"
+
+# Re-scan a little before each watermark: S2 indexes papers days/weeks after
+# their publication date, and HF dates are day-precision. Overlap is removed
+# by the usual URL de-duplication.
+WATERMARK_LOOKBACK_DAYS = {"s2": 30, "hf_datasets": 1}
+
+# Only a complete walk moves these marks. S2 bulk results come sorted by
+# citation count, so a walk cut short by max_results can skip newer papers;
+# HF datasets come newest-first, so a cut-short walk never reaches the ones
+# changed between the old mark and the oldest dataset it fetched.
+WATERMARK_COMPLETE_WALK = {"s2", "hf_datasets"}
+
+
+@dataclass
+class SearchWatermarks:
+    """
+    Per-(provider, query) high-water marks for incremental discovery.
+
+    ``marks[provider][query]`` is the newest publication date (S2) or
+    lastModified date (HF datasets) seen for that query, as ``YYYY-MM-DD``.
+    """
+    marks: dict[str, dict[str, str]] = field(default_factory=dict)
+    path: str = WATERMARKS_PATH
+
+    @classmethod
+    def load(cls, path: str = WATERMARKS_PATH) -> "SearchWatermarks":
+        marks: dict[str, dict[str, str]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    marks = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                marks = {}
+        return cls(marks=marks, path=path)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.marks, f, indent=2, sort_keys=True)
+
+    def since(self, provider: str, query: str) -> str:
+        """Lower date bound for the next search, or "" for a full first scan."""
+        mark = self.marks.get(provider, {}).get(query, "")
+        if not mark:
+            return ""
+        try:
+            start = date.fromisoformat(mark[:10])
+        except ValueError:
+            return ""
+        lookback = WATERMARK_LOOKBACK_DAYS.get(provider, 0)
+        return (start - timedelta(days=lookback)).isoformat()
+
+    def advance(
+        self,
+        provider: str,
+        query: str,
+        entries: Iterable[BenchmarkEntry],
+        complete: bool = True,
+    ):
+        """
+        Move the watermark to the newest date among *entries*. For providers
+        in ``WATERMARK_COMPLETE_WALK`` nothing moves unless *complete* (the
+        page walk ran until the provider had no more results).
+        """
+        if provider in WATERMARK_COMPLETE_WALK and not complete:
+            return
+        # Year-only S2 dates count as January 1st -- a safe lower bound
+        dates = [
+            e.date[:10] if len(e.date) >= 10 else f"{e.date}-01-01"
+            for e in entries
+            if len(e.date) >= 10 or (len(e.date) == 4 and e.date.isdigit())
+        ]
+        current = self.marks.get(provider, {}).get(query, "")
+        newest = max(dates + [current]) if dates else current
+        if newest:
+            self.marks.setdefault(provider, {})[query] = newest
+
+
+def collect_s2_paper_ids(entries: list[BenchmarkEntry]) -> list[str]:
+    """Return de-duplicated S2 batch-API IDs (paperId, ``ArXiv:<id>`` or ``DOI:<doi>``) for paper entries."""
+    s2_paper_ids: list[str] = []
+    for entry in entries:
+        if entry.source_type != "paper":
+            continue
+        batch_id = s2_batch_id(entry.source_url)
+        if batch_id:
+            s2_paper_ids.append(batch_id)
+    return list(dict.fromkeys(s2_paper_ids))
+
+
 # ── Main search orchestrator ─────────────────────────────────────────────────
 
+def _single_page(
+    entries: list[BenchmarkEntry],
+    resume_from: Optional[PageCursor] = None,
+    on_page: Optional[PageCallback] = None,
+) -> list[BenchmarkEntry]:
+    """Report an unpaginated search's results as one finished page."""
+    if on_page:
+        on_page(entries, PageCursor(1, None, len(entries)))
+    return entries
+
+
 def run_search(
     queries: list[str],
     include_daily_papers: bool = True,
@@ -552,7 +909,12 @@ def run_search(
     max_datasets_per_query: int = 200,
     max_papers_per_query: int = 1000,
     fetch_details: bool = True,
-    details_output_path: str = "output/s2_paper_details.json",
+    details_output_path: str = DETAILS_DB,
+    watermarks: Optional[SearchWatermarks] = None,
+    known_urls: Iterable[str] = (),
+    log: Optional["DiscoveryLog"] = None,
+    yields: Optional["QueryYield"] = None,
+    query_scales: Optional[dict[str, float]] = None,
 ) -> list[BenchmarkEntry]:
     """
     Run all searches and return de-duplicated results.
@@ -561,100 +923,156 @@ def run_search(
         queries: Search terms to use.
         include_daily_papers: Also fetch HuggingFace trending daily papers.
         include_semantic_scholar: Use S2 bulk search for papers (200M+ corpus).
-        delay: Seconds between request batches (be polite).
+        delay: Pause after network errors. Request pacing comes from the
+            shared per-provider rate limiter (ratelimit.py).
         max_datasets_per_query: Max HF dataset results per query (paginated).
         max_papers_per_query: Max paper results per S2 bulk query (up to 1000/page).
-        fetch_details: After bulk search, fetch full paper details via batch API.
-        details_output_path: Where to save the raw S2 paper detail JSON.
+        fetch_details: Fetch full paper details via the batch API, pipelined
+            with the searches (``DetailFetcher``).
+        details_output_path: Path of the S2 paper details store (details_store.py).
+        watermarks: Incremental mode -- only fetch items newer than each
+            query's watermark (date-bounded S2 bulk search, HF datasets
+            sorted by lastModified), then advance the watermarks (only
+            when the page walk was not cut short by the result cap).
+        known_urls: Source URLs already discovered by earlier runs; entries
+            with the same canonical identity (identity.py) are not returned.
+        log: Stream every new entry and finished page to this
+            ``discovery_log.DiscoveryLog``. In ``"resume"`` mode, finished
+            (query, provider) units are skipped, unfinished ones continue
+            from their last cursor, and entries already in the log are
+            returned as part of the result.
+        yields: Record per-query result / new-entry counts in this
+            ``query_planner.QueryYield``.
+        query_scales: Per-query fraction of the max results to fetch
+            (queries capped by the query planner); default 1.0.
     """
     all_results: list[BenchmarkEntry] = []
-    seen_urls: set[str] = set()
-    s2_paper_ids: list[str] = []  # collect S2 paper IDs for detail fetch
+    # De-duplicate by canonical identity, not raw URL: the same paper from
+    # HF daily papers and S2 (or two arXiv versions) is kept once
+    seen = IdentityIndex(known_urls)
+
+    # Paper details are fetched in the background while searching continues
+    fetcher: Optional[DetailFetcher] = None
+    if include_semantic_scholar and fetch_details:
+        fetcher = DetailFetcher(details_output_path, delay=delay).start()
 
-    def _add(entries: list[BenchmarkEntry]) -> int:
-        added = 0
+    def _add(entries: list[BenchmarkEntry]) -> list[BenchmarkEntry]:
+        new: list[BenchmarkEntry] = []
         for e in entries:
-            if e.source_url not in seen_urls:
-                seen_urls.add(e.source_url)
+            if seen.add(e.source_url):
                 all_results.append(e)
-                added += 1
-        return added
-
-    # If using S2 without an API key, enforce a longer delay to avoid rate limits
+                if log:
+                    log.append(e)
+                new.append(e)
+        if fetcher and new:
+            fetcher.add(new)
+        return new
+
+    if log and log.mode == "resume":
+        for e in log.entries():
+            if seen.add(e.source_url):
+                all_results.append(e)
+        print(f"Resuming discovery: {len(all_results)} entries and "
+              f"{log.units_done} finished units already logged.")
+        if fetcher:
+            fetcher.add(all_results)
+
+    def _run_unit(q: str, provider: str, search: Callable[..., list[BenchmarkEntry]]) -> Optional[tuple[int, int]]:
+        """Run one (query, provider) search page by page; returns (found, new) or None if skipped."""
+        if log and log.is_done(q, provider):
+            print(f"   -> already done in a previous run, skipping")
+            return None
+        resume_from = log.progress(q, provider) if log else None
+        if resume_from:
+            print(f"   (resuming after page {resume_from.page})")
+        new: list[BenchmarkEntry] = []
+        last = PageCursor()
+
+        def on_page(page_entries: list[BenchmarkEntry], cursor: PageCursor):
+            nonlocal last
+            last = cursor
+            new.extend(_add(page_entries))
+            if log:
+                log.record_page(q, provider, cursor)
+
+        found = search(resume_from=resume_from, on_page=on_page)
+        if watermarks and provider in WATERMARK_LOOKBACK_DAYS:
+            watermarks.advance(provider, q, found, complete=last.exhausted)
+        if log:
+            log.mark_done(q, provider)
+        if yields:
+            yields.record_unit(q, provider, len(found), new)
+        return len(found), len(new)
+
+    # Without an API key S2 requests go through the (slower) unkeyed bucket
     if include_semantic_scholar:
         if _s2_api_key():
             print("Semantic Scholar API key detected.")
         else:
             print("No S2_API_KEY set -- using unauthenticated rate limit (slow).")
             print("Set S2_API_KEY env var for faster paper search.\n")
-            delay = max(delay, 3.0)
 
     with httpx.Client() as client:
         # ── HuggingFace daily papers ─────────────────────────────────────
         if include_daily_papers:
             print("Fetching HuggingFace daily papers (API) ...")
-            papers = fetch_daily_papers(client)
-            added = _add(papers)
-            print(f"   -> {len(papers)} daily papers ({added} new)")
-            time.sleep(delay)
+            if log and log.is_done("", "daily_papers"):
+                print("   -> already done in a previous run, skipping")
+            else:
+                papers = fetch_daily_papers(client)
+                added = len(_add(papers))
+                if log:
+                    log.mark_done("", "daily_papers")
+                print(f"   -> {len(papers)} daily papers ({added} new)")
 
         total_queries = len(queries)
         for i, q in enumerate(queries, 1):
-            print(f"\n[{i}/{total_queries}] Query: '{q}'")
+            scale = (query_scales or {}).get(q, 1.0)
+            max_papers = max(1, int(max_papers_per_query * scale))
+            max_datasets = max(1, int(max_datasets_per_query * scale))
+            print(f"\n[{i}/{total_queries}] Query: '{q}'"
+                  + (f" (capped to {scale:.0%})" if scale < 1.0 else ""))
 
             # ── Semantic Scholar bulk search ──────────────────────────────
             if include_semantic_scholar:
-                print(f"  S2 bulk search ...")
-                s2_papers = search_semantic_scholar(
-                    q, client, max_results=max_papers_per_query, delay=delay,
-                )
-                added = _add(s2_papers)
-                print(f"   -> {len(s2_papers)} papers ({added} new)")
-                time.sleep(delay)
+                since = watermarks.since("s2", q) if watermarks else ""
+                print(f"  S2 bulk search{f' (since {since})' if since else ''} ...")
+                counts = _run_unit(q, "s2", lambda **kw: search_semantic_scholar(
+                    q, client, max_results=max_papers, delay=delay,
+                    since=since, **kw,
+                ))
+                if counts:
+                    print(f"   -> {counts[0]} papers ({counts[1]} new)")
             else:
                 # Fall back to HuggingFace paper search
                 print(f"  Searching HF papers ...")
-                hf_papers = search_papers(q, client, max_results=max_papers_per_query)
-                added = _add(hf_papers)
-                print(f"   -> {len(hf_papers)} papers ({added} new)")
-                time.sleep(delay)
+                counts = _run_unit(q, "hf_papers", lambda **kw: _single_page(
+                    search_papers(q, client, max_results=max_papers), **kw,
+                ))
+                if counts:
+                    print(f"   -> {counts[0]} papers ({counts[1]} new)")
 
             # ── HuggingFace datasets ─────────────────────────────────────
-            print(f"  Searching HF datasets ...")
-            datasets = search_datasets(
-                q, client, max_results=max_datasets_per_query, delay=delay * 0.5,
-            )
-            added = _add(datasets)
-            print(f"   -> {len(datasets)} datasets ({added} new)")
-            time.sleep(delay)
+            since = watermarks.since("hf_datasets", q) if watermarks else ""
+            print(f"  Searching HF datasets{f' (since {since})' if since else ''} ...")
+            counts = _run_unit(q, "hf_datasets", lambda **kw: search_datasets(
+                q, client, max_results=max_datasets, since=since, **kw,
+            ))
+            if counts:
+                print(f"   -> {counts[0]} datasets ({counts[1]} new)")
 
         print(f"\nFound {len(all_results)} unique results across {total_queries} queries.")
-
-        # ── Fetch full S2 paper details for all paper entries ────────────
-        if include_semantic_scholar and fetch_details:
-            # Extract S2 paper IDs from source URLs
-            for entry in all_results:
-                if entry.source_type == "paper":
-                    # Try to extract S2 paper ID from the URL or tags
-                    url = entry.source_url
-                    if "semanticscholar.org/paper/" in url:
-                        pid = url.split("/paper/")[-1].split("/")[0].split("?")[0]
-                        if pid:
-                            s2_paper_ids.append(pid)
-                    elif "arxiv.org/abs/" in url:
-                        arxiv_id = url.split("/abs/")[-1].split("?")[0]
-                        if arxiv_id:
-                            s2_paper_ids.append(f"ArXiv:{arxiv_id}")
-
-            # De-duplicate paper IDs
-            s2_paper_ids_unique = list(dict.fromkeys(s2_paper_ids))
-
-            if s2_paper_ids_unique:
-                print(f"\nFetching full details for {len(s2_paper_ids_unique)} papers via S2 batch API ...")
-                details = fetch_paper_details(
-                    s2_paper_ids_unique, client, delay=delay,
-                    save_path=details_output_path,
-                )
-                print(f"  Retrieved details for {len(details)}/{len(s2_paper_ids_unique)} papers.")
-
+        if seen.aliases:
+            print(f"  ({seen.aliases} cross-source duplicates merged by canonical ID)")
+        if yields:
+            yields.finish_run(query_scales)
+
+    # ── Finish the S2 paper detail batches still in flight ───────────────
+    if fetcher:
+        print("\nWaiting for the remaining S2 paper detail batches ...")
+        fetcher.close()
+        print(f"  Paper details: {fetcher.summary()}")
+
+    print_limiter_stats()
+    print_cache_stats()
     return all_results